@@ -1,5 +1,6 @@
-from CSIKit.csi.csidata import CSIData
-from CSIKit.csi.csiframe import CSIFrame
+from CSIKit.csi.csidata import CSIData, CSICache
+from CSIKit.csi.csifilter import CSIFilter
+from CSIKit.csi.csiframe import CSIFrame, CSIMemoryBudget
 from CSIKit.csi.frames.iwl import IWLCSIFrame
 from CSIKit.csi.csimetadata import CSIMetadata
-
+from CSIKit.csi.csibatch import CSIBatch
@@ -0,0 +1,80 @@
+import numpy as np
+
+# Frame attributes which are not gathered into batch columns.
+EXCLUDED_ATTRIBUTES = ["csi_matrix", "CSI_DATA", "frame_container"]
+
+class CSIBatch:
+    """
+        A batch of frames, held as arrays rather than as individual CSIFrame objects.
+
+        Attributes
+        ----------
+        csi : np.array
+            (frames, subcarriers, ...) tensor of CSI matrices.
+        timestamps : np.array
+            Timestamp of each frame.
+        columns : dict
+            Array of values for each header field, with one entry per frame.
+        offset : int
+            Byte offset following the last frame in the batch, from which reading can be resumed.
+    """
+
+    __slots__ = ["csi", "timestamps", "columns", "offset"]
+    def __init__(self, csi: np.array, timestamps: np.array, columns: dict, offset: int = None):
+        self.csi = csi
+        self.timestamps = timestamps
+        self.columns = columns
+        self.offset = offset
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @staticmethod
+    def from_frames(frames: list, timestamps: list, offset: int = None) -> "CSIBatch":
+        """
+            Gathers a list of frames into a CSIBatch.
+
+            Parameters:
+                frames {list} -- CSIFrames to gather.
+                timestamps {list} -- Timestamp of each frame.
+                offset {int} -- Byte offset following the last frame.
+
+            Returns:
+                batch {CSIBatch} -- Batch with a column for each header attribute of the frames.
+        """
+        frame = frames[0]
+        names = [name for name in getattr(type(frame), "__slots__", []) if hasattr(frame, name)]
+        names += [name for name in vars(frame) if not name.startswith("_") and name not in names]
+        names = [name for name in names if name not in EXCLUDED_ATTRIBUTES]
+
+        columns = {name: np.array([getattr(frame, name) for frame in frames]) for name in names}
+
+        csi_matrices = [frame.csi_matrix for frame in frames]
+        columns["num_subcarriers"] = np.array([x.shape[0] for x in csi_matrices])
+
+        return CSIBatch(CSIBatch.stack_matrices(csi_matrices), np.array(timestamps), columns, offset)
+
+    @staticmethod
+    def stack_matrices(csi_matrices: list) -> np.array:
+        """
+            Stacks a list of CSI matrices into a single tensor.
+
+            Matrices smaller than the largest, such as those with fewer subcarriers or antennas,
+            are zero padded at the end of each axis.
+
+            Parameters:
+                csi_matrices {list} -- CSI matrix for each frame.
+
+            Returns:
+                csi {np.array} -- (frames, subcarriers, ...) tensor.
+        """
+        shapes = set(x.shape for x in csi_matrices)
+        if len(shapes) <= 1:
+            return np.stack(csi_matrices) if csi_matrices else np.zeros((0,))
+
+        shape = tuple(max(x) for x in zip(*shapes))
+        csi = np.zeros((len(csi_matrices),) + shape, dtype=np.result_type(*csi_matrices))
+        for i, csi_matrix in enumerate(csi_matrices):
+            csi[(i,) + tuple(slice(0, x) for x in csi_matrix.shape)] = csi_matrix
+
+        return csi
@@ -1,13 +1,140 @@
+from CSIKit.csi.csifilter import CSIFilter
 from CSIKit.csi.csiframe import CSIFrame
 from CSIKit.csi.csimetadata import CSIMetadata
-from CSIKit.util.csitools import get_CSI
+
+from collections import OrderedDict
 
 import numpy as np
 
+class CSICache:
+    """
+        Caches the tensors returned by get_CSI for a CSIData.
+
+        Entries are computed from a given state of the data, and are all discarded once it changes.
+        Where max_bytes is given, the least recently used entries are evicted to stay within it,
+        and a max_bytes of 0 disables caching.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()
+        self.state = None
+
+    def is_enabled(self) -> bool:
+        return self.max_bytes is None or self.max_bytes > 0
+
+    def get(self, key: tuple, state: tuple):
+        if state != self.state:
+            self.clear()
+            self.state = state
+            return None
+
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def add(self, key: tuple, value: tuple, state: tuple):
+        if state != self.state:
+            self.clear()
+            self.state = state
+
+        # Arrays already held by another entry, and views such as squeezed tensors, take no additional memory.
+        held = set(id(x) for entry, _ in self.entries.values() for x in entry)
+        nbytes = sum(x.nbytes for x in value if isinstance(x, np.ndarray) and x.flags.owndata and id(x) not in held)
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return
+
+        self.remove(key)
+        self.entries[key] = (value, nbytes)
+        self.used_bytes += nbytes
+
+        self.evict()
+
+    def remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.used_bytes -= entry[1]
+
+    def evict(self):
+        while self.max_bytes is not None and self.used_bytes > self.max_bytes and self.entries:
+            _, (_, nbytes) = self.entries.popitem(last=False)
+            self.used_bytes -= nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.used_bytes = 0
+
+class CSIFrameList(list):
+    """
+        List of frames which counts changes made to it, so tensors cached from them can be discarded.
+    """
+
+    # Unpickled lists are appended to before their attributes are restored, so this defaults on the class.
+    revision = 0
+
+    def changed(self):
+        self.revision += 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.changed()
+
+    def __iadd__(self, other):
+        self.changed()
+        return super().__iadd__(other)
+
+    def __imul__(self, other):
+        self.changed()
+        return super().__imul__(other)
+
+    def append(self, frame: CSIFrame):
+        super().append(frame)
+        self.changed()
+
+    def extend(self, frames):
+        super().extend(frames)
+        self.changed()
+
+    def insert(self, index: int, frame: CSIFrame):
+        super().insert(index, frame)
+        self.changed()
+
+    def pop(self, *args) -> CSIFrame:
+        self.changed()
+        return super().pop(*args)
+
+    def remove(self, frame: CSIFrame):
+        super().remove(frame)
+        self.changed()
+
+    def clear(self):
+        super().clear()
+        self.changed()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.changed()
+
+    def reverse(self):
+        super().reverse()
+        self.changed()
+
 class CSIData:
 
-    def __init__(self, filename: str="", backend: str="", chipset: str="", filter_mac: str=None):
+    def __init__(self, filename: str="", backend: str="", chipset: str="", filter_mac: str=None, frame_filter: CSIFilter=None):
         
+        # Incremented whenever frames are pushed, so cached tensors can be discarded.
+        self.revision = 0
+        self.csi_cache = CSICache()
+
         self.frames = []
         self.timestamps = []
 
@@ -20,6 +147,19 @@ class CSIData:
         self.backend = backend
         self.chipset = chipset
         self.filter_mac = filter_mac
+        self.frame_filter = CSIFilter.from_args(filter_mac, frame_filter)
+
+        # Frames are numbered in the order they are pushed, including those dropped by the filter.
+        self.pushed_frames = 0
+
+    @property
+    def frames(self) -> CSIFrameList:
+        return self._frames
+
+    @frames.setter
+    def frames(self, frames: list):
+        # Assigned lists are copied, so that later changes to them are tracked.
+        self._frames = CSIFrameList(frames)
 
     def set_chipset(self, chipset: str):
         self.chipset = chipset
@@ -27,56 +167,46 @@ class CSIData:
     def set_backend(self, backend: str):
         self.backend = backend
 
-    def push_frame(self, frame: CSIFrame, timestamp: float):
-        if self.filter_mac is not None:
-            if hasattr(frame, "source_mac"):
-                if self.filter_mac.casefold() == frame.source_mac.casefold():
-                    self.frames.append(frame)
-                    self.timestamps.append(timestamp)
-            elif hasattr(frame, "mac"):
-                if self.filter_mac.casefold() == frame.mac.casefold():
-                    self.frames.append(frame)
-                    self.timestamps.append(timestamp)
-        else:
-            self.frames.append(frame)
-            self.timestamps.append(timestamp)
+    def set_cache_limit(self, max_bytes: int):
+        """
+            Limits the memory held by tensors cached by get_CSI.
 
-    def get_metadata(self) -> CSIMetadata:
-        chipset = self.chipset
-        backend = self.backend
+            Parameters:
+                max_bytes {int} -- Maximum size of cached tensors, None for no limit, or 0 to disable caching.
+        """
+        self.csi_cache.max_bytes = max_bytes
+        self.csi_cache.evict()
 
-        bandwidth = self.bandwidth
+        if not self.csi_cache.is_enabled():
+            self.csi_cache.clear()
 
-        unmodified_csi_matrix = self.frames[0].csi_matrix
-        _, no_frames, no_subcarriers = get_CSI(self)
+    def get_cache_state(self) -> tuple:
+        # Replacing or changing the list of frames, or the CSI of any frame, also invalidates cached tensors.
+        return (self.revision, id(self.frames), self.frames.revision, CSIFrame.revision)
 
-        rx_count = (0, 0)
-        tx_count = (0, 0)
-
-        if len(unmodified_csi_matrix.shape) <= 2:
-            rx_count, tx_count = (1, 1)
-        elif len(unmodified_csi_matrix.shape) == 3:
-            rx_count, tx_count = unmodified_csi_matrix.shape[1:]
+    def push_frame(self, frame: CSIFrame, timestamp: float):
+        if self.frame_filter is None or self.matches_filter(frame, timestamp):
+            self.frames.append(frame)
+            self.timestamps.append(timestamp)
+            self.revision += 1
 
-        antenna_config_string = "{} Rx, {} Tx".format(rx_count, tx_count)
+        self.pushed_frames += 1
 
-        timestamps = self.timestamps
-        final_timestamp = timestamps[-1]
+    def matches_filter(self, frame: CSIFrame, timestamp: float = None) -> bool:
+        # Frames without a MAC address or sequence number are dropped when filtering on them.
+        mac = getattr(frame, "source_mac", getattr(frame, "mac", None))
+        sequence = getattr(frame, "sequence_no", None)
 
-        #Check if timestamp is relative or epoch.
+        return self.frame_filter.matches(self.pushed_frames, timestamp, mac, sequence)
 
-        time_length = 0
-        if len(str(final_timestamp)) > 9:
-            #Likely an epoch timestamp.
-            #Get diff between first and last.
-            time_length = final_timestamp - timestamps[0]
-        else:
-            time_length = round(float(final_timestamp), 1)
+    def get_metadata(self) -> CSIMetadata:
+        # Only the first frame's CSI is needed, to establish its shape.
+        unmodified_csi_matrix = self.frames[0].csi_matrix
 
-        average_sample_rate = 0
-        if time_length > 0 and final_timestamp != 0:
-                average_sample_rate = round(no_frames/time_length, 1)
+        return CSIMetadata.from_headers(self.chipset, self.backend, self.bandwidth, unmodified_csi_matrix.shape, len(self.frames), self.timestamps, self.get_rssi())
 
+    def get_rssi(self) -> list:
+        # RSSI for each frame, taken from the strongest antenna where more than one is reported.
         rss_total = []
         if hasattr(self.frames[0], "rssi"):
             rss_total = [x.rssi for x in self.frames]
@@ -100,19 +230,4 @@ class CSIData:
             #     total_rss_for_frame /= divisor
             #     rss_total.append(total_rss_for_frame)
 
-        average_rssi = round(np.mean(rss_total), 1)
-
-        data = {
-            "chipset": chipset,
-            "backend": backend,
-            "bandwidth": bandwidth,
-            "antenna_config": antenna_config_string,
-            "frames": no_frames,
-            "subcarriers": no_subcarriers,
-            "time_length": time_length,
-            "average_sample_rate": average_sample_rate,
-            "average_rssi": average_rssi,
-            "csi_shape": unmodified_csi_matrix.shape
-        }    
-
-        return CSIMetadata(data)
\ No newline at end of file
+        return rss_total
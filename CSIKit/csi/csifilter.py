@@ -0,0 +1,167 @@
+import numpy as np
+
+class CSIFilter:
+    """
+        Selects frames by their header fields, so readers can drop frames before decoding their CSI.
+
+        Each criterion is optional, and frames are only kept if they meet every criterion given.
+        Ranges are (start, stop) tuples which include start and exclude stop, where either bound may be None.
+
+        Frame indices and timestamps are those each frame would have in read_file without a filter,
+        so filtering never changes the values of the frames which are kept. Frames lacking a field
+        which is filtered on, such as those from formats which do not record a MAC address, are dropped.
+
+        Attributes
+        ----------
+        macs : frozenset
+            Lowercase source MAC addresses to keep, or None to keep frames from any address.
+        time_range : tuple
+            Range of timestamps to keep, in seconds as given by read_file.
+        frame_range : tuple
+            Range of frame indices to keep, counted from 0.
+        sequence_range : tuple
+            Range of 802.11 sequence numbers to keep.
+    """
+
+    __slots__ = ["macs", "time_range", "frame_range", "sequence_range"]
+    def __init__(self, macs=None, time_range: tuple = None, frame_range: tuple = None, sequence_range: tuple = None):
+        if isinstance(macs, str):
+            macs = [macs]
+
+        self.macs = frozenset(CSIFilter.format_mac(x) for x in macs) if macs is not None else None
+        self.time_range = CSIFilter.check_range(time_range)
+        self.frame_range = CSIFilter.check_range(frame_range)
+        self.sequence_range = CSIFilter.check_range(sequence_range)
+
+    @staticmethod
+    def from_args(filter_mac: str = None, frame_filter: "CSIFilter" = None) -> "CSIFilter":
+        """
+            Combines the filter_mac and frame_filter arguments taken by readers into a single filter.
+
+            Parameters:
+                filter_mac {str} -- Only keep frames from this source MAC address.
+                frame_filter {CSIFilter} -- Filter to combine it with.
+
+            Returns:
+                frame_filter {CSIFilter} -- Combined filter, or None if neither was given.
+        """
+        # An empty filter_mac, as NEXBeamformReader defaults to, does not filter.
+        if not filter_mac:
+            return frame_filter
+
+        if frame_filter is None:
+            return CSIFilter(filter_mac)
+
+        macs = {CSIFilter.format_mac(filter_mac)}
+        if frame_filter.macs is not None:
+            macs &= frame_filter.macs
+
+        return CSIFilter(macs, frame_filter.time_range, frame_filter.frame_range, frame_filter.sequence_range)
+
+    @staticmethod
+    def check_range(value_range: tuple) -> tuple:
+        if value_range is None:
+            return None
+
+        start, stop = value_range
+        return (start, stop)
+
+    @staticmethod
+    def format_mac(mac) -> str:
+        # MAC addresses may be given as strings in either case, or as sequences of 6 bytes.
+        # Anything else is treated as a missing address.
+        if isinstance(mac, str):
+            return mac.casefold()
+        elif isinstance(mac, (tuple, list, bytes, np.ndarray)) and len(mac) == 6:
+            return ":".join("{:02x}".format(int(x)) for x in mac)
+
+        return None
+
+    @staticmethod
+    def in_range(value, value_range: tuple) -> bool:
+        if value_range is None:
+            return True
+        elif value is None:
+            return False
+
+        start, stop = value_range
+        return (start is None or value >= start) and (stop is None or value < stop)
+
+    @staticmethod
+    def range_mask(values: np.array, value_range: tuple, count: int) -> np.array:
+        mask = np.ones(count, dtype=bool)
+        if value_range is None:
+            return mask
+        elif values is None:
+            return ~mask
+
+        values = np.asarray(values)
+        start, stop = value_range
+        if start is not None:
+            mask &= values >= start
+        if stop is not None:
+            mask &= values < stop
+
+        return mask
+
+    def get_header_filter(self) -> "CSIFilter":
+        """
+            Gets the criteria which only depend on each frame's own headers, rather than its position in the file.
+
+            Returns:
+                header_filter {CSIFilter} -- Filter on MAC addresses and sequence numbers alone, or None if neither is filtered on.
+        """
+        if self.macs is None and self.sequence_range is None:
+            return None
+
+        return CSIFilter(self.macs, sequence_range=self.sequence_range)
+
+    def matches_mac(self, mac) -> bool:
+        return self.macs is None or CSIFilter.format_mac(mac) in self.macs
+
+    def matches(self, index: int, timestamp: float = None, mac=None, sequence: int = None) -> bool:
+        """
+            Checks whether a single frame should be kept.
+
+            Parameters:
+                index {int} -- Index of the frame, as in read_file without a filter.
+                timestamp {float} -- Timestamp of the frame, as in read_file without a filter.
+                mac -- Source MAC address of the frame, or None where the format has none.
+                sequence {int} -- Sequence number of the frame, or None where the format has none.
+
+            Returns:
+                matches {bool} -- Whether the frame meets every criterion.
+        """
+        return (self.matches_mac(mac)
+                and CSIFilter.in_range(index, self.frame_range)
+                and CSIFilter.in_range(timestamp, self.time_range)
+                and CSIFilter.in_range(sequence, self.sequence_range))
+
+    def mask(self, indices: np.array, timestamps: np.array = None, macs: list = None, sequences: np.array = None) -> np.array:
+        """
+            Checks which of a set of frames should be kept, for readers which decode headers in bulk.
+
+            Parameters:
+                indices {np.array} -- Index of each frame, as in read_file without a filter.
+                timestamps {np.array} -- Timestamp of each frame, or None where the format has none.
+                macs {list} -- Source MAC address of each frame, or None where the format has none.
+                sequences {np.array} -- Sequence number of each frame, or None where the format has none.
+
+            Returns:
+                mask {np.array} -- Whether each frame meets every criterion.
+        """
+        count = len(indices)
+
+        mask = CSIFilter.range_mask(indices, self.frame_range, count)
+        mask &= CSIFilter.range_mask(timestamps, self.time_range, count)
+        mask &= CSIFilter.range_mask(sequences, self.sequence_range, count)
+
+        if self.macs is not None:
+            if macs is None:
+                mask[:] = False
+            else:
+                # Each distinct address is only compared once.
+                kept = {mac: self.matches_mac(mac) for mac in set(macs)}
+                mask &= np.array([kept[mac] for mac in macs], dtype=bool)
+
+        return mask
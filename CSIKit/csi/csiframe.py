@@ -1,4 +1,107 @@
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+
+class CSIMemoryBudget:
+    """
+        Limits the memory held by lazily decoded CSI matrices.
+
+        Once the total size of decoded matrices exceeds max_bytes, the least recently used ones are dropped.
+        They are decoded again from their raw payload on next access, so any in-place changes made to
+        them are lost.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.frames = OrderedDict()
+
+    def add(self, frame: "CSIFrame", nbytes: int):
+        self.frames[id(frame)] = (frame, nbytes)
+        self.used_bytes += nbytes
+
+        while self.used_bytes > self.max_bytes and len(self.frames) > 1:
+            _, (oldest, oldest_nbytes) = self.frames.popitem(last=False)
+
+            # Unlike drop_csi, this leaves cached tensors alone, as the matrix is decoded again unchanged.
+            oldest._csi_matrix = None
+            self.used_bytes -= oldest_nbytes
+
+    def touch(self, frame: "CSIFrame"):
+        if id(frame) in self.frames:
+            self.frames.move_to_end(id(frame))
+
+    def remove(self, frame: "CSIFrame"):
+        entry = self.frames.pop(id(frame), None)
+        if entry is not None:
+            self.used_bytes -= entry[1]
+
 class CSIFrame:
+    """
+        Base class for the frames produced by each reader.
+
+        csi_matrix may be assigned directly, or decoded lazily on first access from a raw payload
+        given to set_lazy_csi. This lets header-only workloads skip CSI decoding entirely.
+    """
+
+    # Incremented whenever the CSI of any frame is assigned or dropped, so cached tensors can be discarded.
+    revision = 0
 
     def __init__(self):
-        pass
\ No newline at end of file
+        pass
+
+    @property
+    def csi_matrix(self) -> np.array:
+        csi_matrix = self.__dict__.get("_csi_matrix")
+        lazy_csi = self.__dict__.get("_lazy_csi")
+
+        if lazy_csi is None:
+            return csi_matrix
+
+        decoder, payload, memory_budget = lazy_csi
+        if csi_matrix is None:
+            csi_matrix = decoder(payload)
+            self._csi_matrix = csi_matrix
+
+            if memory_budget is not None:
+                memory_budget.add(self, csi_matrix.nbytes)
+        elif memory_budget is not None:
+            memory_budget.touch(self)
+
+        return csi_matrix
+
+    @csi_matrix.setter
+    def csi_matrix(self, csi_matrix: np.array):
+        # Assigned matrices replace any pending lazy decode.
+        lazy_csi = self.__dict__.pop("_lazy_csi", None)
+        if lazy_csi is not None and lazy_csi[2] is not None:
+            lazy_csi[2].remove(self)
+
+        self._csi_matrix = csi_matrix
+        CSIFrame.revision += 1
+
+    def set_lazy_csi(self, decoder: Callable[[memoryview], np.array], payload: memoryview, memory_budget: CSIMemoryBudget = None):
+        """
+            Defers decoding csi_matrix until it is first accessed.
+
+            Parameters:
+                decoder {Callable} -- Function returning the CSI matrix for the given payload.
+                payload {memoryview} -- Raw CSI payload for this frame.
+                memory_budget {CSIMemoryBudget} -- Optional budget shared between frames, which drops decoded matrices when exceeded.
+        """
+        self.csi_matrix = None
+        self._lazy_csi = (decoder, payload, memory_budget)
+
+    def is_decoded(self) -> bool:
+        return self.__dict__.get("_csi_matrix") is not None
+
+    def drop_csi(self):
+        # Releases a lazily decoded matrix. It will be decoded again on next access.
+        lazy_csi = self.__dict__.get("_lazy_csi")
+        if lazy_csi is not None and self.__dict__.get("_csi_matrix") is not None:
+            if lazy_csi[2] is not None:
+                lazy_csi[2].remove(self)
+
+            self._csi_matrix = None
+            CSIFrame.revision += 1
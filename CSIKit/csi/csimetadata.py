@@ -1,3 +1,5 @@
+import numpy as np
+
 class CSIMetadata:
 
     __slots__ = ["chipset", "backend", "bandwidth", "antenna_config", "frames", "subcarriers", "time_length", "average_sample_rate", "average_rssi", "csi_shape"]
@@ -11,4 +13,66 @@ class CSIMetadata:
         self.time_length = data["time_length"]
         self.average_sample_rate = data["average_sample_rate"]
         self.average_rssi = data["average_rssi"]
-        self.csi_shape = data["csi_shape"]
\ No newline at end of file
+        self.csi_shape = data["csi_shape"]
+
+    @classmethod
+    def from_headers(cls, chipset: str, backend: str, bandwidth: int, csi_shape: tuple, no_frames: int, timestamps: list, rss_total: list) -> "CSIMetadata":
+        """
+            Summarises a capture from its frame headers, without needing any CSI beyond the first frame's shape.
+
+            Parameters:
+                chipset {str} -- Chipset the capture was made with.
+                backend {str} -- Tool the capture was made with.
+                bandwidth {int} -- Bandwidth in MHz.
+                csi_shape {tuple} -- Shape of the first frame's CSI matrix.
+                no_frames {int} -- Number of frames.
+                timestamps {list} -- Timestamp of each frame, of which only the first and last are used.
+                rss_total {list} -- RSSI for each frame.
+
+            Returns:
+                metadata {CSIMetadata} -- Summary of the capture.
+        """
+        no_subcarriers = csi_shape[0]
+
+        rx_count = (0, 0)
+        tx_count = (0, 0)
+
+        if len(csi_shape) <= 2:
+            rx_count, tx_count = (1, 1)
+        elif len(csi_shape) == 3:
+            rx_count, tx_count = csi_shape[1:]
+
+        antenna_config_string = "{} Rx, {} Tx".format(rx_count, tx_count)
+
+        final_timestamp = timestamps[-1]
+
+        #Check if timestamp is relative or epoch.
+
+        time_length = 0
+        if len(str(final_timestamp)) > 9:
+            #Likely an epoch timestamp.
+            #Get diff between first and last.
+            time_length = final_timestamp - timestamps[0]
+        else:
+            time_length = round(float(final_timestamp), 1)
+
+        average_sample_rate = 0
+        if time_length > 0 and final_timestamp != 0:
+                average_sample_rate = round(no_frames/time_length, 1)
+
+        average_rssi = round(np.mean(rss_total), 1)
+
+        data = {
+            "chipset": chipset,
+            "backend": backend,
+            "bandwidth": bandwidth,
+            "antenna_config": antenna_config_string,
+            "frames": no_frames,
+            "subcarriers": no_subcarriers,
+            "time_length": time_length,
+            "average_sample_rate": average_sample_rate,
+            "average_rssi": average_rssi,
+            "csi_shape": csi_shape
+        }
+
+        return cls(data)
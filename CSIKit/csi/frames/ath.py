@@ -69,11 +69,10 @@ class ATHCSIFrame(CSIFrame):
         "rssi_1",
         "rssi_2",
         "rssi_3",
-        "payload_length",
-        "csi_matrix"
+        "payload_length"
     ]
 
-    HEADER_DATA = collections.namedtuple("header_data", __slots__[:-1])
+    HEADER_DATA = collections.namedtuple("header_data", __slots__)
 
     def __init__(self, header_data: namedtuple, csi_matrix: np.array):
         self.timestamp = header_data.timestamp
@@ -1,6 +1,8 @@
 from CSIKit.csi import CSIFrame
 
 import ast
+import warnings
+
 import numpy as np
 
 
@@ -113,7 +115,10 @@ class ESP32CSIFrame(CSIFrame):
                  "aggregation", "stbc", "fec_coding", "sgi", "noise_floor", "ampdu_cnt", "channel", "secondary_channel",
                  "local_timestamp", "ant", "sig_len", "rx_state", "real_time_set", "real_timestamp", "len", "CSI_DATA"]
 
-    def __init__(self, csv_line: list):
+    # Brackets, quotes and line endings are removed from CSI strings before tokenizing.
+    CSI_STRIP_TABLE = str.maketrans("[]\"\r\n", "     ")
+
+    def __init__(self, csv_line: list, csi_matrix: np.array = None):
         if len(csv_line) == 3 or len(csv_line) == 4:
             self.type = 0
             self.role = 0
@@ -140,7 +145,7 @@ class ESP32CSIFrame(CSIFrame):
             self.real_time_set = 0
             self.real_timestamp = csv_line[0]
             self.len = 0
-            self.csi_matrix = ESP32CSIFrame.parse_matrix(csv_line[len(csv_line)-1])
+            self.csi_matrix = csi_matrix if csi_matrix is not None else ESP32CSIFrame.parse_matrix(csv_line[len(csv_line)-1])
             return
 
         if len(csv_line) == 5:
@@ -169,7 +174,7 @@ class ESP32CSIFrame(CSIFrame):
             self.real_time_set = 0
             self.real_timestamp = int(csv_line[0])
             self.len = 0
-            self.csi_matrix = ESP32CSIFrame.parse_matrix(csv_line[len(csv_line)-1])
+            self.csi_matrix = csi_matrix if csi_matrix is not None else ESP32CSIFrame.parse_matrix(csv_line[len(csv_line)-1])
             return
         elif len(csv_line) == 9:
             self.mac = f"00:16:ea:{":".join(csv_line[0].split())}"
@@ -196,7 +201,7 @@ class ESP32CSIFrame(CSIFrame):
             self.real_time_set = 0
             self.real_timestamp = int(csv_line[1][:-3])
             self.len = 0
-            self.csi_matrix = ESP32CSIFrame.parse_separate_matrices(csv_line[7], csv_line[8])
+            self.csi_matrix = csi_matrix if csi_matrix is not None else ESP32CSIFrame.parse_separate_matrices(csv_line[7], csv_line[8])
             return
 
         self.type = csv_line[0]
@@ -243,7 +248,7 @@ class ESP32CSIFrame(CSIFrame):
 
         string_data = csv_line[25]
 
-        self.csi_matrix = ESP32CSIFrame.parse_matrix(string_data)
+        self.csi_matrix = csi_matrix if csi_matrix is not None else ESP32CSIFrame.parse_matrix(string_data)
 
     @staticmethod
     def parse_matrix(string_data, bandwidth=20):
@@ -271,12 +276,179 @@ class ESP32CSIFrame(CSIFrame):
         real_string_asarray = ast.literal_eval(real_string_py)
         real_int8_matrix = np.array(real_string_asarray)
 
-        complex_matrix = np.zeros((len(imag_int8_matrix), 1), dtype=complex)
+        complex_matrix = np.zeros((len(imag_int8_matrix), 1), dtype=np.complex64)
         for n in range(len(imag_int8_matrix)):
             complex_matrix[n] = complex(real_int8_matrix[n], imag_int8_matrix[n])
 
         return complex_matrix
 
+    @staticmethod
+    def parse_arrays(string_data: list) -> list:
+        """
+            Tokenizes a list of bracketed CSI strings (e.g. "[38 96 2 0 ]") in a single pass.
+
+            Strings are joined with a nan separator and parsed by NumPy at once, rather than one literal_eval per string.
+
+            Parameters:
+                string_data {list} -- CSI strings, as found in the CSV.
+
+            Returns:
+                arrays {list} -- float64 array of values for each string, or None if the strings are not purely numeric.
+        """
+        if len(string_data) == 0:
+            return []
+
+        text = " nan ".join(string_data).translate(ESP32CSIFrame.CSI_STRIP_TABLE)
+
+        with warnings.catch_warnings():
+            # Unparseable data ends the array early, with a DeprecationWarning in older NumPy versions.
+            warnings.simplefilter("error", DeprecationWarning)
+            try:
+                values = np.fromstring(text, dtype=np.float64, sep=" ")
+            except (DeprecationWarning, ValueError):
+                return None
+
+        separators = np.flatnonzero(np.isnan(values))
+        if len(separators) != len(string_data) - 1:
+            return None
+
+        starts = np.concatenate(([0], separators + 1))
+        ends = np.concatenate((separators, [len(values)]))
+
+        return [values[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+
+    @staticmethod
+    def parse_matrices(string_data: list) -> list:
+        """
+            Bulk equivalent of parse_matrix.
+
+            Where every string holds the same number of values, they are converted into a single
+            (frames, subcarriers, 1) complex64 tensor. Otherwise each string is converted separately.
+
+            Parameters:
+                string_data {list} -- CSI strings, as found in the CSV.
+
+            Returns:
+                csi_matrices {list} -- Matrix for each string, matching the output of parse_matrix.
+        """
+        arrays = ESP32CSIFrame.parse_arrays(string_data)
+        if arrays is None:
+            return [ESP32CSIFrame.parse_matrix(x) for x in string_data]
+
+        counts = set(map(len, arrays))
+        if len(counts) == 1 and counts.pop() % 2 == 0:
+            int8_matrix = np.stack(arrays).reshape(len(arrays), -1, 2)
+            return int8_matrix.astype(np.float32).view(np.complex64)
+
+        # Odd numbers of values are left to parse_matrix, which raises the same error as before.
+        return [x.reshape(-1, 2).astype(np.float32).view(np.complex64) if len(x) % 2 == 0 else ESP32CSIFrame.parse_matrix(s) for x, s in zip(arrays, string_data)]
+
+    @staticmethod
+    def parse_separate_matrices_bulk(imag_data: list, real_data: list) -> list:
+        # Bulk equivalent of parse_separate_matrices, producing a (frames, subcarriers, 1) complex64 tensor.
+        imag_arrays = ESP32CSIFrame.parse_arrays(imag_data)
+        real_arrays = ESP32CSIFrame.parse_arrays(real_data)
+
+        if imag_arrays is None or real_arrays is None:
+            return [ESP32CSIFrame.parse_separate_matrices(imag, real) for imag, real in zip(imag_data, real_data)]
+
+        counts = set(map(len, imag_arrays)) | set(map(len, real_arrays))
+        if len(counts) == 1:
+            complex_matrix = np.zeros((len(imag_arrays), counts.pop(), 1), dtype=np.complex64)
+            complex_matrix.real[:, :, 0] = np.stack(real_arrays)
+            complex_matrix.imag[:, :, 0] = np.stack(imag_arrays)
+            return complex_matrix
+
+        csi_matrices = []
+        for imag, real, imag_string, real_string in zip(imag_arrays, real_arrays, imag_data, real_data):
+            if len(imag) != len(real):
+                # Mismatched lengths are left to parse_separate_matrices, which handles them as before.
+                csi_matrices.append(ESP32CSIFrame.parse_separate_matrices(imag_string, real_string))
+                continue
+
+            complex_matrix = np.zeros((len(imag), 1), dtype=np.complex64)
+            complex_matrix.real[:, 0] = real
+            complex_matrix.imag[:, 0] = imag
+            csi_matrices.append(complex_matrix)
+
+        return csi_matrices
+
+    @staticmethod
+    def parse_rows(csv_lines: list) -> list:
+        """
+            Parses the CSI for a block of CSV lines at once.
+
+            Parameters:
+                csv_lines {list} -- Split CSV lines, all with the same number of columns.
+
+            Returns:
+                csi_matrices {list} -- Matrix for each line, as would be produced by the constructor.
+        """
+        if len(csv_lines) == 0:
+            return []
+
+        columns = list(zip(*csv_lines))
+        if len(columns) == 9:
+            return ESP32CSIFrame.parse_separate_matrices_bulk(columns[7], columns[8])
+
+        return ESP32CSIFrame.parse_matrices(columns[-1])
+
+    @staticmethod
+    def get_row_mac(csv_line: list) -> str:
+        # Source MAC address of a line, as set by the constructor, without parsing its CSI.
+        if len(csv_line) == 3 or len(csv_line) == 4:
+            return "00:16:EA:12:34:56"
+        elif len(csv_line) == 5:
+            return csv_line[1]
+        elif len(csv_line) == 9:
+            return f"00:16:ea:{":".join(csv_line[0].split())}"
+
+        return csv_line[2]
+
+    @staticmethod
+    def get_row_antenna(csv_line: list) -> int:
+        # Antenna number of a line, as set by the constructor, without parsing its CSI.
+        if len(csv_line) in (3, 4, 5):
+            return 0
+        elif len(csv_line) == 9:
+            return int(csv_line[3])
+
+        return int(csv_line[19])
+
+    @staticmethod
+    def get_row_timestamp(csv_line: list):
+        # real_timestamp of a line, as set by the constructor, without parsing its CSI.
+        if len(csv_line) == 3 or len(csv_line) == 4:
+            return csv_line[0]
+        elif len(csv_line) == 5:
+            return int(csv_line[0])
+        elif len(csv_line) == 9:
+            return int(csv_line[1][:-3])
+
+        return float(csv_line[23])
+
+    @staticmethod
+    def get_row_rssi(csv_line: list) -> int:
+        # RSSI of a line, as set by the constructor, without parsing its CSI.
+        if len(csv_line) == 3 or len(csv_line) == 4:
+            return 0
+        elif len(csv_line) == 5:
+            return int(csv_line[2])
+        elif len(csv_line) == 9:
+            return int(csv_line[4])
+
+        return int(csv_line[3])
+
+    @staticmethod
+    def get_row_bandwidth(csv_line: list) -> int:
+        # Bandwidth of a line in MHz, as set by the constructor, without parsing its CSI.
+        if len(csv_line) == 3 or len(csv_line) == 4:
+            return 0
+        elif len(csv_line) == 5 or len(csv_line) == 9:
+            return 20
+
+        return 20 if csv_line[7] == "0" else 40
+
     # Seems some CSI lines are missing a value.
     # Very rare, I assume weird dropped behaviour.
     # Probably not the best way to fill the gap.
@@ -53,8 +53,7 @@ class IWLCSIFrame(CSIFrame):
         "agc",
         "antenna_sel",
         "length",
-        "rate",
-        "csi_matrix"
+        "rate"
     ]
     def __init__(self, header_block: list, csi_matrix: np.array):
         self.timestamp_low = header_block[0]
@@ -54,7 +54,6 @@ class IWLMVMCSIFrame(CSIFrame):
         "antenna_sel",
         "length",
         "rate",
-        "csi_matrix",
 
         "frame_container"
     ]
@@ -50,9 +50,7 @@ class NEXCSIFrame(CSIFrame):
         "chip",
 
         # T3rO temp
-        "agcGain",
-        
-        "csi_matrix"
+        "agcGain"
     ]
     def __init__(self, header_block: dict, csi_matrix: np.array):
         self.timestamp = header_block["timestamp"]
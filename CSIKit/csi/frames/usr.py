@@ -64,8 +64,7 @@ class USRPCSIFrame(CSIFrame):
         "rssi",
         "rssi_1",
         "rssi_2",
-        "rssi_3",
-        "csi_matrix"
+        "rssi_3"
     ]
 
     def __init__(self, frame_container: "FrameContainer"):
@@ -7,4 +7,4 @@ from CSIKit.reader.readers.read_pico import PicoScenesBeamformReader
 from CSIKit.reader.readers.read_pcap import NEXBeamformReader
 from CSIKit.reader.readers.read_feitcsi import FeitCSIBeamformReader
 
-from CSIKit.reader.reader_selector import get_reader
\ No newline at end of file
+from CSIKit.reader.reader_selector import get_reader, sniff
\ No newline at end of file
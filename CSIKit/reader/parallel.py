@@ -0,0 +1,320 @@
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from CSIKit.csi import CSIData, CSIFilter
+from CSIKit.reader import sources
+
+# Number of chunks a capture is split into for each worker process, so uneven chunks are balanced between them.
+CHUNKS_PER_WORKER = 4
+
+# Alignment of each CSI matrix within the file returned by a worker.
+SHARED_ALIGNMENT = 16
+
+
+class ParallelReader(ABC):
+    # Mixin for readers whose files can be split into chunks of records, each decoded in a separate process.
+
+    def read_parallel(self, path: str, workers: int, filter_mac: str = None, frame_filter: CSIFilter = None, **kwargs) -> CSIData:
+        """
+            Reads a file as read_file would, decoding chunks of it in parallel across a pool of processes.
+
+            Record boundaries are found first, and the file is split into chunks aligned on them.
+            Workers map files themselves, while buffers and file objects are first placed in shared memory.
+            Compressed captures and streams are decompressed into a temporary file one block at a time,
+            so they are never held in memory in full. Each worker writes its decoded CSI matrices to a
+            temporary file, which the frames returned are views of.
+
+            Parameters:
+                path {str} -- Path to a CSI file, or its contents as a buffer or binary file object.
+                workers {int} -- Number of worker processes.
+                filter_mac {str} -- Only keep frames from this source MAC address.
+                frame_filter {CSIFilter} -- Only keep frames meeting this filter. Workers do not decode frames failing
+                    its header criteria (see CSIFilter.get_header_filter), and the rest of it is applied as chunks are joined.
+
+            Returns:
+                csi_data {CSIData} -- Frames and timestamps, as they would be returned by read_file.
+        """
+        header_filter = CSIFilter.from_args(filter_mac, frame_filter)
+        if header_filter is not None:
+            header_filter = header_filter.get_header_filter()
+
+        spooled = is_spooled(path)
+        if spooled:
+            path = spool_source(path)
+
+        shared_input = None
+        futures = []
+        try:
+            data = memoryview(sources.read_source(path, memory_map=True))
+            chunks = self.get_chunks(data, workers * CHUNKS_PER_WORKER)
+
+            if isinstance(path, (str, os.PathLike)):
+                source = os.fspath(path)
+            else:
+                shared_input = SharedMemory(create=True, size=max(len(data), 1))
+                shared_input.buf[:len(data)] = data
+                source = shared_input.name
+
+            # Shared memory opened by workers is tracked by this process, so it is not released when they exit.
+            resource_tracker.ensure_running()
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(read_chunk_worker, type(self), source, shared_input is not None, len(data), chunk, dict(kwargs, frame_filter=header_filter)) for chunk in chunks]
+
+            chunk_data = import_chunks([future.result() for future in futures])
+        finally:
+            # Files written by workers are removed even if another chunk failed, as the frames only view their mappings.
+            for future in futures:
+                if not future.cancelled() and future.exception() is None:
+                    remove_file(future.result()[0])
+
+            if shared_input is not None:
+                shared_input.close()
+                shared_input.unlink()
+
+            if spooled:
+                remove_file(path)
+
+        self.rebase_timestamps(chunk_data)
+
+        return self.join_chunks(chunk_data, filter_mac, frame_filter)
+
+    @abstractmethod
+    def get_record_boundaries(self, data: bytes) -> np.array:
+        """
+            Finds the offsets within a file at which it can be split into chunks, for read_parallel.
+
+            Parameters:
+                data {bytes} -- Contents of the file.
+
+            Returns:
+                boundaries {np.array} -- Ascending int64 offsets, each the start of a record.
+        """
+
+    def get_chunks(self, data: bytes, count: int) -> list:
+        """
+            Splits a file into chunks for read_parallel, each decoded by read_chunk in a worker process.
+
+            By default, chunks are byte ranges split at the record boundaries nearest to evenly spaced
+            positions, with the first starting at the beginning of the file and the last ending at its end.
+
+            Parameters:
+                data {bytes} -- Contents of the file.
+                count {int} -- Maximum number of chunks.
+
+            Returns:
+                chunks {list} -- Picklable description of each chunk, in order.
+        """
+        boundaries = self.get_record_boundaries(data)
+        if len(boundaries) == 0:
+            return [(0, len(data))]
+
+        targets = np.linspace(0, len(data), count + 1)[1:-1]
+        indices = np.minimum(np.searchsorted(boundaries, targets), len(boundaries) - 1)
+
+        starts = np.unique(np.concatenate([[0], boundaries[indices]])).tolist()
+        ends = starts[1:] + [len(data)]
+
+        return list(zip(starts, ends))
+
+    @abstractmethod
+    def read_chunk(self, data: bytes, chunk, frame_filter: CSIFilter = None, **kwargs) -> CSIData:
+        """
+            Decodes one chunk of a file in a worker process, for read_parallel.
+
+            Frames not meeting frame_filter, which only holds criteria on each frame's own headers,
+            are pushed as None without decoding their CSI, so join_chunks can number the frames it keeps
+            as read_file would. Timestamps may be left for rebase_timestamps to adjust.
+
+            Parameters:
+                data {bytes} -- Contents of the whole file.
+                chunk -- Chunk description, as returned by get_chunks.
+                frame_filter {CSIFilter} -- Header criteria for the frames to decode, or None to decode every frame.
+
+            Returns:
+                csi_data {CSIData} -- Frames and timestamps within the chunk.
+        """
+
+    def rebase_timestamps(self, chunks: list):
+        # Adjusts the timestamps of each chunk in place, to those read_file would give for the whole file.
+        # Timestamps are kept as given by default.
+        pass
+
+    def join_chunks(self, chunks: list, filter_mac: str = None, frame_filter: CSIFilter = None) -> CSIData:
+        """
+            Joins the chunks decoded by read_parallel into a single CSIData.
+
+            Parameters:
+                chunks {list} -- CSIData for each chunk, in order.
+                filter_mac {str} -- Only keep frames from this source MAC address.
+                frame_filter {CSIFilter} -- Only keep frames meeting this filter.
+
+            Returns:
+                csi_data {CSIData} -- Frames and timestamps of every chunk.
+        """
+        ret_data = CSIData(self.filename, chunks[0].backend, filter_mac=filter_mac, frame_filter=frame_filter)
+
+        for chunk in chunks:
+            if not ret_data.bandwidth:
+                ret_data.bandwidth = chunk.bandwidth
+
+            if not ret_data.chipset:
+                ret_data.set_chipset(chunk.chipset)
+
+            ret_data.expected_frames += chunk.expected_frames
+            ret_data.skipped_frames += chunk.skipped_frames
+
+            for frame, timestamp in zip(chunk.frames, chunk.timestamps):
+                if frame is None:
+                    # Frames left undecoded by read_chunk are numbered, but never kept.
+                    ret_data.pushed_frames += 1
+                else:
+                    ret_data.push_frame(frame, timestamp)
+
+        return ret_data
+
+
+def read_chunk_worker(reader_class: type, source: str, shared: bool, size: int, chunk, kwargs: dict) -> tuple:
+    # Entry point for worker processes, which read the file from its path or from the named shared memory.
+    reader = reader_class()
+
+    shared_input = None
+    if shared:
+        shared_input = SharedMemory(name=source)
+        data = shared_input.buf[:size]
+    else:
+        with open(source, "rb") as file:
+            data = memoryview(sources.map_file(file))
+
+    result = export_chunk(reader.read_chunk(data, chunk, **kwargs))
+
+    if shared_input is not None:
+        data.release()
+        try:
+            shared_input.close()
+        except BufferError:
+            # Arrays still viewing the input are released along with the worker.
+            pass
+
+    return result
+
+
+def is_spooled(source) -> bool:
+    # Compressed captures and streams which cannot be mapped are decompressed into a temporary file by read_parallel.
+    if sources.get_compression(source) is not None:
+        return True
+
+    return hasattr(source, "read") and not hasattr(source, "getbuffer") and sources.is_stream(source)
+
+
+def spool_source(source) -> str:
+    """
+        Copies a compressed capture or stream into a temporary file, one block at a time.
+
+        Parameters:
+            source {str|bytes|file} -- Capture to copy, decompressing it where needed.
+
+        Returns:
+            path {str} -- Path of the temporary file, which the caller removes.
+    """
+    with sources.open_source(source) as file, tempfile.NamedTemporaryFile(prefix="csikit-", delete=False) as spooled:
+        try:
+            shutil.copyfileobj(file, spooled, sources.STREAM_BLOCK_SIZE)
+        except BaseException:
+            spooled.close()
+            remove_file(spooled.name)
+            raise
+
+    return spooled.name
+
+
+def export_chunk(csi_data: CSIData) -> tuple:
+    """
+        Moves the CSI matrices of a decoded chunk into a new temporary file.
+
+        Matrices are detached from their frames before the rest of the CSIData is pickled,
+        so they are neither pickled nor copied again through the pool.
+
+        Parameters:
+            csi_data {CSIData} -- Decoded chunk.
+
+        Returns:
+            path {str} -- Path of the temporary file.
+            size {int} -- Number of bytes used in the file.
+            layouts {list} -- (dtype, shape, offset) of each frame's matrix within the file, or None where it has none.
+            pickled {bytes} -- Pickled CSIData, without CSI matrices.
+    """
+    csi_matrices = [frame.csi_matrix if frame is not None else None for frame in csi_data.frames]
+
+    layouts = []
+    size = 0
+    for csi_matrix in csi_matrices:
+        if isinstance(csi_matrix, np.ndarray):
+            layouts.append((csi_matrix.dtype.str, csi_matrix.shape, size))
+            size += -(-csi_matrix.nbytes // SHARED_ALIGNMENT) * SHARED_ALIGNMENT
+        else:
+            layouts.append(None)
+
+    with tempfile.NamedTemporaryFile(prefix="csikit-", delete=False) as output:
+        try:
+            for frame, csi_matrix, layout in zip(csi_data.frames, csi_matrices, layouts):
+                if layout is not None:
+                    output.seek(layout[2])
+                    output.write(np.ascontiguousarray(csi_matrix).data)
+                    frame.csi_matrix = None
+
+            output.truncate(size)
+        except BaseException:
+            output.close()
+            remove_file(output.name)
+            raise
+
+    return output.name, size, layouts, pickle.dumps(csi_data, pickle.HIGHEST_PROTOCOL)
+
+
+def import_chunks(results: list) -> list:
+    """
+        Maps the files returned by workers, and unpickles each chunk.
+
+        Files are mapped copy-on-write, so CSI matrices are views of them which can still be modified,
+        and are not copied into memory again.
+
+        Parameters:
+            results {list} -- Values returned by export_chunk for each chunk.
+
+        Returns:
+            chunks {list} -- CSIData for each chunk, whose CSI matrices are views of the file returned for it.
+    """
+    chunks = []
+    for path, size, layouts, pickled in results:
+        csi_data = pickle.loads(pickled)
+
+        if size > 0:
+            with open(path, "rb") as file:
+                buffer = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_COPY)
+
+            for frame, layout in zip(csi_data.frames, layouts):
+                if layout is not None:
+                    dtype, shape, offset = layout
+                    frame.csi_matrix = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+
+        chunks.append(csi_data)
+
+    return chunks
+
+
+def remove_file(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
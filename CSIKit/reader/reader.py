@@ -1,4 +1,60 @@
-class Reader:
+from abc import ABC, abstractmethod
+
+from CSIKit.csi import CSIMetadata
+
+class Reader(ABC):
 
     def __init__(self):
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def iter_frames(self, path: str, batch_size: int = 1024, poll_interval: float = None, **kwargs):
+        """
+            Reads a file in batches of frames, without holding every frame in memory.
+
+            Each reader implements this over its own format. Keyword arguments, such as scaled,
+            are passed on as they would be to read_file.
+
+            Parameters:
+                path {str} -- Path to a CSI file.
+                batch_size {int} -- Maximum number of frames in each batch.
+                poll_interval {float} -- If given, seconds to wait between checks for appended data once
+                    the end of the file is reached, rather than stopping. See follow.
+
+            Yields:
+                batch {CSIBatch} -- CSI tensor, timestamps and header columns for up to batch_size frames.
+        """
+
+    def follow(self, path: str, poll_interval: float = 1.0, batch_size: int = 1024, **kwargs):
+        """
+            Reads a file which is still being written, yielding new frames as they are appended.
+
+            The offset following the last complete record is kept between polls, so only newly appended
+            data is parsed. A partially written record at the end of the file is left until it is complete.
+            Iteration does not end by itself, so the caller should stop consuming batches when done.
+
+            Parameters:
+                path {str} -- Path to a CSI file.
+                poll_interval {float} -- Seconds to wait between checks for appended data.
+                batch_size {int} -- Maximum number of frames in each batch.
+
+            Yields:
+                batch {CSIBatch} -- CSI tensor, timestamps and header columns for up to batch_size frames.
+        """
+        return self.iter_frames(path, batch_size, poll_interval=poll_interval, **kwargs)
+
+    def read_metadata(self, path: str, filter_mac: str = None) -> CSIMetadata:
+        """
+            Summarises a file as read_file(path).get_metadata() would, without decoding its CSI.
+
+            Frames are read lazily, so only the first frame's CSI is decoded to establish its shape.
+            Readers which can index their records override this to summarise a file from its headers alone.
+
+            Parameters:
+                path {str} -- Path to a CSI file, or its contents as a buffer or binary file object.
+                filter_mac {str} -- Only count frames from this source MAC address.
+
+            Returns:
+                metadata {CSIMetadata} -- Frame count, shape, timing and RSSI for the file.
+        """
+        return self.read_file(path, filter_mac=filter_mac, lazy=True).get_metadata()
@@ -1,15 +1,64 @@
+import os
+
+from functools import lru_cache
+
 from CSIKit.reader import ATHBeamformReader, CSVBeamformReader, IWLBeamformReader, NEXBeamformReader, PicoScenesBeamformReader, FeitCSIBeamformReader
-from CSIKit.reader import Reader
+from CSIKit.reader import Reader, sources
 
 READERS = [ATHBeamformReader, CSVBeamformReader, IWLBeamformReader, NEXBeamformReader, PicoScenesBeamformReader, FeitCSIBeamformReader]
 
+# Number of files whose detection results are kept.
+SNIFF_CACHE_SIZE = 1024
+
+@lru_cache(maxsize=SNIFF_CACHE_SIZE)
+def sniff_file(path: str, file_size: int, mtime_ns: int) -> tuple:
+    # Results are cached by size and modification time, so a file is only read again once it changes.
+    prefix = sources.read_prefix(path)
+
+    # Compressed files are identified from their decompressed contents, whose size is not known in advance.
+    if sources.get_compression(path) is not None:
+        path = sources.strip_compression_extension(path)
+        file_size = None
+
+    return tuple((reader, reader.sniff(path, prefix, file_size)) for reader in READERS)
+
+def sniff(path: str) -> dict:
+    """
+        Scores how likely a file is to belong to each supported format.
+
+        A single bounded prefix of the file is read and shared between every reader's detector,
+        so the cost does not depend on the size of the file.
+
+        Buffers and file objects may also be given, in which case their first bytes are peeked
+        without being consumed. Where a source has no file extension, formats are detected from
+        their contents alone. gzip, bz2 and xz compressed captures are detected after decompression.
+
+        Parameters:
+            path {str} -- Path to a CSI file, or its contents as a buffer or binary file object.
+
+        Returns:
+            confidences {dict} -- Confidence between 0 and 1 for each Reader class, in order of precedence.
+    """
+    if sources.is_buffer(path) or hasattr(path, "read"):
+        prefix, file_size = sources.peek_source(path)
+        name = sources.strip_compression_extension(sources.get_source_name(path))
+
+        return {reader: reader.sniff(name, prefix, file_size) for reader in READERS}
+
+    stat = os.stat(path)
+
+    return dict(sniff_file(os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+
 def get_reader(path: str) -> Reader:
-    for reader in READERS:
-        if reader.can_read(path):
-            return reader()
+    confidences = sniff(path)
+
+    # Where formats are equally likely, the first in READERS is selected.
+    reader, confidence = max(confidences.items(), key=lambda x: x[1])
+    if confidence > 0:
+        return reader()
 
     #If no reader was selected, manual selection should be encouraged.
     print("Unable to automatically select a reader.")
     print("Defaulting to Intel format.")
 
-    return IWLBeamformReader()
\ No newline at end of file
+    return IWLBeamformReader()
@@ -2,23 +2,26 @@ import struct
 
 class AbstractPicoScenesFrameSegment:
 
-    def __init__(self, data: bytes):
-        self.read_header(data)
+    # Segment length and name length, followed by the name itself and then the version.
+    PREFIX_STRUCT = struct.Struct("<IB")
+    VERSION_STRUCT = struct.Struct("<H")
 
-    def read_header(self, data: bytes):
-        self.subsegmentLength = struct.unpack("I", data[:4])[0]
-        pos = 4
+    def __init__(self, data: bytes, offset: int = 0):
+        self.read_header(data, offset)
 
-        self.subsegmentNameLength = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
+    def read_header(self, data: bytes, offset: int = 0):
+        self.subsegmentLength, self.subsegmentNameLength = self.PREFIX_STRUCT.unpack_from(data, offset)
+        pos = offset + self.PREFIX_STRUCT.size
 
-        self.subsegmentName = data[pos:pos + self.subsegmentNameLength].decode("ascii")
-        if data[pos + self.subsegmentNameLength - 1:pos + self.subsegmentNameLength] == b'\x00':
+        name_bytes = bytes(data[pos:pos + self.subsegmentNameLength])
+        self.subsegmentName = name_bytes.decode("ascii")
+        if name_bytes[-1:] == b'\x00':
             self.subsegmentName = self.subsegmentName[:-1]
 
         pos += self.subsegmentNameLength
 
-        self.subsegmentVersion = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
+        self.subsegmentVersion = self.VERSION_STRUCT.unpack_from(data, pos)[0]
+        pos += self.VERSION_STRUCT.size
 
-        self.pos = pos
\ No newline at end of file
+        # Position of the segment body, relative to the start of the segment.
+        self.pos = pos - offset
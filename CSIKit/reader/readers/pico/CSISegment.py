@@ -1,8 +1,6 @@
-from CSIKit.reader.readers.pico.utils import parse_with_relevant_parser
+from CSIKit.reader.readers.pico.utils import parse_with_relevant_parser, SegmentLayout
 from CSIKit.util import stringops, byteops
 
-from math import floor
-
 import numpy as np
 
 import struct
@@ -12,13 +10,78 @@ BITS_PER_COMPLEX_SYMBOL = 2 * BITS_PER_SYMBOL
 
 class CSISegment:
 
+    LAYOUTS = {
+        1: SegmentLayout([
+            ("deviceType", "H"),
+            ("packetFormat", "b"),
+            ("channelBandwidth", "H"),
+            ("carrierFreq", "Q"),
+            ("samplingRate", "Q"),
+            ("subcarrierBandwidth", "I"),
+            ("numTone", "H"),
+            ("numSTS", "B"),
+            ("numRx", "B"),
+            ("numESS", "B"),
+            ("antSelByte", "B"),
+            ("CSIBufferLength", "I"),
+        ]),
+        2: SegmentLayout([
+            ("deviceType", "H"),
+            ("packetFormat", "b"),
+            ("channelBandwidth", "H"),
+            ("carrierFreq", "Q"),
+            ("samplingRate", "Q"),
+            ("subcarrierBandwidth", "I"),
+            ("numTone", "H"),
+            ("numSTS", "B"),
+            ("numRx", "B"),
+            ("numESS", "B"),
+            ("antSelByte", "B"),
+            ("subcarrierIndexOffset", "H"),
+            ("CSIBufferLength", "I"),
+        ]),
+        3: SegmentLayout([
+            ("deviceType", "H"),
+            ("packetFormat", "b"),
+            ("channelBandwidth", "H"),
+            ("carrierFreq", "Q"),
+            ("samplingRate", "Q"),
+            ("subcarrierBandwidth", "I"),
+            ("numTone", "H"),
+            ("numSTS", "B"),
+            ("numRx", "B"),
+            ("numESS", "B"),
+            ("numCSI", "H"),
+            ("antSelByte", "B"),
+            ("subcarrierIndexOffset", "H"),
+            ("CSIBufferLength", "I"),
+        ]),
+        4: SegmentLayout([
+            ("deviceType", "H"),
+            ("firmwareVersion", "B"),
+            ("packetFormat", "b"),
+            ("channelBandwidth", "H"),
+            ("carrierFreq", "Q"),
+            ("samplingRate", "Q"),
+            ("subcarrierBandwidth", "I"),
+            ("numTone", "H"),
+            ("numSTS", "B"),
+            ("numRx", "B"),
+            ("numESS", "B"),
+            ("numCSI", "H"),
+            ("antSelByte", "B"),
+            ("subcarrierIndexOffset", "h"),
+            ("CSIBufferLength", "I"),
+        ])
+    }
+
     SignalMatrixStorageMajority = {
         "R": "RowMajority",
         "C": "ColumnMajority",
         "U": "UndefinedMajority"
     }
 
-    def __init__(self, data: bytes, version: int):
+    def __init__(self, data: bytes, version: int, header: dict = None, lazy: bool = False):
         VERSION_MAP = {
             1: self.parseV1or2,
             2: self.parseV1or2,
@@ -27,54 +90,19 @@ class CSISegment:
         }
 
         self.version = version
+        self.lazy = lazy
+        self.csi_payload = None
 
-        parse_with_relevant_parser(VERSION_MAP, version, data, self.__class__.__name__)
+        parse_with_relevant_parser(VERSION_MAP, version, data, self.__class__.__name__, header)
 
     def parseQCA9300CSIData(self, data: bytes, pos: int):
 
         num_tones = self.numTone
         nc = self.numSTS
         nr = self.numRx
-        csi_buf = data[pos:]
-
-        csi = np.empty((num_tones, nc, nr), dtype=complex)
-
-        bitmask = (1 << BITS_PER_SYMBOL) - 1
-        idx = 0
-        bits_left = 16
-
-        h_data = csi_buf[idx]
-        idx += 1
-        h_data += (csi_buf[idx] << 8)
-        idx += 1
-        current_data = h_data & ((1 << 16) - 1)
-
-        for k in range(num_tones):
-            for nc_idx in range(nc):
-                for nr_idx in range(nr):
-                    if (bits_left - BITS_PER_SYMBOL) < 0:
-                        current_data, idx, bits_left = byteops.get_next_bits(csi_buf, current_data, idx, bits_left)
-
-                    imag = current_data & bitmask
-                    imag = byteops.signbit_convert(imag, BITS_PER_SYMBOL)
-                    imag += 1
-
-                    bits_left -= BITS_PER_SYMBOL
-                    current_data = current_data >> BITS_PER_SYMBOL
-
-                    if (bits_left - BITS_PER_SYMBOL) < 0:
-                        current_data, idx, bits_left = byteops.get_next_bits(csi_buf, current_data, idx, bits_left)
-
-                    real = current_data & bitmask
-                    real = byteops.signbit_convert(real, BITS_PER_SYMBOL)
-                    real += 1
-
-                    bits_left -= BITS_PER_SYMBOL
-                    current_data = current_data >> BITS_PER_SYMBOL
+        csi_buf = np.frombuffer(data[pos:], dtype=np.uint8)
 
-                    csi[k, nc_idx, nr_idx] = complex(real, imag)
-
-        self.parsed_csi = csi
+        self.parsed_csi = byteops.unpack_10bit_csi(csi_buf, num_tones, nc, nr)
 
     def parseIWL5300CSIData(self, data: bytes, pos: int):
         self.actualNumSTSPerChain = (self.CSIBufferLength - 12) / 60 / self.numRx
@@ -85,53 +113,14 @@ class CSISegment:
         nrx = int(self.numRx)
         ant_sel = int(self.antSelByte)
 
-        csi = np.zeros((30, nrx, ntx), dtype=np.complex64)
-
-        perm = np.array([0, 1, 2])
-        if sum(perm) == nrx:
-            perm[0] = ((ant_sel) & 0x3)
-            perm[1] = ((ant_sel >> 2) & 0x3)
-            perm[2] = ((ant_sel >> 4) & 0x3)
-
-        index = 0
-        for i in range(30):
-            index += 3
-            remainder = index % 8
-            for j in range(nrx):
-                for k in range(ntx):
-                    ind8 = floor(index / 8)
-
-                    if ind8 + 2 >= len(payload):
-                        break
-
-                    real = (payload[ind8] >> remainder) | (payload[1 + ind8] << (8 - remainder))
-                    imag = (payload[1 + ind8] >> remainder) | (payload[2 + ind8] << (8 - remainder))
-
-                    real = np.int8(real)
-                    imag = np.int8(imag)
+        perm = byteops.get_iwl5300_permutation(ant_sel, nrx)
+        csi = byteops.unpack_iwl5300(np.frombuffer(payload, dtype=np.uint8), nrx, ntx, perm)
 
-                    complex_no = real + imag * 1j
-
-                    csi[i][perm[j]][k] = complex_no
-
-                    index += 16
-
-        self.parsed_csi = csi
+        self.parsed_csi = csi[0]
 
     def parseIWLMVMCSIData(self, data: bytes, pos: int):
         # total_tones = self.numRx * self.numSTS * self.numTone
-        csi_matrix = np.zeros((self.numTone, self.numRx, self.numSTS), dtype=complex)
-
-        for j in range(self.numRx):
-            for k in range(self.numSTS):
-                for n in range(self.numTone):
-                    real = struct.unpack("h", data[pos:pos + 2])[0]
-                    imag = struct.unpack("h", data[pos + 2:pos + 4])[0]
-                    pos += 4
-
-                    csi_matrix[n, j, k] = complex(real, imag)
-
-        self.parsed_csi = csi_matrix
+        self.parsed_csi = byteops.unpack_int16_csi(memoryview(data)[pos:], self.numTone, self.numRx, self.numSTS)
 
     def parseUSRPCSIData(self, data: bytes, pos: int):
         csi_array_length = self.CSIBufferLength - 2 * self.numTone
@@ -211,159 +200,48 @@ class CSISegment:
 
         self.parsed_csi = signal_array
 
-    def parseV1or2(self, data: bytes):
-        self.deviceType = struct.unpack("H", data[:2])[0]
-        pos = 2
-
-        self.packetFormat = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.channelBandwidth = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.carrierFreq = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.samplingRate = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.subcarrierBandwidth = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        self.numTone = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.numSTS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numRx = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numESS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
+    def parseV1or2(self, data: bytes, header: dict = None):
+        pos = self.LAYOUTS[self.version].read_into(self, data, header)
 
         self.numCSI = 1
-
-        self.antSelByte = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        if self.version == 2:
-            self.subcarrierIndexOffset = struct.unpack("H", data[pos:pos + 2])[0]
-            pos += 2
-        else:
+        if self.version != 2:
             self.subcarrierIndexOffset = 0
 
-        self.CSIBufferLength = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        if self.deviceType == 0x1234:
-            self.parseUSRPCSIData(data, pos)
-        elif self.deviceType == 0x5300:
-            self.parseIWL5300CSIData(data, pos)
-        elif self.deviceType == 0x9300:
-            self.parseQCA9300CSIData(data, pos)
-
-    def parseV3(self, data: bytes):
-        self.deviceType = struct.unpack("H", data[:2])[0]
-        pos = 2
-
-        self.packetFormat = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.channelBandwidth = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.carrierFreq = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.samplingRate = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.subcarrierBandwidth = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        self.numTone = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
+        self.parseOrDeferCSIData(data, pos)
 
-        self.numSTS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
+    def parseV3(self, data: bytes, header: dict = None):
+        pos = self.LAYOUTS[3].read_into(self, data, header)
+        self.parseOrDeferCSIData(data, pos)
 
-        self.numRx = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
+    def parseV4(self, data: bytes, header: dict = None):
+        pos = self.LAYOUTS[4].read_into(self, data, header)
+        self.parseOrDeferCSIData(data, pos)
 
-        self.numESS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
+    def parseOrDeferCSIData(self, data: bytes, pos: int):
+        # USRP payloads also carry subcarrier indices, so they are always parsed up front.
+        if not self.lazy or self.deviceType == 0x1234:
+            return self.parseCSIData(data, pos)
 
-        self.numCSI = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
+        if self.deviceType == 0x5300:
+            self.actualNumSTSPerChain = (self.CSIBufferLength - 12) / 60 / self.numRx
 
-        self.antSelByte = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
+        self.parsed_csi = None
+        self.csi_payload = data[pos:]
 
-        self.subcarrierIndexOffset = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
+    def decode_csi(self, payload: bytes) -> np.array:
+        # Parses a payload deferred by parseOrDeferCSIData, without keeping a reference to the result.
+        self.parseCSIData(payload, 0)
 
-        self.CSIBufferLength = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
+        csi = self.parsed_csi
+        self.parsed_csi = None
 
-        if self.deviceType == 0x1234:
-            self.parseUSRPCSIData(data, pos)
-        elif self.deviceType == 0x2000 or self.deviceType == 0x2100:
-            self.parseIWLMVMCSIData(data, pos)
-        elif self.deviceType == 0x5300:
-            self.parseIWL5300CSIData(data, pos)
-        elif self.deviceType == 0x9300:
-            self.parseQCA9300CSIData(data, pos)
-
-    def parseV4(self, data: bytes):
-        self.deviceType = struct.unpack("H", data[:2])[0]
-        pos = 2
-
-        self.firmwareVersion = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.packetFormat = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.channelBandwidth = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.carrierFreq = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.samplingRate = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.subcarrierBandwidth = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        self.numTone = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.numSTS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numRx = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numESS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numCSI = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.antSelByte = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.subcarrierIndexOffset = struct.unpack("h", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.CSIBufferLength = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
+        return csi
 
+    def parseCSIData(self, data: bytes, pos: int):
         if self.deviceType == 0x1234:
             self.parseUSRPCSIData(data, pos)
-        elif self.deviceType == 0x2000 or self.deviceType == 0x2100:
+        elif (self.deviceType == 0x2000 or self.deviceType == 0x2100) and self.version >= 3:
+            # AX200/AX210 CSI is only parsed from version 3 onwards.
             self.parseIWLMVMCSIData(data, pos)
         elif self.deviceType == 0x5300:
             self.parseIWL5300CSIData(data, pos)
@@ -1,64 +1,36 @@
-from CSIKit.reader.readers.pico.utils import parse_with_relevant_parser
-from CSIKit.util import stringops
-
-import struct
+from CSIKit.reader.readers.pico.utils import parse_with_relevant_parser, SegmentLayout
 
 class MVMExtraSegment:
 
-    def __init__(self, data: bytes, version: int):
+    LAYOUTS = {
+        1: SegmentLayout([
+            (None, "H"), # length
+            ("iqDataSize", "I"),
+            (None, "4x"), # reserved
+            ("ftmClock", "I"),
+            # ("samplingTick2", "I"),
+            (None, "40x"), # reserved12_52[40]
+            ("numTones", "I"),
+            ("reserved56", "I"),
+            ("rssi1", "I"),
+            ("rssi2", "I"),
+            ("sourceAddress", "6B"),
+            ("addressPadding", "H"),
+            ("csiSequence", "B"),
+            (None, "11x"), # reserved77[11]
+            ("muClock", "I"),
+        ])
+    }
+
+    def __init__(self, data: bytes, version: int, header: dict = None):
         VERSION_MAP = {
             1: self.parseV1,
         }
 
-        parse_with_relevant_parser(VERSION_MAP, version, data, self.__class__.__name__)
-
-    def parseV1(self, data: bytes):
-        pos = 0
-
-        length = struct.unpack("H", data[:pos+2])[0]
-        pos += 2
-
-        self.iqDataSize = struct.unpack("I", data[pos:pos+4])[0]
-        pos += 4
-
-        # reserved 4 bytes
-        pos += 4
-
-        self.ftmClock = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        # self.samplingTick2 = struct.unpack("I", data[pos:pos + 4])[0]
-        # pos += 4
-
-        # reserved12_52[40]
-        pos += 40
-
-        self.numTones = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        self.reserved56 = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        self.rssi1 = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        self.rssi2 = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        self.sourceAddress = struct.unpack(">BBBBBB", data[pos:pos + 6])
-        pos += 6
-
-        self.addressPadding = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.csiSequence = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        # reserved77[11]
-        pos += 11
+        parse_with_relevant_parser(VERSION_MAP, version, data, self.__class__.__name__, header)
 
-        self.muClock = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
+    def parseV1(self, data: bytes, header: dict = None):
+        pos = self.LAYOUTS[1].read_into(self, data, header)
 
         #
         # uint32_t
@@ -1,23 +1,14 @@
 import struct
 
 class ModularPicoScenesFrame:
-    SIZE = 11
+    HEADER_STRUCT = struct.Struct("<IIHB")
+    SIZE = HEADER_STRUCT.size
 
-    def __init__(self, data: bytes):
-        self.parse_header(data)
+    def __init__(self, data: bytes, offset: int = 0):
+        self.parse_header(data, offset)
 
-    def parse_header(self, data: bytes):
-        self.frameLength = struct.unpack("I", data[:4])[0]
-        pos = 4
-
-        self.magicWord = struct.unpack("I", data[pos:pos + 4])[0]
-        pos += 4
-
-        self.frameVersion = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.numRxSegments = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
+    def parse_header(self, data: bytes, offset: int = 0):
+        self.frameLength, self.magicWord, self.frameVersion, self.numRxSegments = self.HEADER_STRUCT.unpack_from(data, offset)
 
         # if self.frameLength != len(data):
         #     self.log_exception("Invalid length")
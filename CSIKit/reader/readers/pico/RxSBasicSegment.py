@@ -1,10 +1,90 @@
-import struct
-
-from CSIKit.reader.readers.pico.utils import parse_with_relevant_parser
+from CSIKit.reader.readers.pico.utils import parse_with_relevant_parser, SegmentLayout
 
 class RxSBasicSegment:
 
-    def __init__(self, data: bytes, version: int):
+    LAYOUTS = {
+        1: SegmentLayout([
+            ("deviceType", "H"),
+            ("timestamp", "Q"),
+            ("channelFreq", "H"),
+            ("packetFormat", "B"),
+            ("cbw", "H"),
+            ("guardInterval", "H"),
+            ("mcs", "B"),
+            ("numSTS", "B"),
+            ("numESS", "B"),
+            ("numRx", "B"),
+            ("noiseFloor", "b"),
+            ("rssi", "b"),
+            ("rssi_ctl0", "b"),
+            ("rssi_ctl1", "b"),
+            ("rssi_ctl2", "b"),
+        ]),
+        2: SegmentLayout([
+            ("deviceType", "H"),
+            ("timestamp", "Q"),
+            ("channelFreq", "H"),
+            ("packetFormat", "B"),
+            ("cbw", "H"),
+            ("guardInterval", "H"),
+            ("mcs", "B"),
+            ("numSTS", "B"),
+            ("numESS", "B"),
+            ("numRx", "B"),
+            ("numUser", "B"),
+            ("userIndex", "B"),
+            ("noiseFloor", "b"),
+            ("rssi", "b"),
+            ("rssi_ctl0", "b"),
+            ("rssi_ctl1", "b"),
+            ("rssi_ctl2", "b"),
+        ]),
+        3: SegmentLayout([
+            ("deviceType", "H"),
+            ("timestamp", "Q"),
+            ("centerFreq", "H"),
+            ("controlFreq", "H"),
+            ("cbw", "H"),
+            ("packetFormat", "B"),
+            ("pkt_cbw", "H"),
+            ("guardInterval", "H"),
+            ("mcs", "B"),
+            ("numSTS", "B"),
+            ("numESS", "B"),
+            ("numRx", "B"),
+            ("numUser", "B"),
+            ("userIndex", "B"),
+            ("noiseFloor", "b"),
+            ("rssi", "b"),
+            ("rssi_ctl0", "b"),
+            ("rssi_ctl1", "b"),
+            ("rssi_ctl2", "b"),
+        ]),
+        4: SegmentLayout([
+            ("deviceType", "H"),
+            ("timestamp", "Q"),
+            ("systemtime", "Q"),
+            ("centerFreq", "H"),
+            ("controlFreq", "H"),
+            ("cbw", "H"),
+            ("packetFormat", "B"),
+            ("pkt_cbw", "H"),
+            ("guardInterval", "H"),
+            ("mcs", "B"),
+            ("numSTS", "B"),
+            ("numESS", "B"),
+            ("numRx", "B"),
+            ("numUser", "B"),
+            ("userIndex", "B"),
+            ("noiseFloor", "b"),
+            ("rssi", "b"),
+            ("rssi_ctl0", "b"),
+            ("rssi_ctl1", "b"),
+            ("rssi_ctl2", "b"),
+        ])
+    }
+
+    def __init__(self, data: bytes, version: int, header: dict = None):
         VERSION_MAP = {
             1: self.parseV1,
             2: self.parseV2,
@@ -12,236 +92,19 @@ class RxSBasicSegment:
             4: self.parseV4
         }
 
-        parse_with_relevant_parser(VERSION_MAP, version, data, self.__class__.__name__)
-
-    def parseV1(self, data: bytes):
-        pos = 0
-
-        self.deviceType = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.timestamp = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.channelFreq = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.packetFormat = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.cbw = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.guardInterval = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.mcs = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
+        parse_with_relevant_parser(VERSION_MAP, version, data, self.__class__.__name__, header)
 
-        self.numSTS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numESS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numRx = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
+    def parseV1(self, data: bytes, header: dict = None):
+        self.LAYOUTS[1].read_into(self, data, header)
 
         self.numUser = 0
         self.userIndex = 0
 
-        self.noiseFloor = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl0 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl1 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl2 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-    def parseV2(self, data: bytes):
-        pos = 0
-
-        self.deviceType = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.timestamp = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.channelFreq = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.packetFormat = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.cbw = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.guardInterval = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.mcs = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numSTS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numESS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numRx = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numUser = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.userIndex = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.noiseFloor = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl0 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl1 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl2 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-    def parseV3(self, data: bytes):
-        pos = 0
-
-        self.deviceType = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.timestamp = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.centerFreq = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.controlFreq = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.cbw = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.packetFormat = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.pkt_cbw = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.guardInterval = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.mcs = struct.unpack("B", data[pos:pos + 1])[0]
-        if self.mcs != 4:
-            x = 0
-        pos += 1
-
-        self.numSTS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numESS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numRx = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numUser = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.userIndex = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.noiseFloor = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl0 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl1 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl2 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-    def parseV4(self, data: bytes):
-        pos = 0
-
-        self.deviceType = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.timestamp = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.systemtime = struct.unpack("Q", data[pos:pos + 8])[0]
-        pos += 8
-
-        self.centerFreq = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.controlFreq = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.cbw = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.packetFormat = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.pkt_cbw = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.guardInterval = struct.unpack("H", data[pos:pos + 2])[0]
-        pos += 2
-
-        self.mcs = struct.unpack("B", data[pos:pos + 1])[0]
-        if self.mcs != 4:
-            x = 0
-        pos += 1
-
-        self.numSTS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numESS = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numRx = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.numUser = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.userIndex = struct.unpack("B", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.noiseFloor = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
-
-        self.rssi_ctl0 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
+    def parseV2(self, data: bytes, header: dict = None):
+        self.LAYOUTS[2].read_into(self, data, header)
 
-        self.rssi_ctl1 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
+    def parseV3(self, data: bytes, header: dict = None):
+        self.LAYOUTS[3].read_into(self, data, header)
 
-        self.rssi_ctl2 = struct.unpack("b", data[pos:pos + 1])[0]
-        pos += 1
\ No newline at end of file
+    def parseV4(self, data: bytes, header: dict = None):
+        self.LAYOUTS[4].read_into(self, data, header)
@@ -1,8 +1,130 @@
-def parse_with_relevant_parser(version_map: dict, version: int, data: bytes, segment_name: str):
-    if version in version_map:
-        return version_map[version](data)
-    else:
+import struct
+
+import numpy as np
+
+def parse_with_relevant_parser(version_map: dict, version: int, data: bytes, segment_name: str, header: dict = None):
+    if version not in version_map:
         latest_version = max(version_map.keys())
         print(f"Parser for version {version} of {segment_name} is not available.")
         print(f"Defaulting to parser for latest version {latest_version} of {segment_name} instead.")
-        return version_map[latest_version](data)
+        version = latest_version
+
+    # Headers decoded in bulk are only passed on when available.
+    if header is not None:
+        return version_map[version](data, header)
+
+    return version_map[version](data)
+
+def get_relevant_version(version_map: dict, version: int) -> int:
+    # Matches the fallback used by parse_with_relevant_parser, without printing.
+    return version if version in version_map else max(version_map.keys())
+
+class SegmentLayout:
+    """
+        Declarative layout for the fixed-size header of a PicoScenes segment.
+
+        Fields are given as (name, format) pairs using little-endian struct format characters,
+        and are compiled once into a single struct.Struct and an equivalent NumPy dtype.
+        Fields named None are skipped, and a repeat count (e.g. "6B") produces a tuple.
+    """
+
+    DTYPES = {
+        "b": "i1",
+        "B": "u1",
+        "h": "<i2",
+        "H": "<u2",
+        "i": "<i4",
+        "I": "<u4",
+        "q": "<i8",
+        "Q": "<u8"
+    }
+
+    def __init__(self, fields: list):
+        self.fields = fields
+        self.struct = struct.Struct("<" + "".join(fmt for _, fmt in fields))
+        self.size = self.struct.size
+
+        self.names = []
+        self.counts = []
+
+        # Values produced by struct for each field, including those which are skipped.
+        self.value_names = []
+        self.value_counts = []
+
+        dtype_formats = []
+        dtype_offsets = []
+
+        offset = 0
+        for name, fmt in fields:
+            field_struct = struct.Struct("<" + fmt)
+            count = len(field_struct.unpack(bytes(field_struct.size)))
+
+            self.value_names.append(name)
+            self.value_counts.append(count)
+
+            if count > 0 and name is not None:
+                self.names.append(name)
+                self.counts.append(count)
+
+                dtype = self.DTYPES[fmt[-1]]
+                dtype_formats.append(dtype if count == 1 else (dtype, count))
+                dtype_offsets.append(offset)
+
+            offset += field_struct.size
+
+        self.dtype = np.dtype({
+            "names": self.names,
+            "formats": dtype_formats,
+            "offsets": dtype_offsets,
+            "itemsize": self.size
+        })
+
+    def unpack(self, data: bytes, offset: int = 0) -> dict:
+        values = self.struct.unpack_from(data, offset)
+
+        header = {}
+        pos = 0
+        for name, count in zip(self.value_names, self.value_counts):
+            if name is not None and count > 0:
+                header[name] = values[pos] if count == 1 else values[pos:pos + count]
+            pos += count
+
+        return header
+
+    def unpack_bulk(self, data: bytes, offsets: np.array) -> np.array:
+        """
+            Decodes the header at each of the given offsets in a single pass.
+
+            Parameters:
+                data {bytes} -- Buffer containing the segments.
+                offsets {np.array} -- Offset of each segment header within data.
+
+            Returns:
+                headers {np.array} -- Structured array of this layout's dtype.
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        rows = np.frombuffer(data, dtype=np.uint8)[offsets[:, np.newaxis] + np.arange(self.size)]
+
+        return np.ascontiguousarray(rows).view(self.dtype)[:, 0]
+
+    def to_dicts(self, headers: np.array) -> list:
+        # Converts bulk-decoded headers into the dicts produced by unpack.
+        repeated = [name for name, count in zip(self.names, self.counts) if count > 1]
+
+        header_dicts = []
+        for row in headers.tolist():
+            header = dict(zip(self.names, row))
+            for name in repeated:
+                header[name] = tuple(header[name])
+            header_dicts.append(header)
+
+        return header_dicts
+
+    def read_into(self, segment, data: bytes, header: dict = None) -> int:
+        # Sets each header field as an attribute of the segment, returning the position following the header.
+        if header is None:
+            header = self.unpack(data)
+
+        segment.__dict__.update(header)
+
+        return self.size
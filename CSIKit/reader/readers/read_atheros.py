@@ -1,11 +1,14 @@
 import collections
 import os
 import struct
-from math import floor
 
-from CSIKit.csi import CSIData
+from functools import partial
+
+from CSIKit.csi import CSIBatch, CSIData, CSIFilter, CSIMetadata
+from CSIKit.csi.csiframe import CSIMemoryBudget
 from CSIKit.csi.frames import ATHCSIFrame
-from CSIKit.reader import Reader
+from CSIKit.reader import Reader, sources
+from CSIKit.reader.parallel import ParallelReader
 from CSIKit.util import byteops, csitools
 
 import numpy as np
@@ -19,7 +22,10 @@ HEADER_FORMAT = collections.namedtuple("frame_header", ["timestamp", "csi_length
 BITS_PER_SYMBOL = 10
 BITS_PER_COMPLEX_SYMBOL = 2 * BITS_PER_SYMBOL
 
-class ATHBeamformReader(Reader):
+# Upper bound on the number of payloads gathered into memory for a single decode pass.
+DECODE_BATCH_SIZE = 65536
+
+class ATHBeamformReader(Reader, ParallelReader):
 
     def __init__(self):
         pass
@@ -27,87 +33,78 @@ class ATHBeamformReader(Reader):
     @staticmethod
     def can_read(path: str) -> bool: 
         if os.path.exists(path) and os.path.splitext(path)[1] == ".dat":
-            data = open(path, "rb").read()
-            if len(data) < 30:
-                return False
-
-            header_block = HEADER_FORMAT._make(HEADER_STRUCT_LE(data[2:27]))
-            if header_block is None:
-                return False
-
-            tx_antenna_count = header_block.nc
-            rx_antenna_count = header_block.nr
-
-            # Looking for a quick heuristic for identifying if the first frame is valid.
-            # Here we're interpreting the first frame's header as we regularly would.
-            # https://wands.sg/research/wifi/AtherosCSI/document/Atheros-CSI-Tool-User-Guide.pdf
-            # ^ This document says at most 3 tx and 3 rx antennas can be used.
-            # So we want to check both antenna counts are between 1 and 3.
-            tx_valid = tx_antenna_count >= 1 and tx_antenna_count <= 3
-            rx_valid = rx_antenna_count >= 1 and rx_antenna_count <= 3
-
-            return tx_valid and rx_valid
+            return ATHBeamformReader.sniff(path, sources.read_prefix(path), os.path.getsize(path)) > 0
 
         return False
 
     @staticmethod
-    def read_bfee(csi_buf: bytes, nr: int, nc: int, num_tones: int, scaled: bool=False) -> np.array:
-
-        csi = np.empty((num_tones, nc, nr), dtype=complex)
-
-        bitmask = (1 << BITS_PER_SYMBOL) - 1
-        idx = 0
-        bits_left = 16
-        
-        h_data = csi_buf[idx]
-        idx += 1
-        h_data += (csi_buf[idx] << 8)
-        idx += 1
-        current_data = h_data & ((1 << 16) - 1)
-        
-        for k in range(num_tones):
-            for nc_idx in range(nc):
-                for nr_idx in range(nr):
-                    if (bits_left - BITS_PER_SYMBOL) < 0:
-                        current_data, idx, bits_left = byteops.get_next_bits(csi_buf, current_data, idx, bits_left)
-
-                    imag = current_data & bitmask
-                    imag = byteops.signbit_convert(imag, BITS_PER_SYMBOL)
-                    imag += 1
-
-                    bits_left -= BITS_PER_SYMBOL
-                    current_data = current_data >> BITS_PER_SYMBOL
-
-                    if (bits_left - BITS_PER_SYMBOL) < 0:
-                        current_data, idx, bits_left = byteops.get_next_bits(csi_buf, current_data, idx, bits_left)
-
-                    real = current_data & bitmask
-                    real = byteops.signbit_convert(real, BITS_PER_SYMBOL)
-                    real += 1
-
-                    bits_left -= BITS_PER_SYMBOL
-                    current_data = current_data >> BITS_PER_SYMBOL
-
-                    csi[k, nc_idx, nr_idx] = complex(real, imag)
+    def sniff(path: str, prefix: bytes, file_size: int) -> float:
+        """
+            Scores how likely a file is to have been generated by the Atheros CSI Tool, using only its first bytes.
+
+            Parameters:
+                path {str} -- Path to the file, used for its extension.
+                prefix {bytes} -- First bytes of the file.
+                file_size {int} -- Size of the whole file.
+
+            Returns:
+                confidence {float} -- Value between 0 (not Atheros) and 1.
+        """
+        # Sources without an extension, such as buffers and pipes, are identified from their contents alone.
+        if os.path.splitext(path)[1] not in [".dat", ""] or len(prefix) < 30:
+            return 0
+
+        header_block = HEADER_FORMAT._make(HEADER_STRUCT_LE(prefix[2:27]))
+
+        tx_antenna_count = header_block.nc
+        rx_antenna_count = header_block.nr
+
+        # Looking for a quick heuristic for identifying if the first frame is valid.
+        # Here we're interpreting the first frame's header as we regularly would.
+        # https://wands.sg/research/wifi/AtherosCSI/document/Atheros-CSI-Tool-User-Guide.pdf
+        # ^ This document says at most 3 tx and 3 rx antennas can be used.
+        # So we want to check both antenna counts are between 1 and 3.
+        tx_valid = tx_antenna_count >= 1 and tx_antenna_count <= 3
+        rx_valid = rx_antenna_count >= 1 and rx_antenna_count <= 3
+
+        if not (tx_valid and rx_valid):
+            return 0
+
+        # A CSI length matching the tone and antenna counts is much less likely to be a coincidence.
+        # Lengths are given in bytes, while the decoder reads whole 16-bit words.
+        no_bits = 2 * header_block.num_tones * tx_antenna_count * rx_antenna_count * BITS_PER_SYMBOL
+        required_length = ATHBeamformReader.get_required_length(header_block.num_tones, tx_antenna_count, rx_antenna_count)
+        if -(-no_bits // 8) <= header_block.csi_length <= required_length:
+            return 0.9
+
+        return 0.5
 
-        return csi
-
-    def read_file(self, path: str, scaled: bool = False, filter_mac: str=None) -> CSIData:
-
-        self.filename = os.path.basename(path)
-        if not os.path.exists(path):
-            raise Exception("File not found: {}".format(path))
+    @staticmethod
+    def read_bfee(csi_buf: bytes, nr: int, nc: int, num_tones: int, scaled: bool=False) -> np.array:
+        return byteops.unpack_10bit_csi(np.frombuffer(csi_buf, dtype=np.uint8), num_tones, nc, nr)
 
-        data = open(path, "rb").read()
+    @staticmethod
+    def walk_records(data: bytes, cursor: int = 0, max_records: int = None, complete: bool = False, end: int = None) -> tuple:
+        """
+            Walks the records of an Atheros CSI Tool file from the given position, without decoding any CSI.
+
+            Parameters:
+                data {bytes} -- Contents of a file generated by the Atheros CSI Tool.
+                cursor {int} -- Position of the record to start from.
+                max_records {int} -- Number of records with CSI after which to stop. Defaults to the end of the file.
+                complete {bool} -- Whether to stop at a record which has not been completely written,
+                    rather than reading the part which is available.
+                end {int} -- Position at which to stop, which should be the start of a record. Defaults to the end of the file.
+
+            Returns:
+                header_blocks {list} -- HEADER_FORMAT tuple for each record with CSI.
+                payload_offsets {list} -- Offset of each record's CSI payload.
+                bandwidth {int} -- Bandwidth indicated by the first header walked, or None if there were none.
+                cursor {int} -- Position of the next record.
+                finished {bool} -- Whether the end of the file has been reached.
+        """
         length = len(data)
 
-        ret_data = CSIData(self.filename, "Atheros CSI Tool", "QCA93XX", filter_mac=filter_mac)
-
-        cursor = 0
-        expected_count = 0
-
-        initial_timestamp = 0
-
         # first_byte = data[cursor:cursor+1]
 
         # if first_byte == b'\xff': # This is a holdout from a weird version of the format I found. Likely not used now.
@@ -120,51 +117,340 @@ class ATHBeamformReader(Reader):
 
         struct_type = HEADER_STRUCT_LE
 
-        while cursor < (length - 4):
+        header_blocks = []
+        payload_offsets = []
+        bandwidth = None
+
+        while cursor < (length - 4) and (end is None or cursor < end):
+            if max_records is not None and len(header_blocks) == max_records:
+                return header_blocks, payload_offsets, bandwidth, cursor, False
+
             field_length = SIZE_STRUCT(data[cursor:cursor+2])[0]
             
             if (cursor + field_length) > length:
                 break
 
+            # field_length excludes its own 2 bytes, and the 25 byte header is read regardless of it.
+            if complete and (cursor + max(field_length, 25) + 2) > length:
+                break
+
             cursor += 2
 
             header_block = HEADER_FORMAT._make(struct_type(data[cursor:cursor+25]))
             cursor += 25
 
-            # Grabbing the bandwidth for the CSIData object using the boolean in the first Atheros frame.
-            if ret_data.bandwidth == 0:
-                ret_data.bandwidth = 20 if header_block.bandwidth == 0 else 40
+            if bandwidth is None:
+                bandwidth = 20 if header_block.bandwidth == 0 else 40
 
             # if header_block.csi_length > 0:
-            data_block = data[cursor:cursor+header_block.csi_length]
-            if len(data_block) <= 0:
+            if header_block.csi_length <= 0 or cursor >= length:
                 continue
 
-            try:
-                csi_matrix = ATHBeamformReader.read_bfee(data_block, header_block.nr, header_block.nc, header_block.num_tones)
-                if csi_matrix is not None:
+            header_blocks.append(header_block)
+            payload_offsets.append(cursor)
+
+            cursor += header_block.csi_length
+
+            if header_block.payload_length > 0:
+                cursor += header_block.payload_length
+
+            if cursor + 420 > length:
+                break
+
+        return header_blocks, payload_offsets, bandwidth, cursor, True
+
+    @staticmethod
+    def get_required_length(num_tones: int, nc: int, nr: int) -> int:
+        return byteops.get_10bit_csi_length(num_tones, nc, nr)
+
+    @staticmethod
+    def get_timestamps(data: bytes, header_blocks: list, payload_offsets: list) -> list:
+        """
+            Finds the timestamp read_file gives each frame, without decoding any CSI.
+
+            Parameters:
+                data {bytes} -- Contents of a file generated by the Atheros CSI Tool.
+                header_blocks {list} -- HEADER_FORMAT tuples for each frame.
+                payload_offsets {list} -- Offset of each frame's CSI payload within data.
+
+            Returns:
+                timestamps {list} -- Seconds since the first nonzero timestamp, or None where the payload
+                    is incomplete and so the frame is dropped.
+        """
+        timestamps = []
+        initial_timestamp = 0
+
+        for header_block, payload_offset in zip(header_blocks, payload_offsets):
+            required_length = ATHBeamformReader.get_required_length(header_block.num_tones, header_block.nc, header_block.nr)
+            if min(header_block.csi_length, len(data) - payload_offset) < required_length:
+                timestamps.append(None)
+                continue
+
+            timestamp_low = header_block.timestamp * 1e-6
+
+            if initial_timestamp == 0:
+                initial_timestamp = timestamp_low
+
+            timestamps.append(timestamp_low - initial_timestamp)
+
+        return timestamps
+
+    @staticmethod
+    def get_payloads(data: bytes, header_blocks: list, payload_offsets: list) -> list:
+        """
+            Finds the CSI payload for each frame without decoding it, for use with lazy decoding.
+
+            Parameters:
+                data {bytes} -- Contents of a file generated by the Atheros CSI Tool.
+                header_blocks {list} -- HEADER_FORMAT tuples for each frame.
+                payload_offsets {list} -- Offset of each frame's CSI payload within data.
+
+            Returns:
+                payloads {list} -- memoryview of each frame's payload, or None where it is incomplete.
+        """
+        buffer = memoryview(data)
+        payloads = []
+
+        for header_block, payload_offset in zip(header_blocks, payload_offsets):
+            required_length = ATHBeamformReader.get_required_length(header_block.num_tones, header_block.nc, header_block.nr)
+            available_length = min(header_block.csi_length, len(buffer) - payload_offset)
+
+            if available_length < required_length:
+                print("Incomplete CSI payload: expected {} bytes but got {} bytes.".format(required_length, available_length))
+                payloads.append(None)
+            else:
+                payloads.append(buffer[payload_offset:payload_offset + required_length])
+
+        return payloads
+
+    @staticmethod
+    def read_bfee_batch(data: bytes, header_blocks: list, payload_offsets: list) -> list:
+        """
+            Decodes the CSI payloads for a list of frames in as few batches as possible.
+
+            Frames are grouped by their CSI shape, and each group is decoded in one pass.
+            Frames whose payload is too short for their stated shape are returned as None.
+
+            Parameters:
+                data {bytes} -- Contents of a file generated by the Atheros CSI Tool.
+                header_blocks {list} -- HEADER_FORMAT tuples for each frame.
+                payload_offsets {list} -- Offset of each frame's CSI payload within data.
 
-                    # if scaled:
-                    #     csi_matrix = csitools.scale_csi_frame(csi_matrix, rssi_dbm)
+            Returns:
+                csi_matrices {list} -- (num_tones, nc, nr) complex64 matrix for each frame, in the order given.
+        """
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        csi_matrices = [None] * len(header_blocks)
 
-                    frame = ATHCSIFrame(header_block, csi_matrix)
+        groups = {}
+        for i, header_block in enumerate(header_blocks):
+            groups.setdefault((header_block.num_tones, header_block.nc, header_block.nr), []).append(i)
+
+        for (num_tones, nc, nr), indices in groups.items():
+            required_length = ATHBeamformReader.get_required_length(num_tones, nc, nr)
+
+            valid_indices = []
+            for i in indices:
+                available_length = min(header_blocks[i].csi_length, len(buffer) - payload_offsets[i])
+                if available_length < required_length:
+                    print("Incomplete CSI payload: expected {} bytes but got {} bytes.".format(required_length, available_length))
+                else:
+                    valid_indices.append(i)
+
+            for batch_start in range(0, len(valid_indices), DECODE_BATCH_SIZE):
+                batch_indices = valid_indices[batch_start:batch_start+DECODE_BATCH_SIZE]
+
+                payload_indices = np.array([payload_offsets[i] for i in batch_indices])[:, None] + np.arange(required_length)
+                csi = byteops.unpack_10bit_csi(buffer[payload_indices], num_tones, nc, nr)
+
+                for row, i in enumerate(batch_indices):
+                    csi_matrices[i] = csi[row]
+
+        return csi_matrices
+
+    def read_file(self, path: str, scaled: bool = False, filter_mac: str=None, lazy: bool = False, memory_budget: int = None, workers: int = None, frame_filter: CSIFilter = None) -> CSIData:
+
+        # path may also be a buffer or file object.
+        self.filename = os.path.basename(sources.get_source_name(path))
+
+        # Unless decoding lazily, the file may be decoded in parallel. See ParallelReader.read_parallel.
+        if workers is not None and workers > 1 and not lazy:
+            return self.read_parallel(path, workers, filter_mac, frame_filter, scaled=scaled)
+
+        frame_filter = CSIFilter.from_args(filter_mac, frame_filter)
+
+        data = sources.read_source(path)
+
+        ret_data = CSIData(self.filename, "Atheros CSI Tool", "QCA93XX")
+
+        header_blocks, payload_offsets, bandwidth, _, _ = ATHBeamformReader.walk_records(data)
+
+        # Grabbing the bandwidth for the CSIData object using the boolean in the first Atheros frame.
+        if bandwidth is not None:
+            ret_data.bandwidth = bandwidth
+
+        timestamps = ATHBeamformReader.get_timestamps(data, header_blocks, payload_offsets)
+
+        if frame_filter is not None:
+            # Records carry no MAC address or sequence number, so frames are only matched on their index and timestamp.
+            # Records with incomplete payloads are not numbered, as read_file drops them.
+            complete = [i for i, timestamp in enumerate(timestamps) if timestamp is not None]
+            selected = [i for index, i in enumerate(complete) if frame_filter.matches(index, timestamps[i])]
+
+            header_blocks = [header_blocks[i] for i in selected]
+            payload_offsets = [payload_offsets[i] for i in selected]
+            timestamps = [timestamps[i] for i in selected]
+
+        if lazy:
+            # CSI payloads are only decoded once each frame's csi_matrix is accessed.
+            payloads = ATHBeamformReader.get_payloads(data, header_blocks, payload_offsets)
+            budget = CSIMemoryBudget(memory_budget) if memory_budget is not None else None
+        else:
+            #CSI payloads are decoded in batches, rather than one frame at a time.
+            payloads = ATHBeamformReader.read_bfee_batch(data, header_blocks, payload_offsets)
+
+        for header_block, payload, timestamp in zip(header_blocks, payloads, timestamps):
+            if payload is not None:
+
+                # if scaled:
+                #     csi_matrix = csitools.scale_csi_frame(csi_matrix, rssi_dbm)
+
+                if lazy:
+                    frame = ATHCSIFrame(header_block, None)
+                    decoder = partial(ATHBeamformReader.read_bfee, nr=header_block.nr, nc=header_block.nc, num_tones=header_block.num_tones)
+                    frame.set_lazy_csi(decoder, payload, budget)
+                else:
+                    frame = ATHCSIFrame(header_block, payload)
+
+                ret_data.push_frame(frame, timestamp)
+
+        return ret_data
+
+    def read_metadata(self, path: str, filter_mac: str = None) -> CSIMetadata:
+        """
+            Summarises an Atheros CSI Tool file from its record headers, decoding only the first kept frame's CSI.
+
+            Parameters:
+                path {str} -- Path to the file, or its contents as a buffer or binary file object.
+                filter_mac {str} -- Only count frames from this source MAC address.
+
+            Returns:
+                metadata {CSIMetadata} -- Frame count, shape, timing and RSSI for the file.
+        """
+        frame_filter = CSIFilter.from_args(filter_mac, None)
+
+        data = sources.read_source(path, memory_map=True)
+
+        header_blocks, payload_offsets, bandwidth, _, _ = ATHBeamformReader.walk_records(data)
+        timestamps = ATHBeamformReader.get_timestamps(data, header_blocks, payload_offsets)
+
+        # Records with incomplete payloads are dropped, as in read_file. Records carry no MAC address,
+        # so none are kept when filtering on one.
+        selected = [i for i, timestamp in enumerate(timestamps) if timestamp is not None]
+        if frame_filter is not None:
+            selected = [i for index, i in enumerate(selected) if frame_filter.matches(index, timestamps[i])]
+
+        if len(selected) == 0:
+            raise IndexError("No frames to summarise in {}.".format(sources.get_source_name(path)))
+
+        first = selected[0]
+        csi_shape = ATHBeamformReader.read_bfee_batch(data, header_blocks[first:first+1], payload_offsets[first:first+1])[0].shape
+
+        rss_total = [header_blocks[i].rssi for i in selected]
+
+        return CSIMetadata.from_headers("QCA93XX", "Atheros CSI Tool", bandwidth or 0, csi_shape, len(selected), [timestamps[selected[0]], timestamps[selected[-1]]], rss_total)
+
+    def get_record_boundaries(self, data: bytes) -> np.array:
+        # Each record with CSI starts with its 2 byte length and 25 byte header.
+        _, payload_offsets, _, _, _ = ATHBeamformReader.walk_records(data)
+        return np.array(payload_offsets, dtype=np.int64) - 27
+
+    def read_chunk(self, data: bytes, chunk: tuple, scaled: bool = False, frame_filter: CSIFilter = None) -> CSIData:
+        # Decodes the records starting within a byte range, leaving timestamps absolute for rebase_timestamps.
+        # Records carry no MAC address or sequence number, so none meet a frame_filter. They are pushed as None,
+        # without decoding their CSI, unless their payload is incomplete.
+        start, end = chunk
+
+        ret_data = CSIData(backend="Atheros CSI Tool", chipset="QCA93XX")
+
+        header_blocks, payload_offsets, bandwidth, _, _ = ATHBeamformReader.walk_records(data, start, end=end)
+        if bandwidth is not None:
+            ret_data.bandwidth = bandwidth
+
+        if frame_filter is not None:
+            timestamps = ATHBeamformReader.get_timestamps(data, header_blocks, payload_offsets)
+            for header_block, timestamp in zip(header_blocks, timestamps):
+                if timestamp is not None:
+                    ret_data.push_frame(None, header_block.timestamp * 1e-6)
+
+            return ret_data
+
+        csi_matrices = ATHBeamformReader.read_bfee_batch(data, header_blocks, payload_offsets)
+        for header_block, csi_matrix in zip(header_blocks, csi_matrices):
+            if csi_matrix is not None:
+                ret_data.push_frame(ATHCSIFrame(header_block, csi_matrix), header_block.timestamp * 1e-6)
+
+        return ret_data
+
+    def rebase_timestamps(self, chunks: list):
+        # Timestamps are made relative to the first nonzero timestamp in the file, as in read_file.
+        initial_timestamp = 0
+
+        for chunk in chunks:
+            for i, timestamp_low in enumerate(chunk.timestamps):
+                if initial_timestamp == 0:
+                    initial_timestamp = timestamp_low
+
+                chunk.timestamps[i] = timestamp_low - initial_timestamp
+
+    def iter_frames(self, path: str, batch_size: int = 1024, scaled: bool = False, poll_interval: float = None):
+        """
+            Reads an Atheros CSI Tool file in batches of frames, decoding one batch of records at a time.
+
+            Parameters:
+                path {str} -- Path to a file generated by the Atheros CSI Tool.
+                batch_size {int} -- Maximum number of records in each batch. Records with incomplete payloads are dropped.
+                scaled {bool} -- Unused, as scaling is not yet supported for Atheros.
+                poll_interval {float} -- If given, seconds to wait for appended records at the end of the file. See follow.
+
+            Yields:
+                batch {CSIBatch} -- CSI tensor, timestamps and header columns for up to batch_size frames.
+        """
+        with sources.open_source(path) as file:
+            # Streams, such as compressed captures, are parsed one block at a time.
+            streaming = sources.is_stream(file)
+            data = b"" if streaming else sources.map_file(file)
+
+            base = 0
+            cursor = 0
+            initial_timestamp = 0
+
+            while True:
+                header_blocks, payload_offsets, _, cursor, finished = ATHBeamformReader.walk_records(data, cursor, batch_size, streaming or poll_interval is not None)
+                csi_matrices = ATHBeamformReader.read_bfee_batch(data, header_blocks, payload_offsets)
+
+                frames = []
+                timestamps = []
+                for header_block, csi_matrix in zip(header_blocks, csi_matrices):
+                    if csi_matrix is None:
+                        continue
+
+                    frames.append(ATHCSIFrame(header_block, csi_matrix))
 
                     timestamp_low = header_block.timestamp * 1e-6
 
                     if initial_timestamp == 0:
                         initial_timestamp = timestamp_low
 
-                    ret_data.push_frame(frame, timestamp_low - initial_timestamp)
-            except IndexError as e:
-                print(e)
+                    timestamps.append(timestamp_low - initial_timestamp)
 
-            expected_count += 1
-            cursor += header_block.csi_length
+                if frames:
+                    yield CSIBatch.from_frames(frames, timestamps, base + cursor)
 
-            if header_block.payload_length > 0:
-                cursor += header_block.payload_length
-
-            if cursor + 420 > length:
-                break
+                if finished:
+                    data, consumed = sources.next_block(file, data, cursor, poll_interval)
+                    if data is None:
+                        break
 
-        return ret_data
\ No newline at end of file
+                    base += consumed
+                    cursor -= consumed
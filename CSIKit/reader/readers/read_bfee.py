@@ -1,15 +1,17 @@
 import os
 import struct
+from functools import partial
 from time import time
+from typing import Tuple
 
 import numpy as np
 
-from math import floor
-
-from CSIKit.csi import CSIData
+from CSIKit.csi import CSIBatch, CSIData, CSIFilter, CSIMetadata
+from CSIKit.csi.csiframe import CSIMemoryBudget
 from CSIKit.csi.frames import IWLCSIFrame
-from CSIKit.reader import Reader
-from CSIKit.util import csitools
+from CSIKit.reader import Reader, sources
+from CSIKit.reader.parallel import ParallelReader
+from CSIKit.util import byteops, csitools
 
 from CSIKit.util.errors import print_length_error
 from CSIKit.util.matlab import db, dbinv
@@ -17,10 +19,32 @@ from CSIKit.util.matlab import db, dbinv
 SIZE_STRUCT = struct.Struct(">H").unpack
 CODE_STRUCT = struct.Struct("B").unpack
 
+RECORD_STRUCT = struct.Struct(">HB")
+
 HEADER_STRUCT = struct.Struct("<LHHBBBBBbBBHH").unpack
+HEADER_DTYPE = np.dtype([
+    ("timestamp_low", np.uint32),
+    ("bfee_count", np.uint16),
+    ("reserved", np.uint16),
+    ("n_rx", np.uint8),
+    ("n_tx", np.uint8),
+    ("rssi_a", np.uint8),
+    ("rssi_b", np.uint8),
+    ("rssi_c", np.uint8),
+    ("noise", np.int8),
+    ("agc", np.uint8),
+    ("antenna_sel", np.uint8),
+    ("len", np.uint16),
+    ("rate", np.uint16)
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+
 VALID_BEAMFORMING_MEASUREMENT = 187
 
-class IWLBeamformReader(Reader):
+# Upper bound on the number of payloads gathered into memory for a single decode pass.
+DECODE_BATCH_SIZE = 65536
+
+class IWLBeamformReader(Reader, ParallelReader):
     """
         This class handles parsing for CSI data from both batched files and realtime CSI packets from IWL5300 hardware.
 
@@ -37,18 +61,33 @@ class IWLBeamformReader(Reader):
     @staticmethod
     def can_read(path: str) -> bool:
         if os.path.exists(path) and os.path.splitext(path)[1] == ".dat":
-            # Quick heuristic for Linux 802.11n CSI Tool files
-            # Check for the VALID_BEAMFORMING_MEASUREMENT code at 0x2.
-            # Potentially may return a false negative for files which start with an invalid frame.
-            data = open(path, "rb").read()
-            if len(data) < 4:
-                return False
+            return IWLBeamformReader.sniff(path, sources.read_prefix(path), os.path.getsize(path)) > 0
 
-            code = CODE_STRUCT(data[2:3])[0]
+        return False
 
-            return code == VALID_BEAMFORMING_MEASUREMENT
+    @staticmethod
+    def sniff(path: str, prefix: bytes, file_size: int) -> float:
+        """
+            Scores how likely a file is to have been generated by the Linux 802.11n CSI Tool, using only its first bytes.
 
-        return False
+            Parameters:
+                path {str} -- Path to the file, used for its extension.
+                prefix {bytes} -- First bytes of the file.
+                file_size {int} -- Size of the whole file.
+
+            Returns:
+                confidence {float} -- Value between 0 (not IWL5300) and 1.
+        """
+        # Sources without an extension, such as buffers and pipes, are identified from their contents alone.
+        if os.path.splitext(path)[1] not in [".dat", ""] or len(prefix) < 4:
+            return 0
+
+        # Quick heuristic for Linux 802.11n CSI Tool files
+        # Check for the VALID_BEAMFORMING_MEASUREMENT code at 0x2.
+        # Potentially may return a false negative for files which start with an invalid frame.
+        code = CODE_STRUCT(prefix[2:3])[0]
+
+        return 0.9 if code == VALID_BEAMFORMING_MEASUREMENT else 0
 
     @staticmethod
     def read_bfee(data: bytes, n_rx: int, n_tx: int, expected_length: int, perm: list, i: int=0, filename: str="") -> np.array:
@@ -59,43 +98,146 @@ class IWLBeamformReader(Reader):
         #     # return print_length_error(expected_length, actual_length, i, filename)
         #     return None
 
-        csi = np.zeros((30, n_rx, n_tx), dtype=np.complex64)
+        payload = np.frombuffer(bytes(data), dtype=np.uint8)
 
-        index = 0
-        for i in range(30):
-            index += 3
-            remainder = index % 8
-            for j in range(n_rx):
-                for k in range(n_tx):
-                    ind8 = floor(index/8)
+        return byteops.unpack_iwl5300(payload, n_rx, n_tx, perm)[0]
 
-                    if ind8+2 >= len(data):
-                        break
+    @staticmethod
+    def get_record_offsets(data: bytes) -> Tuple[np.array, np.array, int]:
+        """
+            First pass over a .dat file, which only walks the size/code framing of each record.
 
-                    real_left = data[ind8] >> remainder
-                    real_right = data[1 + ind8] << (8 - remainder)
+            Parameters:
+                data {bytes} -- Contents of a file generated by log_to_file.
 
-                    real = (real_left | real_right) & 0xFF # 8-bit truncation
-                    if real > 127: # convert from unsigned rep to signed
-                        real -= 256
+            Returns:
+                offsets {np.array} -- int64 offset of the header for each valid beamforming record.
+                lengths {np.array} -- int64 length of each valid record, including its header.
+                record_count {int} -- Number of records walked, including invalid ones.
+        """
+        offsets, lengths, record_count, _ = IWLBeamformReader.walk_records(data)
 
-                    imag_left = data[1 + ind8] >> remainder
-                    imag_right = data[2 + ind8] << (8 - remainder)
+        return offsets, lengths, record_count
 
-                    imag = (imag_left | imag_right) & 0xFF
-                    if imag > 127:
-                        imag -= 256
+    @staticmethod
+    def walk_records(data: bytes, cursor: int = 0, max_records: int = None, complete: bool = False, end: int = None) -> Tuple[np.array, np.array, int, int]:
+        """
+            Walks the size/code framing of records from the given position.
 
-                    real = float(real)
-                    imag = float(imag)
+            Parameters:
+                data {bytes} -- Contents of a file generated by log_to_file.
+                cursor {int} -- Position of the record to start from.
+                max_records {int} -- Number of valid records after which to stop. Defaults to the end of the file.
+                complete {bool} -- Whether to stop at a record which has not been completely written,
+                    rather than reading the part which is available.
+                end {int} -- Position at which to stop, which should be the start of a record. Defaults to the end of the file.
 
-                    complex_no = real + imag * 1j
+            Returns:
+                offsets {np.array} -- int64 offset of the header for each valid beamforming record.
+                lengths {np.array} -- int64 length of each valid record, including its header.
+                record_count {int} -- Number of records walked, including invalid ones.
+                cursor {int} -- Position of the next record.
+        """
+        length = len(data)
 
-                    csi[i][perm[j]][k] = complex_no
+        offsets = []
+        lengths = []
+        record_count = 0
 
-                    index += 16
+        while (length - cursor) > 100 and (max_records is None or len(offsets) < max_records) and (end is None or cursor < end):
+            size, code = RECORD_STRUCT.unpack_from(data, cursor)
+            if complete and cursor + size + 2 > length:
+                break
 
-        return csi
+            cursor += 3
+
+            if code == VALID_BEAMFORMING_MEASUREMENT:
+                offsets.append(cursor)
+                lengths.append(min(size-1, length - cursor))
+            else:
+                print("Invalid code for beamforming measurement at {}.".format(hex(cursor)))
+
+            record_count += 1
+            cursor += size-1
+
+        return np.array(offsets, dtype=np.int64), np.array(lengths, dtype=np.int64), record_count, cursor
+
+    @staticmethod
+    def get_headers(data: bytes, offsets: np.array) -> np.array:
+        """
+            Decodes the 20 byte header for every record in one pass.
+
+            Parameters:
+                data {bytes} -- Contents of a file generated by log_to_file.
+                offsets {np.array} -- Header offsets, as returned by get_record_offsets.
+
+            Returns:
+                headers {np.array} -- Structured array of HEADER_DTYPE, with one entry per record.
+        """
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        header_bytes = buffer[offsets[:, None] + np.arange(HEADER_SIZE)]
+
+        return header_bytes.view(HEADER_DTYPE).reshape(-1)
+
+    @staticmethod
+    def read_bfee_batch(data: bytes, offsets: np.array, lengths: np.array, headers: np.array) -> list:
+        """
+            Decodes the CSI payloads for a set of records in as few batches as possible.
+
+            Records are grouped by their antenna configuration, and each group is decoded in one pass.
+
+            Parameters:
+                data {bytes} -- Contents of a file generated by log_to_file.
+                offsets {np.array} -- Header offsets for each record.
+                lengths {np.array} -- Length of each record, including its header.
+                headers {np.array} -- Decoded headers for each record.
+
+            Returns:
+                csi_matrices {list} -- (30, n_rx, n_tx) complex64 matrix for each record, in the order given.
+        """
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        csi_matrices = [None] * len(offsets)
+
+        configurations = (headers["n_rx"].astype(np.int64) << 8) | headers["n_tx"]
+
+        for configuration in np.unique(configurations):
+            n_rx = int(configuration >> 8)
+            n_tx = int(configuration & 0xFF)
+
+            group = np.flatnonzero(configurations == configuration)
+            for batch_start in range(0, len(group), DECODE_BATCH_SIZE):
+                indices = group[batch_start:batch_start+DECODE_BATCH_SIZE]
+
+                payload_lengths = lengths[indices] - HEADER_SIZE
+                width = max(int(payload_lengths.max()), 1)
+
+                # Gathering each payload into a row, clipped so truncated records stay within the file.
+                payload_indices = offsets[indices, None] + HEADER_SIZE + np.arange(width)
+                payloads = buffer[np.minimum(payload_indices, len(buffer) - 1)]
+
+                perm = byteops.get_iwl5300_permutation(headers["antenna_sel"][indices], n_rx)
+
+                csi = byteops.unpack_iwl5300(payloads, n_rx, n_tx, perm, payload_lengths)
+                for row, i in enumerate(indices):
+                    csi_matrices[i] = csi[row]
+
+        return csi_matrices
+
+    @staticmethod
+    def read_bfee_entry(header_block: tuple, scaled: bool, payload: memoryview) -> np.array:
+        # Decodes a single record's payload, given its HEADER_DTYPE values.
+        n_rx, n_tx, antenna_sel = header_block[3], header_block[4], header_block[10]
+
+        perm = byteops.get_iwl5300_permutation(antenna_sel, n_rx)
+        payloads = np.frombuffer(payload, dtype=np.uint8)[np.newaxis]
+        if payloads.shape[1] == 0:
+            payloads = np.zeros((1, 1), dtype=np.uint8)
+
+        csi_matrix = byteops.unpack_iwl5300(payloads, n_rx, n_tx, perm, np.array([len(payload)]))[0]
+        if scaled:
+            csi_matrix = IWLBeamformReader.scale_csi_entry(csi_matrix, header_block)
+
+        return csi_matrix
 
     @staticmethod
     def read_bf_entry(data: bytes, scaled: bool=False) -> np.array:
@@ -106,103 +248,225 @@ class IWLBeamformReader(Reader):
         n_rx = csi_header[3]
         antenna_sel = csi_header[10]
 
-        #If less than 3 Rx antennas are detected, default permutation should be used.
-        #Otherwise invalid indices will likely be raised.
-        perm = [0, 1, 2]
-        if sum(perm) == n_rx:
-            perm[0] = ((antenna_sel) & 0x3)
-            perm[1] = ((antenna_sel >> 2) & 0x3)
-            perm[2] = ((antenna_sel >> 4) & 0x3)
-
-        perm_typed = list()
-        [perm_typed.append(x) for x in perm]
+        perm = byteops.get_iwl5300_permutation(antenna_sel, n_rx)[0]
 
         n_rx = csi_header[3]
         n_tx = csi_header[4]
         expected_length = csi_header[11]
 
-        csi_block = IWLBeamformReader.read_bfee(all_data, n_tx, n_rx, expected_length, perm_typed, scaled)
+        csi_block = IWLBeamformReader.read_bfee(all_data, n_tx, n_rx, expected_length, perm, scaled)
 
         return csi_block
 
-    def read_file(self, path: str, scaled: bool=False, filter_mac: str=None) -> CSIData:
+    def read_file(self, path: str, scaled: bool=False, filter_mac: str=None, lazy: bool=False, memory_budget: int=None, workers: int=None, frame_filter: CSIFilter=None) -> CSIData:
         """
             This function parses .dat files generated by log_to_file.
 
             Parameters:
-                file (filereader): File reader object returned from open().
+                path (str): Path to the file, or its contents as bytes, a memoryview or a binary file object.
+                workers (int): Number of processes to decode the file with, unless lazy is set. See ParallelReader.read_parallel.
+                frame_filter (CSIFilter): Only keep frames meeting this filter, checked against record headers before any CSI is decoded.
 
             Returns:
                 total_csi (list): All valid CSI blocks contained within the given file.
         """
-        self.filename = os.path.basename(path)
+        self.filename = os.path.basename(sources.get_source_name(path))
+
+        if workers is not None and workers > 1 and not lazy:
+            return self.read_parallel(path, workers, filter_mac, frame_filter, scaled=scaled)
 
-        ret_data = CSIData(self.filename, backend="Linux 802.11n CSI Tool", chipset="Intel IWL5300", filter_mac=filter_mac)
+        frame_filter = CSIFilter.from_args(filter_mac, frame_filter)
+
+        ret_data = CSIData(self.filename, backend="Linux 802.11n CSI Tool", chipset="Intel IWL5300")
         ret_data.bandwidth = 20
 
-        if not os.path.exists(path):
-            raise Exception("File not found: {}".format(path))
+        data = sources.read_source(path)
+
+        offsets, lengths, ret_data.expected_frames = IWLBeamformReader.get_record_offsets(data)
+        headers = IWLBeamformReader.get_headers(data, offsets)
+        timestamps = IWLBeamformReader.get_timestamps(headers)
+
+        if frame_filter is not None:
+            # Records carry no MAC address or sequence number, so frames are only matched on their index and timestamp.
+            selected = frame_filter.mask(np.arange(len(headers)), timestamps)
+            offsets, lengths, headers, timestamps = offsets[selected], lengths[selected], headers[selected], timestamps[selected]
+
+        if lazy:
+            # CSI payloads are only decoded once each frame's csi_matrix is accessed.
+            buffer = memoryview(data)
+            csi_matrices = [buffer[offset + HEADER_SIZE:offset + length] for offset, length in zip(offsets.tolist(), lengths.tolist())]
+            budget = CSIMemoryBudget(memory_budget) if memory_budget is not None else None
+        else:
+            #CSI payloads are decoded in batches, rather than one frame at a time.
+            csi_matrices = IWLBeamformReader.read_bfee_batch(data, offsets, lengths, headers)
+
+        for header_block, csi_matrix, timestamp in zip(headers.tolist(), csi_matrices, timestamps.tolist()):
+            if lazy:
+                frame = IWLCSIFrame(header_block, None)
+                frame.set_lazy_csi(partial(IWLBeamformReader.read_bfee_entry, header_block, scaled), csi_matrix, budget)
+            else:
+                if scaled:
+                    csi_matrix = IWLBeamformReader.scale_csi_entry(csi_matrix, header_block)
+
+                frame = IWLCSIFrame(header_block, csi_matrix)
 
-        data = open(path, "rb").read()
+            ret_data.push_frame(frame, timestamp)
 
-        length = len(data)
+        return ret_data
+
+    @staticmethod
+    def get_timestamps(headers: np.array) -> np.array:
+        # Timestamps in seconds, relative to the first nonzero timestamp.
+        timestamps = headers["timestamp_low"] * 10e-7
+
+        nonzero = np.flatnonzero(timestamps)
+        if len(nonzero) > 0:
+            timestamps[nonzero[0]:] -= timestamps[nonzero[0]]
+
+        return timestamps
+
+    def read_metadata(self, path: str, filter_mac: str = None) -> CSIMetadata:
+        """
+            Summarises a .dat file from its record headers, decoding only the first record's CSI.
+
+            Parameters:
+                path {str} -- Path to the file, or its contents as a buffer or binary file object.
+                filter_mac {str} -- Only count frames from this source MAC address.
+
+            Returns:
+                metadata {CSIMetadata} -- Frame count, shape, timing and RSSI for the file.
+        """
+        # Records carry no MAC address, so none are kept when filtering on one, as in read_file.
+        if CSIFilter.from_args(filter_mac, None) is not None:
+            raise IndexError("No frames to summarise in {}.".format(sources.get_source_name(path)))
+
+        data = sources.read_source(path, memory_map=True)
+
+        offsets, lengths, _ = IWLBeamformReader.get_record_offsets(data)
+        if len(offsets) == 0:
+            return super().read_metadata(path, filter_mac)
+
+        headers = IWLBeamformReader.get_headers(data, offsets)
+        csi_shape = IWLBeamformReader.read_bfee_batch(data, offsets[:1], lengths[:1], headers[:1])[0].shape
+        timestamps = IWLBeamformReader.get_timestamps(headers)
+
+        rss_total = np.maximum(np.maximum(headers["rssi_a"], headers["rssi_b"]), headers["rssi_c"])
+
+        return CSIMetadata.from_headers("Intel IWL5300", "Linux 802.11n CSI Tool", 20, csi_shape, len(headers), timestamps[[0, -1]].tolist(), rss_total)
 
-        cursor = 0
+    def get_record_boundaries(self, data: bytes) -> np.array:
+        # Each valid record starts with its 3 byte size/code framing.
+        offsets, _, _ = IWLBeamformReader.get_record_offsets(data)
+        return offsets - 3
 
+    def read_chunk(self, data: bytes, chunk: tuple, scaled: bool = False, frame_filter: CSIFilter = None) -> CSIData:
+        # Decodes the records starting within a byte range, leaving timestamps absolute for rebase_timestamps.
+        # Records not meeting frame_filter are pushed as None, without decoding their CSI.
+        start, end = chunk
+
+        ret_data = CSIData(backend="Linux 802.11n CSI Tool", chipset="Intel IWL5300")
+        ret_data.bandwidth = 20
+
+        offsets, lengths, ret_data.expected_frames, _ = IWLBeamformReader.walk_records(data, start, end=end)
+        headers = IWLBeamformReader.get_headers(data, offsets)
+
+        selected = np.ones(len(headers), dtype=bool)
+        if frame_filter is not None:
+            selected = frame_filter.mask(np.arange(len(headers)))
+
+        csi_matrices = iter(IWLBeamformReader.read_bfee_batch(data, offsets[selected], lengths[selected], headers[selected]))
+
+        for header_block, keep in zip(headers.tolist(), selected.tolist()):
+            frame = None
+            if keep:
+                csi_matrix = next(csi_matrices)
+                if scaled:
+                    csi_matrix = IWLBeamformReader.scale_csi_entry(csi_matrix, header_block)
+
+                frame = IWLCSIFrame(header_block, csi_matrix)
+
+            ret_data.push_frame(frame, header_block[0] * 10e-7)
+
+        return ret_data
+
+    def rebase_timestamps(self, chunks: list):
+        # Timestamps are made relative to the first nonzero timestamp in the file, as in read_file.
         initial_timestamp = 0
 
-        while (length - cursor) > 100:
-            size = SIZE_STRUCT(data[cursor:cursor+2])[0]
-            code = CODE_STRUCT(data[cursor+2:cursor+3])[0]
-            
-            cursor += 3
+        for chunk in chunks:
+            for i, timestamp_low in enumerate(chunk.timestamps):
+                if initial_timestamp == 0:
+                    initial_timestamp = timestamp_low
 
-            if code == VALID_BEAMFORMING_MEASUREMENT:
-                all_block = data[cursor:cursor+size-1]
+                chunk.timestamps[i] = timestamp_low - initial_timestamp
 
-                header_block = HEADER_STRUCT(all_block[:20])
-                data_block = all_block[20:]
+    def iter_frames(self, path: str, batch_size: int = 1024, scaled: bool = False, poll_interval: float = None):
+        """
+            Reads a .dat file in batches of frames, decoding one batch of records at a time.
 
-                #Going to leave permutation params out of the data for now.
-                #At some point, this needs to end up in the header_block.
-                #I'd prefer that to passing it as a parameter in the constructor.
-                #But since it's derived, it can't be in the HEADER_STRUCT. Lame.
+            Parameters:
+                path {str} -- Path to a file generated by log_to_file.
+                batch_size {int} -- Maximum number of frames in each batch.
+                scaled {bool} -- Whether to scale CSI, as in read_file.
+                poll_interval {float} -- If given, seconds to wait for appended records at the end of the file. See follow.
 
-                n_rx = header_block[3]
-                antenna_sel = header_block[10]
+            Yields:
+                batch {CSIBatch} -- CSI tensor, timestamps and header columns for up to batch_size frames.
+        """
+        with sources.open_source(path) as file:
+            # Streams, such as compressed captures, are parsed one block at a time.
+            streaming = sources.is_stream(file)
+            data = b"" if streaming else sources.map_file(file)
+
+            base = 0
+            cursor = 0
+            initial_timestamp = 0
+
+            while True:
+                offsets, lengths, _, cursor = IWLBeamformReader.walk_records(data, cursor, batch_size, streaming or poll_interval is not None)
+                if len(offsets) == 0:
+                    data, consumed = sources.next_block(file, data, cursor, poll_interval)
+                    if data is None:
+                        break
 
-                #If less than 3 Rx antennas are detected, default permutation should be used.
-                #Otherwise invalid indices will likely be raised.
-                perm = [0, 1, 2]
-                if n_rx == 3:
-                    perm[0] = ((antenna_sel) & 0x3)
-                    perm[1] = ((antenna_sel >> 2) & 0x3)
-                    perm[2] = ((antenna_sel >> 4) & 0x3)
+                    base += consumed
+                    cursor -= consumed
+                    continue
 
-                n_tx = header_block[3]
-                n_rx = header_block[4]
-                expected_length = header_block[11]
+                headers = IWLBeamformReader.get_headers(data, offsets)
+                csi_matrices = IWLBeamformReader.read_bfee_batch(data, offsets, lengths, headers)
 
-                csi_matrix = IWLBeamformReader.read_bfee(data_block, n_tx, n_rx, expected_length, perm, ret_data.expected_frames)
-                if csi_matrix is not None:
+                frames = []
+                timestamps = []
+                for header_block, csi_matrix in zip(headers.tolist(), csi_matrices):
                     if scaled:
                         csi_matrix = IWLBeamformReader.scale_csi_entry(csi_matrix, header_block)
 
-                    frame = IWLCSIFrame(header_block, csi_matrix)
+                    frames.append(IWLCSIFrame(header_block, csi_matrix))
 
                     timestamp_low = header_block[0] * 10e-7
 
                     if initial_timestamp == 0:
                         initial_timestamp = timestamp_low
 
-                    ret_data.push_frame(frame, timestamp_low - initial_timestamp)
-            else:
-                print("Invalid code for beamforming measurement at {}.".format(hex(cursor)))
+                    timestamps.append(timestamp_low - initial_timestamp)
 
-            ret_data.expected_frames += 1
-            cursor += size-1
+                yield CSIBatch.from_frames(frames, timestamps, base + cursor)
 
-        return ret_data
+    def read_headers(self, path: str) -> np.array:
+        """
+            Reads the header of every record in a .dat file, without decoding any CSI.
+
+            Parameters:
+                path {str} -- Path to a file generated by log_to_file, or its contents as a buffer or binary file object.
+
+            Returns:
+                headers {np.array} -- Structured array of HEADER_DTYPE, with one entry per record.
+        """
+        data = sources.read_source(path)
+        offsets, _, _ = IWLBeamformReader.get_record_offsets(data)
+
+        return IWLBeamformReader.get_headers(data, offsets)
 
     @staticmethod
     def get_total_rss(rssi_a: int, rssi_b: int, rssi_c: int, agc: int) -> float:
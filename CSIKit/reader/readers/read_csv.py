@@ -1,8 +1,10 @@
+import io
 import os
+import time
 
-from CSIKit.csi import CSIData
+from CSIKit.csi import CSIBatch, CSIData, CSIFilter, CSIMetadata
 from CSIKit.csi.frames import ESP32CSIFrame
-from CSIKit.reader import Reader
+from CSIKit.reader import Reader, sources
 from CSIKit.util import csitools, constants
 
 ESP32_HEADER = ["type", "role", "mac", "rssi", "rate", "sig_mode", "mcs", "bandwidth", "smoothing", "not_sounding",
@@ -39,6 +41,9 @@ BACKEND_MAPPING = {
     "FITHOMES2": "FitHomes CSI Platform (Alpha2)"
 }
 
+# Approximate number of characters read into memory for each block of lines.
+CSV_BLOCK_SIZE = 1 << 24
+
 LAST_CHAR_MAPPING = {
     "ESP32": "]",
     "THROWIE": "]",
@@ -55,41 +60,104 @@ class CSVBeamformReader(Reader):
     @staticmethod
     def can_read(path: str) -> bool:
         if os.path.exists(path):
-            try:
-                data = open(path)
+            return CSVBeamformReader.sniff(path, sources.read_prefix(path), os.path.getsize(path)) > 0
 
-                first_line = data.readline()[:-1]
-                second_line = data.readline()[:-1]
+        return False
 
-                first_split = first_line.split(",")
-                second_split = second_line.split(",")
+    @staticmethod
+    def sniff(path: str, prefix: bytes, file_size: int) -> float:
+        """
+            Scores how likely a file is to be a supported CSV format, using only its first bytes.
+
+            Parameters:
+                path {str} -- Path to the file.
+                prefix {bytes} -- First bytes of the file.
+                file_size {int} -- Size of the whole file, or None where it is not known, as for pipes.
+
+            Returns:
+                confidence {float} -- Value between 0 (not a supported CSV) and 1.
+        """
+        truncated = file_size is None or len(prefix) < file_size
+        if truncated:
+            # Only complete lines are decoded, so a multi-byte character cannot be split.
+            prefix = prefix[:prefix.rfind(b"\n") + 1]
+
+        try:
+            data = io.TextIOWrapper(io.BytesIO(prefix))
+
+            first_line = data.readline()[:-1]
+            second_line = data.readline()[:-1]
+        except UnicodeDecodeError as _:
+            return 0
+
+        first_split = first_line.split(",")
+        second_split = second_line.split(",")
+
+        # If we have observe a supported header format.
+        # TODO: Add functionality to add your own headers.
+        if first_split not in HEADER_NAME_MAPPINGS.values():
+            return 0
+
+        # If they are not the same length then the
+        # CSV is malformed or contains a separate header line.
+        if len(first_split) == len(second_split):
+            return 1
+
+        # The second line may simply not fit within the prefix.
+        if truncated and second_line == "":
+            return 0.8
+
+        return 0
 
-                # If they are not the same length then the
-                # CSV is malformed or contains a separate header line.
-                if len(first_split) == len(second_split):
-                    # If we have observe a supported header format.
-                    # TODO: Add functionality to add your own headers.
-                    return first_split in HEADER_NAME_MAPPINGS.values()
-            except UnicodeDecodeError as _:
-                return False
+    @staticmethod
+    def read_blocks(data: io.TextIOBase, no_columns: int, last_char: str, block_size: int = CSV_BLOCK_SIZE):
+        """
+            Reads and splits lines from an open CSV file in large blocks.
 
-        return False
+            Reading ends at the first line with the wrong number of columns, or which is missing its last character.
 
-    def read_file(self, path: str, scaled: bool = False, remove_unusable_subcarriers: bool = True, filter_mac: str = None) -> CSIData:
+            Parameters:
+                data {io.TextIOBase} -- CSV file, positioned after its header line.
+                no_columns {int} -- Number of columns expected in each line.
+                last_char {str} -- Character expected in the last column of each line.
+                block_size {int} -- Approximate number of characters to read for each block.
 
-        # if scaled:
-        #     print("Scaling not yet supported in CSV formats.")
+            Yields:
+                rows {list} -- Split lines for each block.
+        """
+        while True:
+            lines = data.readlines(block_size)
+            if not lines:
+                return
+
+            rows = [line.split(",") for line in lines]
+            for i, data_line in enumerate(rows):
+                if len(data_line) != no_columns or (last_char and last_char not in data_line[-1]):
+                    if i > 0:
+                        yield rows[:i]
+                    return
 
-        self.filename = os.path.basename(path)
-        if not os.path.exists(path):
-            raise Exception("File not found: {}".format(path))
+            yield rows
 
-        data = open(path, "r")
+    @staticmethod
+    def open_text(source) -> io.TextIOBase:
+        # Text file objects are used as they are, while buffers and binary file objects are decoded in full.
+        # Compressed captures are decompressed as they are read.
+        if isinstance(source, io.TextIOBase):
+            return source
 
-        ret_data = CSIData(self.filename, "", "CSV Format", filter_mac=filter_mac)
+        if sources.get_compression(source) is not None:
+            return io.TextIOWrapper(sources.open_source(source))
 
-        header_line = data.readline()[:-1].split(",")
+        if sources.is_buffer(source) or hasattr(source, "read"):
+            return io.StringIO(str(sources.read_source(source), "utf-8"), newline=None)
+
+        sources.check_source(source)
 
+        return open(source, "r")
+
+    @staticmethod
+    def get_header_name(header_line: list) -> str:
         # TODO: Add support for adding custom headers.
         if header_line not in HEADER_NAME_MAPPINGS.values():
             print("Unsupported CSV format.")
@@ -105,6 +173,233 @@ class CSVBeamformReader(Reader):
             print("Unable to find hardware name for format.")
             exit(1)
 
+        return header_name
+
+    @staticmethod
+    def is_discarded_antenna(header_frame: type, data_line: list) -> bool:
+        # Frames from antenna 1 are discarded, so their rows are dropped before their CSI is parsed.
+        try:
+            return header_frame.get_row_antenna(data_line) == 1
+        except (ValueError, IndexError):
+            # Malformed rows are left for the frame constructor to reject.
+            return False
+
+    @staticmethod
+    def parse_frames(header_frame: type, rows: list) -> list:
+        """
+            Builds frames for a block of rows, skipping any which cannot be parsed.
+
+            Parameters:
+                header_frame {type} -- Frame class for the CSV format, from HEADER_FRAMES.
+                rows {list} -- Split CSV lines.
+
+            Returns:
+                frames {list} -- Frame for each row, or None where the row is malformed.
+        """
+        try:
+            csi_matrices = header_frame.parse_rows(rows)
+        except (ValueError, IndexError, SyntaxError, TypeError):
+            # Each row will instead be parsed by its own frame, so malformed rows can be skipped individually.
+            csi_matrices = [None] * len(rows)
+
+        frames = []
+        for data_line, csi_matrix in zip(rows, csi_matrices):
+            try:
+                frames.append(header_frame(data_line, csi_matrix))
+            except (ValueError, IndexError, KeyError, SyntaxError, TypeError):
+                frames.append(None)
+
+        return frames
+
+    def read_stream(self, path: str, chunk_frames: int = 1024, offset: int = 0, scaled: bool = False, initial_timestamp: float = None, block_size: int = CSV_BLOCK_SIZE, poll_interval: float = None, frame_filter: CSIFilter = None):
+        """
+            Reads a CSV file in fixed-size batches of frames, keeping memory use bounded for long captures.
+
+            Unlike read_file, malformed rows are skipped rather than ending the read.
+            An incomplete final line, such as one still being written, is left unread.
+
+            Parameters:
+                path {str} -- Path to a supported CSV file.
+                chunk_frames {int} -- Number of frames in each batch. The final batch may be smaller.
+                offset {int} -- Byte offset to resume reading from, such as the offset of a previous batch.
+                scaled {bool} -- Whether to scale CSI against RSSI, as in read_file.
+                initial_timestamp {float} -- Timestamp which others are given relative to. Defaults to that of the first frame read.
+                block_size {int} -- Approximate number of bytes to read from the file at once.
+                poll_interval {float} -- If given, seconds to wait for appended lines at the end of the file,
+                    rather than stopping. Frames read so far are yielded before each wait.
+                frame_filter {CSIFilter} -- Only yield frames meeting this filter. Frame indices count from offset,
+                    and timestamps are relative to initial_timestamp.
+
+            Yields:
+                batch {CSIBatch} -- CSI tensor, relative timestamps and header columns for up to chunk_frames frames.
+        """
+        # path may also be a buffer or binary file object, including non-seekable streams such as pipes.
+        self.filename = os.path.basename(sources.get_source_name(path))
+
+        with sources.open_source(path) as data:
+            header_bytes = data.readline()
+            header_line = header_bytes.decode().rstrip("\r\n").split(",")
+            header_name = self.get_header_name(header_line)
+
+            header_frame = HEADER_FRAMES[header_name]
+            last_char = LAST_CHAR_MAPPING[header_name]
+
+            position = len(header_bytes)
+            if offset > position:
+                data.seek(offset)
+                position = offset
+
+            frames = []
+            timestamps = []
+            index = 0
+
+            drop_rows = CSVBeamformReader.can_drop_rows(frame_filter)
+
+            incomplete = False
+            while True:
+                lines = [] if incomplete else data.readlines(block_size)
+                if not lines:
+                    if poll_interval is None:
+                        break
+
+                    if frames:
+                        yield CSIBatch.from_frames(frames, timestamps, position)
+                        frames = []
+                        timestamps = []
+
+                    time.sleep(poll_interval)
+
+                    data.seek(position)
+                    incomplete = False
+                    continue
+
+                rows = []
+                ends = []
+                for line in lines:
+                    try:
+                        data_line = line.decode().rstrip("\r\n").split(",")
+                    except UnicodeDecodeError:
+                        data_line = None
+
+                    valid = data_line is not None and len(data_line) == len(header_line) and (not last_char or last_char in data_line[-1])
+                    if not valid and not line.endswith(b"\n"):
+                        # The final line may still be being written, so it is read again next time.
+                        incomplete = True
+                        break
+
+                    position += len(line)
+                    if not valid or self.is_discarded_antenna(header_frame, data_line):
+                        continue
+
+                    if not drop_rows or initial_timestamp is None or frame_filter.matches_mac(header_frame.get_row_mac(data_line)):
+                        rows.append(data_line)
+                        ends.append(position)
+
+                for new_frame, end in zip(self.parse_frames(header_frame, rows), ends):
+                    if new_frame is None or new_frame.csi_matrix is None:
+                        continue
+
+                    timestamp = float(new_frame.real_timestamp) / 1000
+                    if initial_timestamp is None:
+                        initial_timestamp = timestamp
+
+                    index += 1
+                    if frame_filter is not None and not frame_filter.matches(index - 1, timestamp - initial_timestamp, new_frame.mac):
+                        continue
+
+                    if scaled:
+                        new_frame.csi_matrix = csitools.scale_csi_frame(new_frame.csi_matrix, new_frame.rssi, new_frame.noise_floor)
+
+                    frames.append(new_frame)
+                    timestamps.append(timestamp - initial_timestamp)
+
+                    if len(frames) == chunk_frames:
+                        yield CSIBatch.from_frames(frames, timestamps, end)
+                        frames = []
+                        timestamps = []
+
+            if frames:
+                yield CSIBatch.from_frames(frames, timestamps, position)
+
+    def iter_frames(self, path: str, batch_size: int = 1024, scaled: bool = False, poll_interval: float = None):
+        # Streaming is provided by read_stream, so malformed rows are skipped rather than ending the read.
+        return self.read_stream(path, chunk_frames=batch_size, scaled=scaled, poll_interval=poll_interval)
+
+    def read_metadata(self, path: str, filter_mac: str = None) -> CSIMetadata:
+        """
+            Summarises a CSV file from the header columns of each row, parsing only the first kept row's CSI.
+
+            Parameters:
+                path {str} -- Path to a CSV file, or its contents as a buffer or file object.
+                filter_mac {str} -- Only count frames from this source MAC address.
+
+            Returns:
+                metadata {CSIMetadata} -- Frame count, shape, timing and RSSI for the file.
+        """
+        frame_filter = CSIFilter.from_args(filter_mac, None)
+
+        data = self.open_text(path)
+
+        header_line = data.readline()[:-1].split(",")
+        header_name = self.get_header_name(header_line)
+        header_frame = HEADER_FRAMES[header_name]
+
+        first_row = None
+        first_timestamp = None
+        bandwidth = 0
+
+        timestamps = []
+        rss_total = []
+
+        for rows in self.read_blocks(data, len(header_line), LAST_CHAR_MAPPING[header_name]):
+            rows = [data_line for data_line in rows if not self.is_discarded_antenna(header_frame, data_line)]
+            if len(rows) == 0:
+                continue
+
+            # As in read_file, timestamps are relative to the first frame, and the bandwidth is taken from it,
+            # whether or not it is kept.
+            if first_timestamp is None:
+                first_timestamp = float(header_frame.get_row_timestamp(rows[0])) / 1000
+                bandwidth = header_frame.get_row_bandwidth(rows[0])
+
+            if frame_filter is not None:
+                rows = [data_line for data_line in rows if frame_filter.matches_mac(header_frame.get_row_mac(data_line))]
+
+            if first_row is None and len(rows) > 0:
+                first_row = rows[0]
+
+            timestamps.extend(float(header_frame.get_row_timestamp(data_line)) / 1000 - first_timestamp for data_line in rows)
+            rss_total.extend(header_frame.get_row_rssi(data_line) for data_line in rows)
+
+        if first_row is None:
+            raise IndexError("No frames to summarise in {}.".format(sources.get_source_name(path)))
+
+        csi_shape = header_frame.parse_rows([first_row])[0].shape
+
+        return CSIMetadata.from_headers(header_name, BACKEND_MAPPING[header_name], bandwidth, csi_shape, len(timestamps), [timestamps[0], timestamps[-1]], rss_total)
+
+    @staticmethod
+    def can_drop_rows(frame_filter: CSIFilter) -> bool:
+        # Rows from other MAC addresses can be dropped before their CSI is parsed, once the first frame,
+        # which timestamps are relative to, has been read. As frame indices count every frame, rows are
+        # kept where indices are filtered on.
+        return frame_filter is not None and frame_filter.macs is not None and frame_filter.frame_range is None
+
+    def read_file(self, path: str, scaled: bool = False, remove_unusable_subcarriers: bool = True, filter_mac: str = None, frame_filter: CSIFilter = None) -> CSIData:
+
+        # if scaled:
+        #     print("Scaling not yet supported in CSV formats.")
+
+        self.filename = os.path.basename(sources.get_source_name(path))
+        data = self.open_text(path)
+
+        # Frames are filtered by ret_data as they are pushed, with rows dropped beforehand where possible.
+        ret_data = CSIData(self.filename, "", "CSV Format", filter_mac=filter_mac, frame_filter=frame_filter)
+        drop_rows = CSVBeamformReader.can_drop_rows(ret_data.frame_filter)
+
+        header_line = data.readline()[:-1].split(",")
+        header_name = self.get_header_name(header_line)
+
         ret_data.set_chipset(header_name)
         ret_data.set_backend(BACKEND_MAPPING[header_name])
 
@@ -113,40 +408,38 @@ class CSVBeamformReader(Reader):
 
         first_timestamp = -1
 
-        while True:
-            data_line = data.readline().split(",")
-            if not data_line or len(data_line) != len(header_line):
-                break
-
-            if last_char and last_char not in data_line[-1]:
-                break
+        # Lines are read in blocks, with the CSI for each block tokenized in a single pass.
+        for rows in self.read_blocks(data, len(header_line), last_char):
+            rows = [data_line for data_line in rows if not self.is_discarded_antenna(header_frame, data_line)]
+            if drop_rows and first_timestamp != -1:
+                rows = [data_line for data_line in rows if ret_data.frame_filter.matches_mac(header_frame.get_row_mac(data_line))]
 
-            new_frame = header_frame(data_line)
-            if new_frame.csi_matrix is None:
-                continue
+            csi_matrices = header_frame.parse_rows(rows)
 
-            if new_frame.ant == 1:
-                continue
+            for data_line, csi_matrix in zip(rows, csi_matrices):
+                new_frame = header_frame(data_line, csi_matrix)
+                if new_frame.csi_matrix is None:
+                    continue
 
-            if ret_data.bandwidth == 0:
-                ret_data.bandwidth = new_frame.bandwidth
+                if ret_data.bandwidth == 0:
+                    ret_data.bandwidth = new_frame.bandwidth
 
-            if scaled:
-                new_frame.csi_matrix = csitools.scale_csi_frame(new_frame.csi_matrix, new_frame.rssi, new_frame.noise_floor)
+                if scaled:
+                    new_frame.csi_matrix = csitools.scale_csi_frame(new_frame.csi_matrix, new_frame.rssi, new_frame.noise_floor)
 
-            if first_timestamp == -1:
-                first_timestamp = float(new_frame.real_timestamp) / 1000
-                new_frame.real_timestamp = 0
-            else:
-                new_frame.real_timestamp = (float(new_frame.real_timestamp) / 1000) - first_timestamp
+                if first_timestamp == -1:
+                    first_timestamp = float(new_frame.real_timestamp) / 1000
+                    new_frame.real_timestamp = 0
+                else:
+                    new_frame.real_timestamp = (float(new_frame.real_timestamp) / 1000) - first_timestamp
 
-            # no_subcarriers = new_frame.csi_matrix.shape[0]
+                # no_subcarriers = new_frame.csi_matrix.shape[0]
 
-            # if remove_unusable_subcarriers and header_name == "ESP32":
-            #     new_frame.csi_matrix = new_frame.csi_matrix[[x for x in range(no_subcarriers) if x not in constants.ESP32_20MHZ_UNUSABLE]]
-            # elif remove_unusable_subcarriers:
-            #     print("Unsupported header format for null/pilot/guard subcarrier removal.")
+                # if remove_unusable_subcarriers and header_name == "ESP32":
+                #     new_frame.csi_matrix = new_frame.csi_matrix[[x for x in range(no_subcarriers) if x not in constants.ESP32_20MHZ_UNUSABLE]]
+                # elif remove_unusable_subcarriers:
+                #     print("Unsupported header format for null/pilot/guard subcarrier removal.")
 
-            ret_data.push_frame(new_frame, float(new_frame.real_timestamp))
+                ret_data.push_frame(new_frame, float(new_frame.real_timestamp))
 
         return ret_data
\ No newline at end of file
@@ -1,9 +1,13 @@
 import os
 
-from CSIKit.csi import CSIData
+from functools import partial
+
+from CSIKit.csi import CSIBatch, CSIData, CSIFilter, CSIMetadata
+from CSIKit.csi.csiframe import CSIMemoryBudget
 from CSIKit.csi.frames import FeitCSIFrame
-from CSIKit.reader import Reader
-from CSIKit.util import csitools, constants
+from CSIKit.reader import Reader, sources
+from CSIKit.reader.parallel import ParallelReader
+from CSIKit.util import byteops, csitools, constants
 import numpy as np
 import struct
 
@@ -42,7 +46,19 @@ RATE_MCS_BEAMF_MSK = (1 << RATE_MCS_BEAMF_POS)
 MAX_TICK = 4294967295
 TICK_RESOLUTION = 3.125
 
-class FeitCSIBeamformReader(Reader):
+HEADER_SIZE = 272
+HEADER_LENGTH_STRUCT = struct.Struct("I")
+
+# Only the fields used by FeitCSIFrame are described. The remaining bytes are reserved.
+HEADER_DTYPE = np.dtype({
+    "names": ["csi_length", "ftm_clock", "num_rx", "num_tx", "num_subcarriers", "rssi_1", "rssi_2", "source_mac",
+              "mu_clock", "rate_flags"],
+    "formats": ["<u4", "<u4", "u1", "u1", "<u4", "<u4", "<u4", ("u1", 6), "<u4", "<u4"],
+    "offsets": [0, 8, 46, 47, 52, 60, 64, 68, 88, 92],
+    "itemsize": HEADER_SIZE
+})
+
+class FeitCSIBeamformReader(Reader, ParallelReader):
 
     """
         This class handles parsing for CSI data from FeitCSI (AX200/AX210).
@@ -53,19 +69,96 @@ class FeitCSIBeamformReader(Reader):
 
     @staticmethod
     def can_read(path: str) -> bool:
-        file = open(path, "rb")
-        fileContent = file.read()
+        return FeitCSIBeamformReader.sniff(path, sources.read_prefix(path), os.path.getsize(path)) > 0
+
+    @staticmethod
+    def sniff(path: str, prefix: bytes, file_size: int) -> float:
+        """
+            Scores how likely a file is to have been generated by FeitCSI, using only its first bytes.
+
+            Records are followed through the prefix, and each header's CSI length must match its
+            subcarrier and antenna counts. Where the records end exactly at the end of the file, it is a certain match.
+
+            Parameters:
+                path {str} -- Path to the file.
+                prefix {bytes} -- First bytes of the file.
+                file_size {int} -- Size of the whole file, or None where it is not known, as for pipes.
+
+            Returns:
+                confidence {float} -- Value between 0 (not FeitCSI) and 1.
+        """
+        # An empty file is trivially a valid sequence of records.
+        if file_size == 0:
+            return 0.1
+
         step = 0
-        output = []
-        while (len(fileContent) > step):
-            csi_length = struct.unpack("I", fileContent[step:(step+272)][0:4])[0]
-            step += 272
-            step += csi_length
+        while step + HEADER_SIZE <= len(prefix):
+            header = np.frombuffer(prefix, dtype=HEADER_DTYPE, count=1, offset=step)[0]
+
+            # Each CSI value is a pair of int16s.
+            expected_length = 4 * int(header["num_rx"]) * int(header["num_tx"]) * int(header["num_subcarriers"])
+            if header["csi_length"] == 0 or header["csi_length"] != expected_length:
+                return 0
+
+            step += HEADER_SIZE + int(header["csi_length"])
+
+        if step == file_size:
+            return 1
+
+        # Otherwise the records must continue beyond the prefix.
+        if step > 0 and (file_size is None or len(prefix) < file_size and step <= file_size):
+            return 0.8
+
+        return 0
+
+    @staticmethod
+    def get_frame_offsets(data: bytes, step: int = 0, max_frames: int = None, complete: bool = False) -> np.array:
+        """
+            Finds the offset of every frame header in a FeitCSI file.
+
+            Parameters:
+                data {bytes} -- Contents of the file.
+                step {int} -- Offset of the frame to start from.
+                max_frames {int} -- Number of frames after which to stop. Defaults to the end of the file.
+                complete {bool} -- Whether to stop at a frame which has not been completely written,
+                    rather than raising struct.error for an incomplete header.
+
+            Returns:
+                offsets {np.array} -- int64 offset of each 272 byte header.
+        """
+        offsets = []
+        while len(data) > step and (max_frames is None or len(offsets) < max_frames):
+            if complete and step + HEADER_SIZE > len(data):
+                break
+
+            csi_length = HEADER_LENGTH_STRUCT.unpack_from(data, step)[0]
+            if complete and step + HEADER_SIZE + csi_length > len(data):
+                break
+
+            offsets.append(step)
+            step += HEADER_SIZE + csi_length
+
+        if len(offsets) > 0 and offsets[-1] + HEADER_SIZE > len(data):
+            raise struct.error("unpack requires a buffer of {} bytes".format(HEADER_SIZE))
+
+        return np.array(offsets, dtype=np.int64)
+
+    @staticmethod
+    def get_headers(data: bytes, offsets: np.array) -> np.array:
+        # Gathers every header into a structured array in a single pass.
+        rows = np.frombuffer(data, dtype=np.uint8)[offsets[:, None] + np.arange(HEADER_SIZE)]
+        return np.ascontiguousarray(rows).view(HEADER_DTYPE)[:, 0]
 
-        if step == len(fileContent):
-            return True
+    def parseHeaders(self, headers: np.array) -> list:
+        # Converts structured headers into the dicts produced by parseHeader.
+        parsed = []
+        for row in headers.tolist():
+            header = dict(zip(HEADER_DTYPE.names, row))
+            header["source_mac"] = tuple(header["source_mac"])
+            header["source_mac_string"] = "%02x:%02x:%02x:%02x:%02x:%02x" % header["source_mac"]
+            parsed.append(self.parseRateFlags(header))
 
-        return False
+        return parsed
 
     def parseHeader(self, data):
         header = {}
@@ -81,6 +174,9 @@ class FeitCSIBeamformReader(Reader):
         header["mu_clock"] = struct.unpack("I", data[88:92])[0]
         header["rate_flags"] = struct.unpack("I", data[92:96])[0]
 
+        return self.parseRateFlags(header)
+
+    def parseRateFlags(self, header):
         rate_format = header["rate_flags"] & RATE_MCS_MOD_TYPE_MSK
         if rate_format == RATE_MCS_CCK_MSK:
             rate_format = "CCK"
@@ -123,15 +219,21 @@ class FeitCSIBeamformReader(Reader):
         return header
 
     def parseCsiData(self, data, header):
-        csi_matrix = np.zeros((header["num_subcarriers"], header["num_rx"], header["num_tx"]), dtype=complex)
-        pos = 0
-        for j in range(header["num_rx"]):
-            for k in range(header["num_tx"]):
-                for n in range(header["num_subcarriers"]):
-                    real = struct.unpack("h", data[pos:pos + 2])[0]
-                    imag = struct.unpack("h", data[pos + 2:pos + 4])[0]
-                    pos += 4
-                    csi_matrix[n, j, k] = complex(real, imag)
+        # Interpolation and scaling modify the matrix in place, so values are kept at double precision.
+        csi_matrix = byteops.unpack_int16_csi(data, header["num_subcarriers"], header["num_rx"], header["num_tx"])
+        return csi_matrix.astype(complex)
+
+    def decodeCsiData(self, header, scaled, interpolate, data):
+        # Single frame equivalent of the decode, interpolation and scaling steps in read_file, used for lazy decoding.
+        csi = {"header": header, "csi_matrix": self.parseCsiData(data, header)}
+        if interpolate:
+            self.interpolate(csi)
+
+        csi_matrix = csi["csi_matrix"]
+        if scaled:
+            for j in range(header["num_rx"]):
+                csi_matrix[:,j,:] = csitools.scale_csi_frame(csi_matrix[:,j,:], header["rssi_1"])
+
         return csi_matrix
 
     def cubicInterpolate(self, y0, y1, y2, y3, mu):
@@ -148,91 +250,306 @@ class FeitCSIBeamformReader(Reader):
         return value
 
     def interpolate(self, csi):
-        indices = []
-        if csi["header"]["rate_format"] in ("HT", "VHT") and csi["header"]["channel_width"] == "20":
-            indices = [7, 21, 34, 48]
-        elif csi["header"]["rate_format"] in ("HT", "VHT") and csi["header"]["channel_width"] == "40":
-            indices = [5, 33, 47, 66, 80, 108]
-        elif csi["header"]["rate_format"] == "VHT" and csi["header"]["channel_width"] == "80":
-            indices = [19, 47, 83, 111, 130, 158, 194, 222]
-        elif csi["header"]["rate_format"] == "VHT" and csi["header"]["channel_width"] == "160":
-            indices = [19, 47, 83, 111, 130, 158, 194, 222, 261, 289, 325, 353, 372, 400, 436, 464]
-        elif csi["header"]["rate_format"] == "HE" and csi["header"]["channel_width"] == "20":
-            indices = [6, 32, 74, 100, 141, 167, 209, 235]
-        elif csi["header"]["rate_format"] == "HE" and csi["header"]["channel_width"] == "40":
-            indices = [6, 32, 74, 100, 140, 166, 208, 234, 249, 275, 317, 343, 383, 409, 451, 477]
-        elif csi["header"]["rate_format"] == "HE" and csi["header"]["channel_width"] == "80":
-            indices = [32, 100, 166, 234, 274, 342, 408, 476, 519, 587, 653, 721, 761, 829, 895, 963]
-        elif csi["header"]["rate_format"] == "HE" and csi["header"]["channel_width"] == "160":
-            indices = [32, 100, 166, 234, 274, 342, 408, 476, 519, 587, 653, 721, 761, 829, 895, 963, 1028, 1096, 1162, 1230, 1270, 1338, 1404, 1472, 1515, 1583, 1649, 1717, 1757, 1825, 1891, 1959]
-
-        amplitude = abs(csi["csi_matrix"])
-        phase = np.angle(csi["csi_matrix"])
-        # phase = np.unwrap(phase)
-        for i in indices:
-            for j in range(csi["csi_matrix"].shape[1]):
-                amplitude[i, j] = self.cubicInterpolate(amplitude[i - 2, j], amplitude[i - 1, j], \
-                    amplitude[i + 1, j], amplitude[i + 2, j], 0.5)
-                phase[i, j] = self.linearInterpolate(phase[i - 1, j], phase[i + 1, j], 0.5)
-                if phase[i - 1, j] > 2 and phase[i + 1, j] < -2:
-                    phase[i, j] = self.linearInterpolate(phase[i + 1, j], phase[i + 2, j], -1)
-                csi["csi_matrix"][i, j] = amplitude[i, j] * np.exp(1j * phase[i, j])
+        index_table = csitools.get_pilot_index_table(csi["header"]["rate_format"], csi["header"]["channel_width"])
+        csitools.interpolate_pilots(csi["csi_matrix"], index_table)
         return csi
 
+    def interpolate_frames(self, output: list):
+        """
+            Interpolates pilot subcarriers for every frame at once.
 
-    def read_file(self, path: str, scaled: bool = False, remove_unusable_subcarriers: bool = True, filter_mac: str = None, interpolate: bool = True) -> CSIData:
+            Frames sharing a rate format, channel width and matrix shape are stacked into a single
+            (frames, subcarriers, rx, tx) tensor and interpolated together.
 
-        self.filename = os.path.basename(path)
-        if not os.path.exists(path):
-            raise Exception("File not found: {}".format(path))
+            Parameters:
+                output {list} -- Frame dicts containing a header and csi_matrix.
+        """
+        groups = {}
+        for data in output:
+            header = data["header"]
+            key = (header["rate_format"], header["channel_width"], data["csi_matrix"].shape)
+            groups.setdefault(key, []).append(data)
 
-        file = open(path, "rb")
+        for (rate_format, channel_width, _), group in groups.items():
+            index_table = csitools.get_pilot_index_table(rate_format, channel_width)
+            if index_table is None:
+                continue
 
-        ret_data = CSIData(self.filename, "FeitCSI", "Intel AX2xx", filter_mac=filter_mac)
+            csi = np.stack([data["csi_matrix"] for data in group])
+            csitools.interpolate_pilots(csi, index_table)
 
-        fileContent = file.read()
-        step = 0
+            for data, csi_matrix in zip(group, csi):
+                data["csi_matrix"] = csi_matrix
+
+    def read_file(self, path: str, scaled: bool = False, remove_unusable_subcarriers: bool = True, filter_mac: str = None, interpolate: bool = True, lazy: bool = False, memory_budget: int = None, workers: int = None, frame_filter: CSIFilter = None) -> CSIData:
+
+        # path may also be a buffer or file object.
+        self.filename = os.path.basename(sources.get_source_name(path))
+
+        # Unless decoding lazily, the file may be decoded in parallel. See ParallelReader.read_parallel.
+        if workers is not None and workers > 1 and not lazy:
+            return self.read_parallel(path, workers, filter_mac, frame_filter, scaled=scaled, remove_unusable_subcarriers=remove_unusable_subcarriers, interpolate=interpolate)
+
+        frame_filter = CSIFilter.from_args(filter_mac, frame_filter)
+
+        fileContent = sources.read_source(path)
+
+        ret_data = CSIData(self.filename, "FeitCSI", "Intel AX2xx")
         output = []
-    
-        while (len(fileContent) > step):
+
+        offsets = self.get_frame_offsets(fileContent)
+        headers = self.parseHeaders(self.get_headers(fileContent, offsets))
+        content = memoryview(fileContent)
+        budget = CSIMemoryBudget(memory_budget) if memory_budget is not None else None
+
+        previous_frame = None
+        previous_timestamp = 0
+
+        for index, (step, header) in enumerate(zip(offsets.tolist(), headers)):
             data = {}
-            data["header"] = self.parseHeader(fileContent[step:(step+272)])
+            data["header"] = header
             if not ret_data.bandwidth:
                 ret_data.bandwidth = data["header"]["channel_width"]
-            step += 272
-            data["csi_matrix"] = self.parseCsiData(fileContent[step:(step + data["header"]["csi_length"])], data["header"])
-
-            if interpolate:
-                data = self.interpolate(data)
-            
-            if scaled:
-                for j in range(data["header"]["num_rx"]):
-                    data["csi_matrix"][:,j,:] = csitools.scale_csi_frame(data["csi_matrix"][:,j,:], data["header"]["rssi_1"])
-
-            frame = FeitCSIFrame(data["header"], data["csi_matrix"])
-            step += data["header"]["csi_length"]
+
+            # Frames are created without CSI, which is only decoded for frames meeting the filter.
+            # Each timestamp follows on from that of the previous frame, whether or not it was kept.
+            data["frame"] = FeitCSIFrame(header, None)
+
+            data["timestamp"] = 0
+            if previous_frame is not None:
+                data["timestamp"] = self.get_timestamp(header, previous_frame, previous_timestamp)
+
+            previous_frame = data["frame"]
+            previous_timestamp = data["timestamp"]
+
+            if frame_filter is not None and not frame_filter.matches(index, data["timestamp"], header["source_mac_string"]):
+                continue
+
+            step += HEADER_SIZE
+            data["payload"] = content[step:(step + data["header"]["csi_length"])]
+            if not lazy:
+                data["csi_matrix"] = self.parseCsiData(data["payload"], data["header"])
+
             output.append(data)
 
-            # timestamp calculation from ftm_clock (tick counter 3.125ns resolution) max ~13.4s then overflow
-            timestamp = 0
-            if len(ret_data.frames) > 0:
-                if (data["header"]["mu_clock"] - ret_data.frames[-1].mu_clock)/1e6 < (MAX_TICK * TICK_RESOLUTION)/1e9:
-                    if data["header"]["ftm_clock"] > ret_data.frames[-1].ftm_clock:
-                        diff = data["header"]["ftm_clock"] - ret_data.frames[-1].ftm_clock
-                    #overflow ftm_clock
-                    else: 
-                        diff = data["header"]["ftm_clock"] + (MAX_TICK - ret_data.frames[-1].ftm_clock)
-                    timestamp = ret_data.timestamps[-1] + ((diff * TICK_RESOLUTION) / 1e9)
-                # if size between mu_clock si larger than 13s we used mu_clock as reference time
-                else: 
-                    if data["header"]["mu_clock"] > ret_data.frames[-1].mu_clock:
-                        diff = data["header"]["mu_clock"] - ret_data.frames[-1].mu_clock
-                    #overflow mu_clock
-                    else: 
-                        diff = data["header"]["mu_clock"] + (MAX_TICK - ret_data.frames[-1].mu_clock)
-
-                    timestamp = ret_data.timestamps[-1] + (diff / 1e6)
+        if interpolate and not lazy:
+            self.interpolate_frames(output)
+
+        for data in output:
+            frame = data["frame"]
+            if lazy:
+                # Decoding, interpolation and scaling are deferred until csi_matrix is first accessed.
+                frame.set_lazy_csi(partial(self.decodeCsiData, data["header"], scaled, interpolate), data["payload"], budget)
+            else:
+                if scaled:
+                    for j in range(data["header"]["num_rx"]):
+                        data["csi_matrix"][:,j,:] = csitools.scale_csi_frame(data["csi_matrix"][:,j,:], data["header"]["rssi_1"])
+
+                frame.csi_matrix = data["csi_matrix"]
+
+            ret_data.push_frame(frame, data["timestamp"])
+
+        return ret_data
 
+    def read_metadata(self, path: str, filter_mac: str = None) -> CSIMetadata:
+        """
+            Summarises a FeitCSI file from its frame headers, decoding only the first kept frame's CSI.
+
+            Parameters:
+                path {str} -- Path to a FeitCSI file, or its contents as a buffer or binary file object.
+                filter_mac {str} -- Only count frames from this source MAC address.
+
+            Returns:
+                metadata {CSIMetadata} -- Frame count, shape, timing and RSSI for the file.
+        """
+        frame_filter = CSIFilter.from_args(filter_mac, None)
+
+        data = sources.read_source(path, memory_map=True)
+
+        offsets = self.get_frame_offsets(data)
+        if len(offsets) == 0:
+            raise IndexError("No frames to summarise in {}.".format(sources.get_source_name(path)))
+
+        headers = self.get_headers(data, offsets)
+        timestamps = self.get_timestamps(headers)
+
+        selected = np.arange(len(headers))
+        if frame_filter is not None:
+            macs = ["%02x:%02x:%02x:%02x:%02x:%02x" % tuple(mac) for mac in headers["source_mac"].tolist()]
+            selected = selected[frame_filter.mask(selected, timestamps, macs)]
+
+        if len(selected) == 0:
+            raise IndexError("No frames to summarise in {}.".format(sources.get_source_name(path)))
+
+        # Interpolation does not change the shape of the CSI, so the first kept frame is only unpacked.
+        first_header = self.parseHeaders(headers[selected[:1]])[0]
+        payload_offset = int(offsets[selected[0]]) + HEADER_SIZE
+        csi_shape = self.parseCsiData(memoryview(data)[payload_offset:payload_offset + first_header["csi_length"]], first_header).shape
+
+        rss_total = np.maximum(headers["rssi_1"], headers["rssi_2"])[selected]
+
+        # As in read_file, the bandwidth is the channel width of the first frame, whether or not it is kept.
+        bandwidth = self.parseHeaders(headers[:1])[0]["channel_width"]
+
+        return CSIMetadata.from_headers("Intel AX2xx", "FeitCSI", bandwidth, csi_shape, len(selected), timestamps[selected[[0, -1]]].tolist(), rss_total)
+
+    def get_record_boundaries(self, data: bytes) -> np.array:
+        return self.get_frame_offsets(data)
+
+    def read_chunk(self, data: bytes, chunk: tuple, frame_filter: CSIFilter = None, **kwargs) -> CSIData:
+        # Frames never span chunks, so each chunk is read as a file of its own.
+        # Frames not meeting frame_filter are kept without CSI, as rebase_timestamps needs the clocks of every frame.
+        start, end = chunk
+        data = data[start:end]
+
+        chunk_data = self.read_file(data, frame_filter=frame_filter, **kwargs)
+        if frame_filter is None:
+            return chunk_data
+
+        headers = self.parseHeaders(self.get_headers(data, self.get_frame_offsets(data)))
+        selected = frame_filter.mask(np.arange(len(headers)), macs=[header["source_mac_string"] for header in headers])
+
+        ret_data = CSIData(chunk_data.filename, chunk_data.backend, chunk_data.chipset)
+        ret_data.bandwidth = chunk_data.bandwidth
+
+        kept_frames = iter(zip(chunk_data.frames, chunk_data.timestamps))
+        for header, keep in zip(headers, selected.tolist()):
+            frame, timestamp = next(kept_frames) if keep else (FeitCSIFrame(header, None), 0)
             ret_data.push_frame(frame, timestamp)
 
-        return ret_data
\ No newline at end of file
+        return ret_data
+
+    def rebase_timestamps(self, chunks: list):
+        # Each timestamp follows on from that of the previous frame, so they are recomputed across chunks.
+        # Frames left without CSI by read_chunk are then replaced by None, for join_chunks to drop.
+        previous_frame = None
+        previous_timestamp = 0
+
+        for chunk in chunks:
+            for i, frame in enumerate(chunk.frames):
+                if previous_frame is not None:
+                    header = {"mu_clock": frame.mu_clock, "ftm_clock": frame.ftm_clock}
+                    chunk.timestamps[i] = self.get_timestamp(header, previous_frame, previous_timestamp)
+
+                previous_frame = frame
+                previous_timestamp = chunk.timestamps[i]
+
+                if frame.csi_matrix is None:
+                    chunk.frames[i] = None
+
+    def iter_frames(self, path: str, batch_size: int = 1024, scaled: bool = False, interpolate: bool = True, poll_interval: float = None):
+        """
+            Reads a FeitCSI file in batches of frames, decoding and interpolating one batch at a time.
+
+            Parameters:
+                path {str} -- Path to a FeitCSI .csi file.
+                batch_size {int} -- Maximum number of frames in each batch.
+                scaled {bool} -- Whether to scale CSI against RSSI, as in read_file.
+                interpolate {bool} -- Whether to interpolate pilot subcarriers, as in read_file.
+                poll_interval {float} -- If given, seconds to wait for appended frames at the end of the file. See follow.
+
+            Yields:
+                batch {CSIBatch} -- CSI tensor, timestamps and header columns for up to batch_size frames.
+        """
+        with sources.open_source(path) as file:
+            # Streams, such as compressed captures, are parsed one block at a time.
+            streaming = sources.is_stream(file)
+            fileContent = b"" if streaming else sources.map_file(file)
+            content = memoryview(fileContent)
+
+            base = 0
+            cursor = 0
+            previous_frame = None
+            previous_timestamp = 0
+
+            while True:
+                offsets = self.get_frame_offsets(fileContent, cursor, batch_size, streaming or poll_interval is not None)
+                if len(offsets) == 0:
+                    fileContent, consumed = sources.next_block(file, fileContent, cursor, poll_interval)
+                    if fileContent is None:
+                        break
+
+                    content = memoryview(fileContent)
+                    base += consumed
+                    cursor -= consumed
+                    continue
+
+                headers = self.parseHeaders(self.get_headers(fileContent, offsets))
+
+                output = []
+                for step, header in zip(offsets.tolist(), headers):
+                    step += HEADER_SIZE
+                    output.append({"header": header, "csi_matrix": self.parseCsiData(content[step:(step + header["csi_length"])], header)})
+
+                if interpolate:
+                    self.interpolate_frames(output)
+
+                frames = []
+                timestamps = []
+                for data in output:
+                    if scaled:
+                        for j in range(data["header"]["num_rx"]):
+                            data["csi_matrix"][:,j,:] = csitools.scale_csi_frame(data["csi_matrix"][:,j,:], data["header"]["rssi_1"])
+
+                    frame = FeitCSIFrame(data["header"], data["csi_matrix"])
+
+                    timestamp = 0
+                    if previous_frame is not None:
+                        timestamp = self.get_timestamp(data["header"], previous_frame, previous_timestamp)
+
+                    frames.append(frame)
+                    timestamps.append(timestamp)
+
+                    previous_frame = frame
+                    previous_timestamp = timestamp
+
+                cursor = int(offsets[-1]) + HEADER_SIZE + headers[-1]["csi_length"]
+
+                yield CSIBatch.from_frames(frames, timestamps, base + cursor)
+
+    @staticmethod
+    def get_timestamps(headers: np.array) -> np.array:
+        """
+            Bulk equivalent of get_timestamp, finding the timestamp read_file gives each frame from its headers alone.
+
+            Parameters:
+                headers {np.array} -- Structured headers for every frame in the file, from get_headers.
+
+            Returns:
+                timestamps {np.array} -- Seconds since the first frame.
+        """
+        ftm_clock = headers["ftm_clock"].astype(np.int64)
+        mu_clock = headers["mu_clock"].astype(np.int64)
+
+        # Each clock wraps around at MAX_TICK, and an unchanged clock is taken to have wrapped.
+        ftm_diff = np.diff(ftm_clock)
+        ftm_diff = np.where(ftm_diff > 0, ftm_diff, ftm_diff + MAX_TICK)
+
+        mu_diff = np.diff(mu_clock)
+        uses_ftm_clock = mu_diff / 1e6 < (MAX_TICK * TICK_RESOLUTION) / 1e9
+        mu_diff = np.where(mu_diff > 0, mu_diff, mu_diff + MAX_TICK)
+
+        steps = np.where(uses_ftm_clock, (ftm_diff * TICK_RESOLUTION) / 1e9, mu_diff / 1e6)
+
+        # Timestamps are accumulated in order, as each follows on from the previous one.
+        return np.concatenate(([0.0], np.add.accumulate(steps)))
+
+    @staticmethod
+    def get_timestamp(header: dict, previous_frame: FeitCSIFrame, previous_timestamp: float) -> float:
+        # timestamp calculation from ftm_clock (tick counter 3.125ns resolution) max ~13.4s then overflow
+        if (header["mu_clock"] - previous_frame.mu_clock)/1e6 < (MAX_TICK * TICK_RESOLUTION)/1e9:
+            if header["ftm_clock"] > previous_frame.ftm_clock:
+                diff = header["ftm_clock"] - previous_frame.ftm_clock
+            #overflow ftm_clock
+            else: 
+                diff = header["ftm_clock"] + (MAX_TICK - previous_frame.ftm_clock)
+            return previous_timestamp + ((diff * TICK_RESOLUTION) / 1e9)
+        # if size between mu_clock si larger than 13s we used mu_clock as reference time
+        else: 
+            if header["mu_clock"] > previous_frame.mu_clock:
+                diff = header["mu_clock"] - previous_frame.mu_clock
+            #overflow mu_clock
+            else: 
+                diff = header["mu_clock"] + (MAX_TICK - previous_frame.mu_clock)
+
+            return previous_timestamp + (diff / 1e6)
\ No newline at end of file
@@ -1,12 +1,18 @@
+import itertools
+import mmap
 import os
 import struct
 import time
 
+from functools import partial
+
 import numpy as np
 
-from CSIKit.csi import CSIData
+from CSIKit.csi import CSIBatch, CSIData, CSIFilter, CSIMetadata
+from CSIKit.csi.csiframe import CSIMemoryBudget
 from CSIKit.csi.frames import NEXCSIFrame
-from CSIKit.reader import Reader
+from CSIKit.reader import Reader, sources
+from CSIKit.reader.parallel import ParallelReader
 
 from CSIKit.util import byteops
 from CSIKit.util import csitools, stringops
@@ -34,23 +40,53 @@ class PcapFrame:
         "6a00": "4366c0" #Seen on both the RT-AC86U and GT-AC5300
     }
 
-    def __init__(self, data: bytes):
+    # The Nexmon payload header starts after the Ethernet, IP and UDP headers.
+    PAYLOAD_HEADER_OFFSET = 42
+
+    # Overlapping fields let the stock nexmon marker and both core/spatial byte orders
+    # be read from the same 22 bytes.
+    PAYLOAD_HEADER_DTYPE = np.dtype({
+        "names": ["marker", "magic_bytes", "rssi", "frame_control", "source_mac", "sequence_no",
+                  "core_spatial_le", "core_spatial_be", "channel_spec", "chip"],
+        "formats": ["<u4", "V2", "i1", "u1", ("u1", 6), "<u2", "<u2", ">u2", ">u2", ">u2"],
+        "offsets": [0, 0, 2, 3, 4, 10, 12, 12, 14, 16],
+        "itemsize": 22
+    })
+
+    STOCK_NEXMON_MARKER = 0x11111111
+
+    def __init__(self, data: bytes, offset: int = None, payloadHeader: dict = None, ts_scale: float = 1e+6):
+        # Frames are either read sequentially from a file object,
+        # or viewed in place at a given offset within a buffer.
         self.data = data
+        self.offset = offset
         self.length = 0
 
+        # Units of ts_usec per second, which are nanoseconds in captures with a nanosecond magic number.
+        self.ts_scale = ts_scale
+
         self.header = None
         self.payload = None
-        self.payloadHeader = None
+
+        # Payload headers may already have been decoded in bulk by Pcap.
+        self.payloadHeader = payloadHeader
 
         self.header = self.read_header()
         self.payload = self.read_payload()
             
     def read_header(self):
-        headerBytes = self.data.read(self.FRAME_HEADER_DTYPE.itemsize)
-        if len(headerBytes) != self.FRAME_HEADER_DTYPE.itemsize:
-            raise BufferError("Unable to read data for header")
+        if self.offset is not None:
+            if self.offset + self.FRAME_HEADER_DTYPE.itemsize > len(self.data):
+                raise BufferError("Unable to read data for header")
+
+            header = np.frombuffer(self.data, dtype=self.FRAME_HEADER_DTYPE, count=1, offset=self.offset)
+        else:
+            headerBytes = self.data.read(self.FRAME_HEADER_DTYPE.itemsize)
+            if len(headerBytes) != self.FRAME_HEADER_DTYPE.itemsize:
+                raise BufferError("Unable to read data for header")
+
+            header = np.frombuffer(headerBytes, dtype=self.FRAME_HEADER_DTYPE)
 
-        header = np.frombuffer(headerBytes, dtype=self.FRAME_HEADER_DTYPE)
         self.length += self.FRAME_HEADER_DTYPE.itemsize
 
         if header is None:
@@ -113,7 +149,69 @@ class PcapFrame:
             payloadHeader["chip"] = "UNKNOWN"
 
         return payloadHeader
-        
+
+    @staticmethod
+    def read_payloadHeaders(data: bytes, offsets: np.array) -> dict:
+        """
+            Decodes the Nexmon payload headers of many frames at once.
+
+            The endianness of the core/spatial field is resolved for each frame, as in read_payloadHeader,
+            while the chip lookup is resolved once per distinct value.
+
+            Parameters:
+                data {bytes} -- Buffer containing the frames.
+                offsets {np.array} -- Offset of each frame's payload within data.
+
+            Returns:
+                columns {dict} -- Array for each of the keys produced by read_payloadHeader.
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        header_size = PcapFrame.PAYLOAD_HEADER_DTYPE.itemsize
+
+        raw = np.frombuffer(data, dtype=np.uint8)
+        rows = raw[(offsets + PcapFrame.PAYLOAD_HEADER_OFFSET)[:, None] + np.arange(header_size)]
+        headers = np.ascontiguousarray(rows).view(PcapFrame.PAYLOAD_HEADER_DTYPE)[:, 0]
+
+        columns = {}
+        columns["magic_bytes"] = headers["magic_bytes"].copy()
+
+        # Devices running stock nexmon do not provide rssi or frame_control.
+        stock_nexmon = headers["marker"] == PcapFrame.STOCK_NEXMON_MARKER
+        # Fields are widened first, as -1 is out of range for frame_control's uint8.
+        columns["rssi"] = np.where(stock_nexmon, -1, headers["rssi"].astype(np.int16))
+        columns["frame_control"] = np.where(stock_nexmon, -1, headers["frame_control"].astype(np.int16))
+
+        mac_keys = np.zeros(len(headers), dtype=np.uint64)
+        for i in range(6):
+            mac_keys = (mac_keys << np.uint64(8)) | headers["source_mac"][:, i].astype(np.uint64)
+        unique_macs, mac_indices = np.unique(mac_keys, return_inverse=True)
+        mac_strings = [stringops.hexToMACString("{:012x}".format(int(x))) for x in unique_macs]
+        columns["source_mac"] = np.array(mac_strings, dtype=object)[mac_indices] if len(headers) > 0 else np.zeros(0, dtype=object)
+
+        columns["sequence_no"] = headers["sequence_no"].astype(np.int64)
+
+        # As in read_payloadHeader, values over the max possible value (0b111111)
+        # mean the frame uses big endianness for this field.
+        core_spatial = np.where(headers["core_spatial_le"] > 63, headers["core_spatial_be"], headers["core_spatial_le"])
+
+        # Masks are read from the top six bits, matching the zfill(6) slicing in read_payloadHeader.
+        core_spatial = core_spatial.astype(np.int64)
+        bit_lengths = np.floor(np.log2(np.maximum(core_spatial, 1))).astype(np.int64) + 1
+        shift = np.maximum(bit_lengths - 6, 0)
+
+        columns["core"] = (core_spatial >> shift) & 0b111
+        columns["spatial_stream"] = (core_spatial >> (shift + 3)) & 0b111
+
+        unique_specs, spec_indices = np.unique(headers["channel_spec"], return_inverse=True)
+        spec_strings = ["{:04x}".format(int(x)) for x in unique_specs]
+        columns["channel_spec"] = np.array(spec_strings, dtype=object)[spec_indices] if len(headers) > 0 else np.zeros(0, dtype=object)
+
+        unique_chips, chip_indices = np.unique(headers["chip"], return_inverse=True)
+        chip_names = [PcapFrame.CHIPS.get("{:04x}".format(int(x)), "UNKNOWN") for x in unique_chips]
+        columns["chip"] = np.array(chip_names, dtype=object)[chip_indices] if len(headers) > 0 else np.zeros(0, dtype=object)
+
+        return columns
+
     def read_payload(self) -> np.array:
         if self.header is None or len(self.header["incl_len"]) == 0:
             return None
@@ -122,18 +220,25 @@ class PcapFrame:
         if incl_len <= 0:
             return False
 
-        payload_bytes = self.data.read(incl_len)
-        if payload_bytes is None:
-            raise BufferError("Could not read payload")
+        if self.offset is not None:
+            # Payloads are viewed in place, so no bytes are copied.
+            payload_offset = self.offset + self.FRAME_HEADER_DTYPE.itemsize
+            if payload_offset + incl_len > len(self.data):
+                raise BufferError("Could not read payload")
+
+            payload_bytes = memoryview(self.data)[payload_offset:payload_offset + incl_len]
+        else:
+            payload_bytes = self.data.read(incl_len)
+            if payload_bytes is None or len(payload_bytes) != incl_len:
+                raise BufferError("Could not read payload")
 
         if (incl_len % 4) == 0:
-            ints_size = int(incl_len / 4)
-            payload = np.array(struct.unpack(ints_size*"I", payload_bytes), dtype=np.uint32)
+            payload = np.frombuffer(payload_bytes, dtype=np.uint32)
         else:
-            ints_size = incl_len
-            payload = np.array(struct.unpack(ints_size*"B", payload_bytes), dtype=np.uint8)
+            payload = np.frombuffer(payload_bytes, dtype=np.uint8)
 
-        self.payloadHeader = PcapFrame.read_payloadHeader(payload.tobytes()[42:64])
+        if self.payloadHeader is None:
+            self.payloadHeader = PcapFrame.read_payloadHeader(bytes(payload_bytes[42:64]))
         self.length += incl_len
 
         return payload
@@ -170,32 +275,200 @@ class Pcap:
         ("network", np.uint32)
     ])
 
-    def stream(self):
+    RECORD_LENGTH_STRUCT = struct.Struct("I")
+
+    # Nanosecond resolution pcap magic numbers, in both byte orders.
+    NANOSECOND_MAGIC_NUMBERS = [b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d"]
+
+    def stream(self, offsets: np.array = None):
+        if self.buffer is not None:
+            if offsets is None:
+                offsets = self.get_record_offsets()
+
+            for offset, payloadHeader in zip(offsets.tolist(), self.get_payload_headers(offsets)):
+                next_frame = PcapFrame(self.buffer, offset, payloadHeader, self.ts_scale)
+                if self.calculate_size(next_frame):
+                    yield next_frame
+            return
+
         while True:
             try:
-                next_frame = PcapFrame(self.data)
+                next_frame = PcapFrame(self.data, ts_scale=self.ts_scale)
                 if self.calculate_size(next_frame):
                     yield next_frame
             except BufferError:
                 break
 
-    def __init__(self, filename: str):
-        self.data = open(filename, "rb")
-        self.header = self.data.read(self.PCAP_HEADER_DTYPE.itemsize)
+    def __init__(self, filename: str, memory_map: bool = True):
+        # filename may also be a buffer, which is parsed in place, or a binary file object.
+        # Streams which cannot be memory-mapped, such as pipes and compressed captures, are read one frame at a time.
+        # Files opened and memory maps created here are released by close.
+        self.buffer = None
+        self.mapped = None
+        self.opened = False
+
+        compressed = sources.get_compression(filename) is not None
+        if sources.is_buffer(filename) and not compressed:
+            self.data = None
+            self.buffer = sources.read_source(filename)
+        elif hasattr(filename, "read") and not compressed:
+            self.data = filename
+        else:
+            self.data = sources.open_source(filename)
+            self.opened = True
+
+        if memory_map and self.buffer is None:
+            try:
+                if not sources.is_stream(self.data) and self.data.tell() == 0:
+                    self.mapped = mmap.mmap(self.data.fileno(), 0, access=mmap.ACCESS_READ)
+                    self.buffer = self.mapped
+            except (ValueError, OSError):
+                # Empty files, pipes and some special files cannot be memory-mapped.
+                self.buffer = None
+
+        if self.data is None:
+            self.header = bytes(self.buffer[:self.PCAP_HEADER_DTYPE.itemsize])
+        else:
+            self.header = self.data.read(self.PCAP_HEADER_DTYPE.itemsize)
+
+        # Frame timestamps hold nanoseconds rather than microseconds where the capture's magic number says so.
+        self.ts_scale = 1e+9 if self.header[:4] in self.NANOSECOND_MAGIC_NUMBERS else 1e+6
         self.frames = []
         self.skipped_frames = 0
         self.bandwidth = 0
         self.expected_size = None
 
+    def __enter__(self) -> "Pcap":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+            Releases the memory map of the capture, and closes its file if it was opened by this Pcap.
+
+            File objects given by the caller are left open. Frames still viewing the memory map,
+            such as those decoded lazily, keep it mapped until they are released.
+        """
+        self.frames = []
+        self.buffer = None
+
+        if self.mapped is not None:
+            try:
+                self.mapped.close()
+            except BufferError:
+                # The map is closed once the last frame viewing it is released.
+                pass
+            self.mapped = None
+
+        if self.opened:
+            self.data.close()
+            self.opened = False
+
     def read(self):
+        if self.buffer is not None:
+            self.frames.extend(self.stream())
+            return
+
         while True:
             try:
-                next_frame = PcapFrame(self.data)
+                next_frame = PcapFrame(self.data, ts_scale=self.ts_scale)
                 if self.calculate_size(next_frame):
                     self.frames.append(next_frame)
             except BufferError:
                 break
 
+    def get_record_offsets(self, pos: int = None) -> np.array:
+        """
+            Finds the offset of every complete record in the memory-mapped capture.
+
+            Consecutive records with the same length are very common, so each run is validated in bulk
+            using a strided view over the incl_len fields, rather than stepping through them one by one.
+
+            Parameters:
+                pos {int} -- Offset of the record to start from. Defaults to the first record.
+
+            Returns:
+                offsets {np.array} -- int64 offset of each record header within the capture.
+        """
+        buffer = self.buffer
+        length = len(buffer)
+
+        header_size = PcapFrame.FRAME_HEADER_DTYPE.itemsize
+        incl_len_offset = PcapFrame.FRAME_HEADER_DTYPE.fields["incl_len"][1]
+
+        offsets = []
+        if pos is None:
+            pos = self.PCAP_HEADER_DTYPE.itemsize
+
+        while pos + header_size <= length:
+            incl_len = self.RECORD_LENGTH_STRUCT.unpack_from(buffer, pos + incl_len_offset)[0]
+            stride = header_size + incl_len
+
+            count = (length - pos) // stride
+            if count == 0:
+                # Final record has been cut off.
+                break
+
+            run_lengths = np.ndarray((count,), dtype=np.uint32, buffer=buffer, offset=pos + incl_len_offset, strides=(stride,))
+            mismatches = np.flatnonzero(run_lengths != incl_len)
+            if len(mismatches) > 0:
+                count = int(mismatches[0])
+
+            offsets.append(pos + stride * np.arange(count, dtype=np.int64))
+            pos += stride * count
+
+        if len(offsets) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        return np.concatenate(offsets)
+
+    def read_payload_headers(self, offsets: np.array = None) -> dict:
+        """
+            Decodes the Nexmon payload headers for every record in the memory-mapped capture.
+
+            Records too short to hold a payload header are excluded, and their entries in
+            valid are set to False.
+
+            Parameters:
+                offsets {np.array} -- Record offsets, as returned by get_record_offsets.
+
+            Returns:
+                columns {dict} -- Array for each payload header field, alongside the record offsets, original lengths and timestamps.
+        """
+        if offsets is None:
+            offsets = self.get_record_offsets()
+
+        header_size = PcapFrame.FRAME_HEADER_DTYPE.itemsize
+        rows = np.frombuffer(self.buffer, dtype=np.uint8)[offsets[:, None] + np.arange(header_size)]
+        frame_headers = np.ascontiguousarray(rows).view(PcapFrame.FRAME_HEADER_DTYPE)[:, 0]
+
+        min_length = PcapFrame.PAYLOAD_HEADER_OFFSET + PcapFrame.PAYLOAD_HEADER_DTYPE.itemsize
+        valid = frame_headers["incl_len"] >= min_length
+
+        columns = PcapFrame.read_payloadHeaders(self.buffer, offsets[valid] + header_size)
+        columns["offset"] = offsets[valid]
+        columns["orig_len"] = frame_headers["orig_len"][valid]
+        columns["timestamp"] = frame_headers["ts_sec"][valid] + frame_headers["ts_usec"][valid]/self.ts_scale
+        columns["valid"] = valid
+
+        return columns
+
+    def get_payload_headers(self, offsets: np.array) -> list:
+        # Bulk-decoded headers in the per-frame dict form, or None where
+        # the frame should parse its own header.
+        columns = self.read_payload_headers(offsets)
+        keys = ["magic_bytes", "rssi", "frame_control", "source_mac", "sequence_no", "core", "spatial_stream",
+                "channel_spec", "chip"]
+
+        payloadHeaders = [None] * len(offsets)
+        values = zip(*[columns[key].tolist() for key in keys])
+        for i, row in zip(np.flatnonzero(columns["valid"]).tolist(), values):
+            payloadHeaders[i] = dict(zip(keys, row))
+
+        return payloadHeaders
+
     def calculate_size(self, frame):
         if frame is None or frame.header is None or frame.payload is None or frame.payloadHeader is None:
             # print("Incomplete pcap frame header found. Cannot parse any further frames.")
@@ -223,7 +496,12 @@ class Pcap:
 
         return True
 
-class NEXBeamformReader(Reader):
+class NEXBeamformReader(Reader, ParallelReader):
+
+    # Microsecond and nanosecond resolution pcap magic numbers, in both byte orders.
+    PCAP_MAGIC_NUMBERS = [b"\xd4\xc3\xb2\xa1", b"\xa1\xb2\xc3\xd4", b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d"]
+
+    SUPPORTED_CHIPS = ["4339", "43455c0", "4358", "4366c0"]
 
     BW_SUBS = {
         80: 256,
@@ -235,6 +513,9 @@ class NEXBeamformReader(Reader):
      "chip"]
     EMPTY_HEADER = {k: 0 for k in HEADER_SLOTS}
 
+    # Number of frames iter_frames reads from streams which cannot be mapped to establish their layout.
+    LAYOUT_FRAMES = 4096
+
     def __init__(self, fill_skipped_frames: bool = True):
         super().__init__()
         self.fill_skipped_frames = fill_skipped_frames
@@ -242,6 +523,31 @@ class NEXBeamformReader(Reader):
     @staticmethod
     def can_read(path: str) -> bool:
         return os.path.exists(path) and os.path.splitext(path)[1] == ".pcap"
+
+    @staticmethod
+    def sniff(path: str, prefix: bytes, file_size: int) -> float:
+        """
+            Scores how likely a file is to be a Nexmon .pcap capture, using only its first bytes.
+
+            Parameters:
+                path {str} -- Path to the file, used for its extension.
+                prefix {bytes} -- First bytes of the file.
+                file_size {int} -- Size of the whole file.
+
+            Returns:
+                confidence {float} -- Value between 0 (not Nexmon) and 1.
+        """
+        extension = os.path.splitext(path)[1]
+
+        # Sources without an extension, such as buffers and pipes, are identified from their contents alone.
+        if extension not in [".pcap", ""]:
+            return 0
+
+        # Any .pcap file is accepted, as before, but one starting with a pcap magic number is a certain match.
+        if prefix[:4] in NEXBeamformReader.PCAP_MAGIC_NUMBERS:
+            return 1
+
+        return 0.5 if extension == ".pcap" else 0
             
     @staticmethod
     def unpack_float(format: int, nfft: int, nfftx1: np.array) -> np.array:
@@ -251,48 +557,63 @@ class NEXBeamformReader(Reader):
             return byteops.unpack_float_acphy(10, 1, 0, 1, 12, 6, nfft, nfftx1)
             # return byteops.unpack_float_acphy(1, 12, 6, nfft, nfftx1)
 
-    def read_stream(self, path: str, scaled: bool = False):
+    def read_stream(self, path: str, scaled: bool = False, frame_filter: CSIFilter = None):
         self.chip = " UNKNOWN"
         self.scaled = scaled
 
-        self.filename = os.path.basename(path)
-        if not os.path.exists(path):
-            raise Exception("File not found: {}".format(path))
-        
-        self.pcap = Pcap(path)
-        for f in self.pcap.stream():
-            ret_data = CSIData()
-            ret_data.bandwidth = self.pcap.bandwidth
-            data = self.read_frame(f, scaled, ret_data.bandwidth)
-            ret_data.push_frame(data, data.timestamp)
-            ret_data.set_backend("Nexmon CSI")
-            ret_data.set_chipset("Broadcom BCM{}".format(self.chip))
-            yield ret_data
+        # path may also be a buffer or binary file object. Pipes, such as from tcpdump -w -, are parsed as frames arrive.
+        self.filename = os.path.basename(sources.get_source_name(path))
+        sources.check_source(path)
+
+        with Pcap(path) as self.pcap:
+            for index, f in enumerate(self.pcap.stream()):
+                # Frames not meeting frame_filter are skipped before their CSI is unpacked.
+                if frame_filter is not None and not frame_filter.matches(index, NEXBeamformReader.get_timestamp(f), f.payloadHeader["source_mac"], f.payloadHeader["sequence_no"]):
+                    continue
+
+                ret_data = CSIData()
+                ret_data.bandwidth = self.pcap.bandwidth
+                data = self.read_frame(f, scaled, ret_data.bandwidth)
+                ret_data.push_frame(data, data.timestamp)
+                ret_data.set_backend("Nexmon CSI")
+                ret_data.set_chipset("Broadcom BCM{}".format(self.chip))
+                yield ret_data
 
-    def read_file(self, path: str, scaled: bool = False, filter_mac: str = "") -> CSIData:
+    def read_file(self, path: str, scaled: bool = False, filter_mac: str = "", lazy: bool = False, memory_budget: int = None, workers: int = None, frame_filter: CSIFilter = None) -> CSIData:
 
         self.chip = " UNKNOWN"
 
-        self.filename = os.path.basename(path)
-        if not os.path.exists(path):
-            raise Exception("File not found: {}".format(path))
+        # path may also be a buffer or binary file object.
+        self.filename = os.path.basename(sources.get_source_name(path))
+        sources.check_source(path)
+
+        frame_filter = CSIFilter.from_args(filter_mac, frame_filter)
+
+        # Unless decoding lazily, the file may be decoded in parallel. See ParallelReader.read_parallel.
+        if workers is not None and workers > 1 and not lazy:
+            return self.read_parallel(path, workers, frame_filter=frame_filter, scaled=scaled)
 
-        self.pcap = Pcap(path)
-        self.pcap.read()
         self.scaled = scaled
 
         ret_data = CSIData(self.filename, backend="Nexmon CSI")
-        ret_data.bandwidth = self.pcap.bandwidth
-        ret_data.skipped_frames = self.pcap.skipped_frames
-        ret_data.expected_frames = len(self.pcap.frames)+self.pcap.skipped_frames
 
-        data_frames = self.read_frames(self.pcap.frames, scaled, ret_data.bandwidth)
+        # The capture is closed once read. Frames decoded lazily keep it mapped until they are released.
+        with Pcap(path) as self.pcap:
+            self.pcap.read()
+
+            ret_data.bandwidth = self.pcap.bandwidth
+            ret_data.skipped_frames = self.pcap.skipped_frames
+            ret_data.expected_frames = len(self.pcap.frames)+self.pcap.skipped_frames
+
+            data_frames = self.read_frames(self.pcap.frames, scaled, ret_data.bandwidth, lazy, memory_budget, frame_filter)
+
         for frame in data_frames:
             if frame is not None:
                 ret_data.push_frame(frame, frame.timestamp)
                 # ret_data.timestamps.append(frame.timestamp)
 
-        if self.fill_skipped_frames:
+        # Skipped frames have no headers to filter on, so are only filled in without a filter.
+        if self.fill_skipped_frames and frame_filter is None:
             empty_subcount = self.BW_SUBS[ret_data.bandwidth]
             empty_csi = np.zeros((empty_subcount, 1), dtype=np.complex64)
             empty_frame = NEXCSIFrame(self.EMPTY_HEADER, empty_csi)
@@ -303,28 +624,444 @@ class NEXBeamformReader(Reader):
 
         return ret_data
 
-    def read_bfee(self, pcap_frame: PcapFrame, bandwidth: int, remove_unusuable_subcarriers: bool=True) -> NEXCSIFrame:
+    def iter_frames(self, path: str, batch_size: int = 1024, scaled: bool = False, poll_interval: float = None):
+        """
+            Reads a Nexmon .pcap file in batches of frames, decoding one batch of CSI at a time.
+
+            Whether a capture holds single stream frames, and its numbers of cores and spatial streams,
+            are established first from the payload headers alone, so each batch is assembled as read_file would.
+            Streams which cannot be memory-mapped, such as pipes and compressed captures, are only read once,
+            so their layout is established from their first LAYOUT_FRAMES frames, as follow_frames does at its first poll.
+            Batches are only split between sequences. When fill_skipped_frames is set, skipped frames are
+            yielded last as a batch of empty frames.
+
+            Parameters:
+                path {str} -- Path to a Nexmon .pcap file.
+                batch_size {int} -- Maximum number of frames in each batch.
+                poll_interval {float} -- If given, seconds to wait for appended frames at the end of the file. See follow_frames.
+
+            Yields:
+                batch {CSIBatch} -- CSI tensor, timestamps and header columns for up to batch_size frames.
+        """
+        self.chip = " UNKNOWN"
+        self.scaled = scaled
+
+        self.filename = os.path.basename(sources.get_source_name(path))
+        sources.check_source(path)
+
+        if poll_interval is not None:
+            yield from self.follow_frames(path, batch_size, poll_interval)
+            return
+
+        with Pcap(path) as self.pcap:
+            if self.pcap.buffer is not None:
+                # Mapped captures keep only the offset of each frame from the first pass, to be viewed again batch by batch.
+                offsets = np.array([x.offset for x in self.pcap.stream()], dtype=np.int64)
+                if len(offsets) == 0:
+                    return
+
+                headers = self.pcap.read_payload_headers(offsets)
+                layout = self.get_stream_layout(headers["sequence_no"], headers["core"], headers["spatial_stream"])
+
+                frame_sources = self.pcap.stream(offsets)
+            else:
+                # File objects, pipes and compressed captures cannot be read again, so their layout is established
+                # from a bounded prefix of frames, which are then decoded with the rest of the stream.
+                frame_sources = self.pcap.stream()
+                prefix = list(itertools.islice(frame_sources, self.LAYOUT_FRAMES))
+                if len(prefix) == 0:
+                    return
+
+                headers = np.array([(x.payloadHeader["sequence_no"], x.payloadHeader["core"], x.payloadHeader["spatial_stream"]) for x in prefix], dtype=np.int64).T
+                layout = self.get_stream_layout(*headers)
+
+                frame_sources = itertools.chain(prefix, frame_sources)
+
+            single_stream, max_spatial_stream, max_core = layout
+
+            pcap_frames = []
+            frame_groups = []
+            previous_sequence_no = None
+            group = -1
+            for pcap_frame in frame_sources:
+                # Frames are grouped as in get_sequence_groups, one sequence at a time.
+                frame_sequence_no = pcap_frame.payloadHeader["sequence_no"]
+                if single_stream or frame_sequence_no != previous_sequence_no or group < 0:
+                    group += 1
+                previous_sequence_no = frame_sequence_no
+
+                if len(pcap_frames) > 0 and group != frame_groups[-1] and frame_groups[-1] - frame_groups[0] + 1 >= batch_size:
+                    yield from self.read_frame_batch(pcap_frames, frame_groups, single_stream, max_spatial_stream, max_core)
+                    pcap_frames = []
+                    frame_groups = []
+
+                pcap_frames.append(pcap_frame)
+                frame_groups.append(group)
+
+            if len(pcap_frames) > 0:
+                yield from self.read_frame_batch(pcap_frames, frame_groups, single_stream, max_spatial_stream, max_core)
+
+        if self.fill_skipped_frames and self.pcap.skipped_frames > 0:
+            empty_subcount = self.BW_SUBS[self.pcap.bandwidth]
+            empty_csi = np.zeros((empty_subcount, 1), dtype=np.complex64)
+            empty_frames = [NEXCSIFrame(self.EMPTY_HEADER, empty_csi)] * self.pcap.skipped_frames
+
+            yield CSIBatch.from_frames(empty_frames, [0] * self.pcap.skipped_frames)
+
+    def follow_frames(self, path: str, batch_size: int, poll_interval: float):
+        """
+            Reads a capture which is still being written, for iter_frames and follow.
+
+            As the whole capture is not yet available, its stream layout is established from the frames
+            present at the first poll, as read_file would have done at that point. For multi-stream captures,
+            the last sequence is held back until the next one begins. Skipped frames are not filled.
+
+            Parameters:
+                path {str} -- Path to a Nexmon .pcap file.
+                batch_size {int} -- Maximum number of frames in each batch.
+                poll_interval {float} -- Seconds to wait for appended frames at the end of the file.
+
+            Yields:
+                batch {CSIBatch} -- CSI tensor, timestamps and header columns for up to batch_size frames.
+        """
+        header_size = PcapFrame.FRAME_HEADER_DTYPE.itemsize
+        incl_len_offset = PcapFrame.FRAME_HEADER_DTYPE.fields["incl_len"][1]
+
+        with open(path, "rb") as file, Pcap(file, memory_map=False) as self.pcap:
+            data = sources.map_file(file)
+            while len(data) < Pcap.PCAP_HEADER_DTYPE.itemsize:
+                data = sources.wait_for_data(file, data, poll_interval)
+
+            self.pcap.buffer = data
+
+            pos = None
+            layout = None
+            pcap_frames = []
+
+            while True:
+                offsets = self.pcap.get_record_offsets(pos)
+                if len(offsets) == 0:
+                    data = sources.wait_for_data(file, data, poll_interval)
+                    self.pcap.buffer = data
+                    continue
+
+                last_offset = int(offsets[-1])
+                pos = last_offset + header_size + Pcap.RECORD_LENGTH_STRUCT.unpack_from(data, last_offset + incl_len_offset)[0]
+
+                pcap_frames.extend(self.pcap.stream(offsets))
+                if len(pcap_frames) == 0:
+                    continue
+
+                sequence_no = np.array([x.payloadHeader["sequence_no"] for x in pcap_frames], dtype=np.int64)
+                group_indices, _ = self.get_sequence_groups(sequence_no)
+
+                if layout is None:
+                    core = np.array([x.payloadHeader["core"] for x in pcap_frames], dtype=np.int64)
+                    spatial_stream = np.array([x.payloadHeader["spatial_stream"] for x in pcap_frames], dtype=np.int64)
+                    layout = self.get_stream_layout(sequence_no, core, spatial_stream)
+
+                single_stream, rx_num, tx_num = layout
+                if single_stream:
+                    group_indices = np.arange(len(pcap_frames))
+                    ready = len(pcap_frames)
+                else:
+                    # The last sequence may not have been completely written yet.
+                    ready = int(np.searchsorted(group_indices, group_indices[-1]))
+
+                starts = np.flatnonzero(np.diff(group_indices[:ready], prepend=-1)).tolist() + [ready]
+                for i in range(0, len(starts) - 1, batch_size):
+                    start = starts[i]
+                    end = starts[min(i + batch_size, len(starts) - 1)]
+
+                    yield from self.read_frame_batch(pcap_frames[start:end], group_indices[start:end].tolist(), single_stream, rx_num, tx_num)
+
+                pcap_frames = pcap_frames[ready:]
+
+    def read_frame_batch(self, pcap_frames: list, frame_groups: list, single_stream: bool, rx_num: int, tx_num: int):
+        # Decodes one batch of iter_frames, yielding nothing if none of its frames could be decoded.
+        frames = self.decode_frames(pcap_frames, frame_groups, single_stream, rx_num, tx_num)
+        if len(frames) == 0:
+            return
+
+        last_frame = pcap_frames[-1]
+        offset = last_frame.offset + last_frame.length if last_frame.offset is not None else None
+
+        yield CSIBatch.from_frames(frames, [x.timestamp for x in frames], offset)
+
+    def decode_frames(self, pcap_frames: list, frame_groups: list, single_stream: bool, rx_num: int, tx_num: int) -> list:
+        # Decodes frames split only between sequences, given the layout of the whole capture.
+        # Frames which could not be decoded are left out.
+        if len(pcap_frames) == 0:
+            return []
+
+        bandwidth = self.pcap.bandwidth
+        unpacked = self.unpack_frames(pcap_frames, bandwidth)
+
+        if single_stream:
+            frames = [self.read_bfee(x, bandwidth, data=data) for x, data in zip(pcap_frames, unpacked)]
+            return [x for x in frames if x is not None]
+
+        group_indices = np.array(frame_groups, dtype=np.int64) - frame_groups[0]
+        return self.read_bfee_sequences(pcap_frames, bandwidth, group_indices, rx_num, tx_num, unpacked)
+
+    def get_record_boundaries(self, data: bytes) -> np.array:
+        # Every pcap record is a boundary, though get_chunks only splits between sequences.
+        return Pcap(data).get_record_offsets()
+
+    def get_chunks(self, data: bytes, count: int) -> list:
+        """
+            Splits a capture into chunks for read_parallel.
+
+            As in iter_frames, the stream layout of the whole capture is established first,
+            and chunks are only split between sequences.
+
+            Parameters:
+                data {bytes} -- Contents of the capture.
+                count {int} -- Maximum number of chunks.
+
+            Returns:
+                chunks {list} -- (offsets, frame_groups, single_stream, rx_num, tx_num, bandwidth) for each chunk,
+                    where offsets holds the offset of each valid record.
+        """
+        self.pcap = Pcap(data)
+        pcap_frames = list(self.pcap.stream())
+
+        offsets = np.array([x.offset for x in pcap_frames], dtype=np.int64)
+        if len(pcap_frames) == 0:
+            return [(offsets, [], True, 1, 1, self.pcap.bandwidth)]
+
+        sequence_no, core, spatial_stream = np.array([(x.payloadHeader["sequence_no"], x.payloadHeader["core"], x.payloadHeader["spatial_stream"]) for x in pcap_frames], dtype=np.int64).T
+        single_stream, max_spatial_stream, max_core = self.get_stream_layout(sequence_no, core, spatial_stream)
+
+        group_indices, _ = self.get_sequence_groups(sequence_no)
+        if single_stream:
+            group_indices = np.arange(len(sequence_no))
+
+        starts = np.flatnonzero(np.diff(group_indices, prepend=-1))
+        targets = np.linspace(0, len(pcap_frames), count + 1)[1:-1]
+        splits = np.unique(np.concatenate([[0], starts[np.minimum(np.searchsorted(starts, targets), len(starts) - 1)], [len(pcap_frames)]])).tolist()
+
+        return [(offsets[start:end], group_indices[start:end].tolist(), single_stream, max_spatial_stream, max_core, self.pcap.bandwidth) for start, end in zip(splits[:-1], splits[1:])]
+
+    def read_chunk(self, data: bytes, chunk: tuple, scaled: bool = False, frame_filter: CSIFilter = None) -> CSIData:
+        # Sequences not meeting frame_filter are pushed as None, without unpacking their CSI.
+        # As in read_frames, they are matched on the headers of their first frame.
+        offsets, frame_groups, single_stream, rx_num, tx_num, bandwidth = chunk
+
+        self.chip = " UNKNOWN"
+        self.scaled = scaled
+
+        self.pcap = Pcap(data)
+        self.pcap.bandwidth = bandwidth
+
+        pcap_frames = [PcapFrame(self.pcap.buffer, offset, payloadHeader, self.pcap.ts_scale) for offset, payloadHeader in zip(offsets.tolist(), self.pcap.get_payload_headers(offsets))]
+
+        ret_data = CSIData(backend="Nexmon CSI")
+        ret_data.bandwidth = bandwidth
+        ret_data.expected_frames = len(pcap_frames)
+
+        if frame_filter is None:
+            for frame in self.decode_frames(pcap_frames, frame_groups, single_stream, rx_num, tx_num):
+                ret_data.push_frame(frame, frame.timestamp)
+        else:
+            starts = np.flatnonzero(np.diff(frame_groups, prepend=-1)).tolist()
+            first_frames = [pcap_frames[i] for i in starts]
+            selected_groups = frame_filter.mask(np.arange(len(starts)), *self.get_filter_columns(first_frames)).tolist()
+
+            # Consecutive sequences which are kept are decoded together.
+            ends = starts[1:] + [len(pcap_frames)]
+            for keep, groups in itertools.groupby(zip(starts, ends, first_frames, selected_groups), key=lambda x: x[3]):
+                groups = list(groups)
+                if keep:
+                    start, end = groups[0][0], groups[-1][1]
+                    for frame in self.decode_frames(pcap_frames[start:end], frame_groups[start:end], single_stream, rx_num, tx_num):
+                        ret_data.push_frame(frame, frame.timestamp)
+                else:
+                    # Frames from unsupported chips are not numbered, as they are dropped once decoded.
+                    for _, _, first_frame, _ in groups:
+                        if not single_stream or first_frame.payloadHeader["chip"] in self.SUPPORTED_CHIPS:
+                            ret_data.push_frame(None, self.get_timestamp(first_frame))
+
+        ret_data.set_chipset("Broadcom BCM{}".format(self.chip))
+
+        return ret_data
+
+    def join_chunks(self, chunks: list, filter_mac: str = None, frame_filter: CSIFilter = None) -> CSIData:
+        # Frames skipped while establishing the layout are counted, and filled in, as in read_file.
+        ret_data = super().join_chunks(chunks, filter_mac, frame_filter)
+
+        # As in read_file, the chip is that of the last frame kept which reports one.
+        chip = next((frame.chip for frame in reversed(ret_data.frames) if frame.chip != "UNKNOWN"), " UNKNOWN")
+        ret_data.set_chipset("Broadcom BCM{}".format(chip))
+
+        ret_data.skipped_frames = self.pcap.skipped_frames
+        ret_data.expected_frames += self.pcap.skipped_frames
+
+        if self.fill_skipped_frames and ret_data.frame_filter is None:
+            empty_subcount = self.BW_SUBS[ret_data.bandwidth]
+            empty_csi = np.zeros((empty_subcount, 1), dtype=np.complex64)
+            empty_frame = NEXCSIFrame(self.EMPTY_HEADER, empty_csi)
+            for _ in range(ret_data.skipped_frames):
+                ret_data.push_frame(empty_frame, 0)
+
+        return ret_data
+
+    def read_headers(self, path: str) -> dict:
+        """
+            Reads the Nexmon payload header of every frame in a .pcap file, without decoding any CSI.
+
+            Parameters:
+                path {str} -- Path to a Nexmon .pcap file, or its contents as a buffer or binary file object.
+
+            Returns:
+                columns {dict} -- Array for each payload header field, with one entry per frame.
+        """
+        sources.check_source(path)
+
+        with Pcap(path) as pcap:
+            if pcap.buffer is None:
+                pcap.buffer = pcap.header + pcap.data.read()
+
+            return pcap.read_payload_headers()
+
+    def read_metadata(self, path: str, filter_mac: str = None) -> CSIMetadata:
+        """
+            Summarises a .pcap capture from its payload headers, decoding only the first frame's CSI.
+
+            Frames are counted as read_file would count them. Records whose size does not match the
+            capture's bandwidth are skipped, frames from unsupported chips are dropped, and multi-stream
+            captures are counted by sequence. Skipped frames are filled in when fill_skipped_frames is set.
+
+            Parameters:
+                path {str} -- Path to a Nexmon .pcap file, or its contents as a buffer or binary file object.
+                filter_mac {str} -- Only count frames from this source MAC address.
+
+            Returns:
+                metadata {CSIMetadata} -- Frame count, shape, timing and RSSI for the capture.
+        """
+        frame_filter = CSIFilter.from_args(filter_mac, None)
+        sources.check_source(path)
+
+        with Pcap(path) as pcap:
+            if pcap.buffer is None:
+                pcap.buffer = pcap.header + pcap.data.read()
+
+            offsets = pcap.get_record_offsets()
+            headers = pcap.read_payload_headers(offsets)
+
+            # Records are kept as in Pcap.calculate_size, where the first record of a known size sets the bandwidth.
+            given_size = headers["orig_len"].astype(np.int64) - (Pcap.HOFFSET-1)*4
+            known = np.isin(given_size, list(Pcap.BW_SIZES))
+            if not np.any(known):
+                return super().read_metadata(path, filter_mac)
+
+            expected_size = int(given_size[known][0])
+            bandwidth = Pcap.BW_SIZES[expected_size]
+
+            kept = given_size == expected_size
+            skipped_frames = int(np.count_nonzero(~kept))
+
+            headers = {key: value[kept] for key, value in headers.items() if key != "valid"}
+
+            sequence_no = headers["sequence_no"]
+            single_stream = sequence_no[0] == sequence_no[-1]
+
+            if single_stream:
+                # Frames from unsupported chips are dropped once decoded, and are not numbered by the filter.
+                selected = np.flatnonzero(np.isin(headers["chip"], self.SUPPORTED_CHIPS))
+            else:
+                # Each sequence is assembled into one frame, described by the headers of its first frame.
+                group_indices, continued = self.get_sequence_groups(sequence_no)
+                selected = np.flatnonzero(np.diff(group_indices, prepend=-1))
+
+                rx_num = int(headers["spatial_stream"][continued].max(initial=0) + 1)
+                tx_num = int(headers["core"][continued].max(initial=0) + 1)
+
+            if frame_filter is not None:
+                selected = selected[frame_filter.mask(np.arange(len(selected)), headers["timestamp"][selected], headers["source_mac"][selected].tolist(), sequence_no[selected])]
+
+            if len(selected) > 0:
+                if single_stream:
+                    # Scaling does not change the shape of the CSI.
+                    self.scaled = False
+                    offset = headers["offset"][selected[:1]]
+                    first_frame = PcapFrame(pcap.buffer, int(offset[0]), pcap.get_payload_headers(offset)[0], pcap.ts_scale)
+                    csi_shape = self.read_bfee(first_frame, bandwidth).csi_matrix.shape
+                else:
+                    csi_shape = (self.BW_SUBS[bandwidth], rx_num, tx_num)
+
+        timestamps = headers["timestamp"][selected].tolist()
+        rss_total = headers["rssi"][selected].tolist()
+
+        chips = [x for x in headers["chip"][selected].tolist() if x != "UNKNOWN"]
+        chip = chips[-1] if chips else " UNKNOWN"
+
+        # Skipped frames have no headers to filter on, so are only filled in without a filter.
+        if self.fill_skipped_frames and frame_filter is None and skipped_frames > 0:
+            if len(selected) == 0:
+                csi_shape = (self.BW_SUBS[bandwidth], 1)
+
+            timestamps += [0] * skipped_frames
+            rss_total += [0] * skipped_frames
+
+        if len(timestamps) == 0:
+            return super().read_metadata(path, filter_mac)
+
+        return CSIMetadata.from_headers("Broadcom BCM{}".format(chip), "Nexmon CSI", bandwidth, csi_shape, len(timestamps), [timestamps[0], timestamps[-1]], rss_total)
+
+    def unpack_frames(self, pcap_frames: list, bandwidth: int) -> list:
+        """
+            Extracts the raw CSI values from a list of frames.
+
+            Frames using the acphy float format (4358, 4366c0) are stacked and unpacked in one call per chip,
+            rather than one call per frame.
+
+            Parameters:
+                pcap_frames {list} -- PcapFrames to extract CSI from.
+                bandwidth {int} -- Bandwidth established for the capture.
+
+            Returns:
+                unpacked {list} -- 1D array of interleaved real/imag values for each frame, or None for unsupported chips.
+        """
+        nfft = int(bandwidth*3.2)
+
+        unpacked = [None] * len(pcap_frames)
+        float_groups = {}
+
+        for i, pcap_frame in enumerate(pcap_frames):
+            chipType = pcap_frame.payloadHeader["chip"]
+
+            if chipType in ["4339", "43455c0"]:
+                unpacked[i] = pcap_frame.payload.view(np.int16)[30:]
+            elif chipType in ["4358", "4366c0"]:
+                words = pcap_frame.payload[15:15+nfft]
+                float_groups.setdefault((chipType, len(words)), []).append(i)
+
+        for (chipType, _), indices in float_groups.items():
+            words = np.stack([pcap_frames[i].payload[15:15+nfft] for i in indices])
+            values = self.unpack_float(0 if chipType == "4358" else 1, nfft, words)
+
+            for row, i in enumerate(indices):
+                unpacked[i] = values[row]
+
+        return unpacked
+
+    def read_bfee(self, pcap_frame: PcapFrame, bandwidth: int, remove_unusuable_subcarriers: bool=True, data: np.array=None, lazy: bool=False, memory_budget: CSIMemoryBudget=None) -> NEXCSIFrame:
         if pcap_frame is None:
             return None
 
-        #ts_usec contains microseconds as an offset to the main seconds timestamp.
-        usecs = pcap_frame.header["ts_usec"][0]/1e+6
-        timestamp = pcap_frame.header["ts_sec"][0]+usecs
-
-        data = pcap_frame.payload
+        timestamp = NEXBeamformReader.get_timestamp(pcap_frame)
 
         chipType = pcap_frame.payloadHeader["chip"]
 
-        if chipType in ["4339", "43455c0"]:
-            data.dtype = np.int16
-            data = data[30:]
-        elif chipType == "4358":
-            data = data[15:15+int(bandwidth*3.2)]
-            data = self.unpack_float(0, int(bandwidth*3.2), data)
-        elif chipType == "4366c0":
-            data = data[15:15+int(bandwidth*3.2)]
-            data = self.unpack_float(1, int(bandwidth*3.2), data)
-        else:
+        if lazy:
+            # Unsupported chips are identified from the payload header, as the CSI is not yet unpacked.
+            if chipType not in self.SUPPORTED_CHIPS:
+                return None
+        elif data is None:
+            data = self.unpack_frames([pcap_frame], bandwidth)[0]
+
+        if not lazy and data is None:
             # print("Invalid chip: " + chipType)
             # print("Current supported chipsets: 4339,43455c0,4358,4366c0")
             # exit(1)
@@ -337,121 +1074,229 @@ class NEXBeamformReader(Reader):
         if chipType != "UNKNOWN":
             self.chip = chipType
 
+        if lazy:
+            frame = NEXCSIFrame(pcap_frame.payloadHeader, None)
+            frame.set_lazy_csi(partial(self.decode_csi, bandwidth=bandwidth, scaled=self.scaled), pcap_frame, memory_budget)
+            return frame
+
+        return NEXCSIFrame(pcap_frame.payloadHeader, self.decode_csi(pcap_frame, bandwidth, self.scaled, data))
+
+    def decode_csi(self, pcap_frame: PcapFrame, bandwidth: int, scaled: bool, data: np.array=None) -> np.array:
+        if data is None:
+            data = self.unpack_frames([pcap_frame], bandwidth)[0]
+
         # data is now a 1d matrix of int32 values.
         # To convert this to complex doubles, we'll first reshape into pairs.
         # And then interpret the int32 matrix as float32, before viewing as complex64.
         # This removes several for loops.
         if len(data) % 2 != 0:
-            return NEXCSIFrame(pcap_frame.payloadHeader, np.zeros((self.BW_SUBS[bandwidth], 1)))
+            return np.zeros((self.BW_SUBS[bandwidth], 1))
 
         csiData = data.reshape(-1, 2)
         csi = csiData.astype(np.float32).view(np.complex64)
 
-        if self.scaled:
+        if scaled:
             csi = csitools.scale_csi_frame(csi, pcap_frame.payloadHeader["rssi"])
 
         # no_subcarriers = csi.shape[0]
         # if remove_unusuable_subcarriers:
         #     csi = csi[[x for x in range(no_subcarriers) if x not in constants.PI_20MHZ_UNUSABLE]]
 
-        return NEXCSIFrame(pcap_frame.payloadHeader, csi)
+        return csi
+
+    def read_bfee_batch(self, pcap_frames: list, bandwidth: int, rx_num: int = 1, tx_num: int = 1, unpacked: list = None) -> NEXCSIFrame:
+        group_indices = np.zeros(len(pcap_frames), dtype=np.int64)
+        return self.read_bfee_sequences(pcap_frames, bandwidth, group_indices, rx_num, tx_num, unpacked)[0]
+
+    def read_bfee_sequences(self, pcap_frames: list, bandwidth: int, group_indices: np.array, rx_num: int = 1, tx_num: int = 1, unpacked: list = None) -> list:
+        """
+            Assembles frames sharing a sequence number into a single multi-antenna frame.
+
+            CSI for every frame is scattered into one preallocated (sequences, subcarriers, rx, tx) tensor,
+            using each frame's spatial stream and core as indices.
+
+            Parameters:
+                pcap_frames {list} -- PcapFrames to assemble.
+                bandwidth {int} -- Bandwidth established for the capture.
+                group_indices {np.array} -- Index of the sequence each frame belongs to.
+                rx_num {int} -- Number of spatial streams.
+                tx_num {int} -- Number of cores.
+                unpacked {list} -- Raw CSI for each frame, as returned by unpack_frames.
+
+            Returns:
+                frames {list} -- NEXCSIFrame for each sequence, with csi_matrix as a view of the shared tensor.
+        """
+        no_subcarriers = self.BW_SUBS[bandwidth]
+        starts = np.flatnonzero(np.diff(group_indices, prepend=-1))
+
+        if unpacked is None:
+            unpacked = self.unpack_frames(pcap_frames, bandwidth)
+
+        frame_data = []
+        for i, data in enumerate(unpacked):
+            sequence_no = pcap_frames[i].payloadHeader["sequence_no"]
+            if data is None:
+                start = starts[np.searchsorted(starts, i, side="right") - 1]
+                raise Exception("Invalid chip {} in sequence {}. Current supported chipsets: 4339,43455c0,4358,4366c0".format(pcap_frames[start].payloadHeader["chip"], sequence_no))
+
+            # data is a 1d matrix of int32 values.
+            # To convert this to complex doubles, we'll reshape into pairs.
+            # And then view the int32 matrix as float32, before viewing as complex64.
+            if len(data) % 2 != 0:
+                raise Exception("Incomplete payload on frame in sequence {}.".format(sequence_no))
+            elif len(data) > 512: # TODO: Resolve extraneous bytes issue with Nexmon PR 256.
+                data = data[-512:]
+
+            if len(data) != no_subcarriers * 2:
+                raise ValueError("Frame in sequence {} has {} subcarriers, where {} were expected for a {}MHz capture.".format(sequence_no, len(data) // 2, no_subcarriers, bandwidth))
 
-    def read_bfee_batch(self, pcap_frames: list, bandwidth: int, rx_num: int = 1, tx_num: int = 1) -> NEXCSIFrame:
+            frame_data.append(data)
 
-        total_csi = np.zeros((tx_num, rx_num, self.BW_SUBS[bandwidth]), dtype=complex)
+        csi = np.stack(frame_data).astype(np.float32).view(np.complex64)
 
-        frame_header = pcap_frames[0].header
-        payload_header = pcap_frames[0].payloadHeader
+        if self.scaled:
+            csi = np.stack([csitools.scale_csi_frame(x.reshape(-1, 1), pcap_frame.payloadHeader["rssi"]).flatten() for x, pcap_frame in zip(csi, pcap_frames)])
 
-        # ts_usec contains microseconds as an offset to the main seconds timestamp.
-        usecs = frame_header["ts_usec"][0] / 1e+6
-        timestamp = frame_header["ts_sec"][0] + usecs
+        core = np.array([x.payloadHeader["core"] for x in pcap_frames], dtype=np.int64)
+        spatial_stream = np.array([x.payloadHeader["spatial_stream"] for x in pcap_frames], dtype=np.int64)
+        outside = np.flatnonzero((core >= tx_num) | (spatial_stream >= rx_num))
+        if len(outside) > 0:
+            i = int(outside[0])
+            raise IndexError("Frame in sequence {} has core {} and spatial stream {}, beyond the {} cores and {} spatial streams found in the capture.".format(pcap_frames[i].payloadHeader["sequence_no"], core[i], spatial_stream[i], tx_num, rx_num))
 
-        # Manually adding timestamp to the payloadHeader.
-        # TODO: Merge differently.
-        payload_header["timestamp"] = timestamp
+        # Where a core/spatial stream pair repeats within a sequence, the last frame is kept.
+        keys = (group_indices * tx_num + core) * rx_num + spatial_stream
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last
 
-        chipType = payload_header["chip"]
-        if chipType != "UNKNOWN":
-            self.chip = chipType
+        total_csi = np.zeros((len(starts), no_subcarriers, rx_num, tx_num), dtype=csi.dtype)
+        total_csi[group_indices[last], :, spatial_stream[last], core[last]] = csi[last]
 
-        for pcap_frame in pcap_frames:
-            data = pcap_frame.payload
+        frames = []
+        for sequence, start in enumerate(starts.tolist()):
+            payload_header = pcap_frames[start].payloadHeader
+            timestamp = NEXBeamformReader.get_timestamp(pcap_frames[start])
 
-            if chipType in ["4339", "43455c0"]:
-                data.dtype = np.int16
-                data = data[30:]
-            elif chipType == "4358":
-                data = data[15:15 + int(bandwidth * 3.2)]
-                data = self.unpack_float(0, int(bandwidth * 3.2), data)
-            elif chipType == "4366c0":
-                data = data[15:15 + int(bandwidth * 3.2)]
-                data = self.unpack_float(1, int(bandwidth * 3.2), data)
-            else:
-                print("Invalid chip: " + chipType)
-                print("Current supported chipsets: 4339,43455c0,4358,4366c0")
-                exit(1)
+            # Manually adding timestamp to the payloadHeader.
+            # TODO: Merge differently.
+            payload_header["timestamp"] = timestamp
 
-            # data is now a 1d matrix of int32 values.
-            # To convert this to complex doubles, we'll first reshape into pairs.
-            # And then view the int32 matrix as float32, before viewing as complex64.
-            # This removes several for loops.
-            if len(data) % 2 != 0:
-                print("Incomplete payload on frame")
-                exit(1)
-            elif len(data) > 512: # TODO: Resolve extraneous bytes issue with Nexmon PR 256.
-                data = data[-512:]
+            chipType = payload_header["chip"]
+            if chipType != "UNKNOWN":
+                self.chip = chipType
+
+            frames.append(NEXCSIFrame(payload_header, total_csi[sequence]))
+
+        return frames
 
-            csiData = data.reshape(-1, 2)
-            csi = csiData.astype(np.float32).view(np.complex64)
+    @staticmethod
+    def get_timestamp(pcap_frame: PcapFrame) -> float:
+        #ts_usec contains microseconds (or nanoseconds) as an offset to the main seconds timestamp.
+        usecs = pcap_frame.header["ts_usec"][0]/pcap_frame.ts_scale
+        return pcap_frame.header["ts_sec"][0]+usecs
+
+    @staticmethod
+    def get_sequence_groups(sequence_no: np.array) -> tuple:
+        """
+            Splits frames into runs of consecutive frames sharing a sequence number.
+
+            Parameters:
+                sequence_no {np.array} -- Sequence number of each frame.
 
-            if self.scaled:
-                csi = csitools.scale_csi_frame(csi, pcap_frame.payloadHeader["rssi"])
+            Returns:
+                group_indices {np.array} -- Index of the run each frame belongs to.
+                continued {np.array} -- Whether each frame continues the run of the previous frame.
+        """
+        # Runs are compared against an initial sequence number of 0.
+        continued = np.diff(sequence_no, prepend=0) == 0
 
-            core = pcap_frame.payloadHeader["core"]
-            spatial_stream = pcap_frame.payloadHeader["spatial_stream"]
+        new_group = ~continued
+        new_group[0] = True
+        group_indices = np.cumsum(new_group) - 1
+
+        return group_indices, continued
+
+    @staticmethod
+    def get_stream_layout(sequence_no: np.array, core: np.array, spatial_stream: np.array) -> tuple:
+        """
+            Establishes how the frames of a capture are assembled into CSI matrices.
+
+            Parameters:
+                sequence_no {np.array} -- Sequence number of each frame.
+                core {np.array} -- Core of each frame.
+                spatial_stream {np.array} -- Spatial stream of each frame.
+
+            Returns:
+                layout {tuple} -- (single_stream, rx_num, tx_num), where single_stream is set if every frame is its own matrix.
+        """
+        # Check if sequence_no changes. If not, 1Rx/Tx stream.
+        single_stream = bool(sequence_no[0] == sequence_no[-1])
 
-            total_csi[core][spatial_stream] = csi.flatten()
+        _, continued = NEXBeamformReader.get_sequence_groups(sequence_no)
+        max_core = int(np.asarray(core)[continued].max(initial=0) + 1)
+        max_spatial_stream = int(np.asarray(spatial_stream)[continued].max(initial=0) + 1)
 
-        return NEXCSIFrame(payload_header, np.transpose(total_csi))
+        return single_stream, max_spatial_stream, max_core
 
     def read_frame(self, frame, scaled:bool, bandwidth: int):
         return self.read_bfee(frame, bandwidth)
 
-    def read_frames(self, frames: list, scaled: bool, bandwidth: int) -> list:
+    def read_frames(self, frames: list, scaled: bool, bandwidth: int, lazy: bool = False, memory_budget: int = None, frame_filter: CSIFilter = None) -> list:
 
         # Check if sequence_no changes. If not, 1Rx/Tx stream.
-        if frames[0].payloadHeader["sequence_no"] == frames[-1].payloadHeader["sequence_no"]:
-            return [self.read_bfee(x, bandwidth) for x in frames]
+        single_stream = frames[0].payloadHeader["sequence_no"] == frames[-1].payloadHeader["sequence_no"]
+
+        if single_stream and frame_filter is not None:
+            # Frames from unsupported chips are not numbered, as they are dropped once decoded.
+            frames = [x for x in frames if x.payloadHeader["chip"] in self.SUPPORTED_CHIPS]
+
+            selected = frame_filter.mask(np.arange(len(frames)), *self.get_filter_columns(frames))
+            frames = [x for x, keep in zip(frames, selected) if keep]
+
+        # Only single stream frames can be decoded lazily, as multi-stream frames share one assembled tensor.
+        if lazy and single_stream:
+            budget = CSIMemoryBudget(memory_budget) if memory_budget is not None else None
+            return [self.read_bfee(x, bandwidth, lazy=True, memory_budget=budget) for x in frames]
+
+        if single_stream:
+            # Raw CSI is unpacked for the whole file at once.
+            unpacked = self.unpack_frames(frames, bandwidth)
+            return [self.read_bfee(x, bandwidth, data=data) for x, data in zip(frames, unpacked)]
 
         # Otherwise, read sequential spatial streams in batches.
-        sequences = []
-        current_sequence = []
-        current_sequence_no = 0
+        sequence_no = np.array([x.payloadHeader["sequence_no"] for x in frames], dtype=np.int64)
+        group_indices, continued = self.get_sequence_groups(sequence_no)
 
-        max_core = 0
-        max_spatial_stream = 0
+        # Antenna counts are established from the frames following the first of each sequence.
+        core = np.array([x.payloadHeader["core"] for x in frames], dtype=np.int64)
+        spatial_stream = np.array([x.payloadHeader["spatial_stream"] for x in frames], dtype=np.int64)
 
-        for frame in frames:
-            if frame.payloadHeader["sequence_no"] != current_sequence_no:
-                if len(current_sequence) > 0:
-                    sequences.append(current_sequence)
+        max_core = core[continued].max(initial=0) + 1
+        max_spatial_stream = spatial_stream[continued].max(initial=0) + 1
 
-                current_sequence = [frame]
-                current_sequence_no = frame.payloadHeader["sequence_no"]
-            else:
-                if frame.payloadHeader["core"] > max_core:
-                    max_core = frame.payloadHeader["core"]
+        if frame_filter is not None:
+            # Each sequence is assembled into one frame, so sequences are matched on the headers of their first frame.
+            # Antenna counts are established beforehand, so frames keep the shape they have without a filter.
+            starts = np.flatnonzero(np.diff(group_indices, prepend=-1))
+            selected_groups = frame_filter.mask(np.arange(len(starts)), *self.get_filter_columns([frames[i] for i in starts.tolist()]))
+
+            selected = selected_groups[group_indices]
+            if not np.any(selected):
+                return []
 
-                if frame.payloadHeader["spatial_stream"] > max_spatial_stream:
-                    max_spatial_stream = frame.payloadHeader["spatial_stream"]
+            frames = [x for x, keep in zip(frames, selected) if keep]
+            group_indices = np.cumsum(selected_groups)[group_indices[selected]] - 1
 
-                current_sequence.append(frame)
+        # Raw CSI is only unpacked for the frames being kept, for the whole file at once.
+        unpacked = self.unpack_frames(frames, bandwidth)
 
-        max_core += 1
-        max_spatial_stream += 1
+        return self.read_bfee_sequences(frames, bandwidth, group_indices, rx_num=int(max_spatial_stream), tx_num=int(max_core), unpacked=unpacked)
 
-        if len(current_sequence) > 0:
-            sequences.append(current_sequence)
+    @staticmethod
+    def get_filter_columns(pcap_frames: list) -> tuple:
+        # Timestamps, source MAC addresses and sequence numbers for CSIFilter.mask, taken from frame headers.
+        timestamps = np.array([NEXBeamformReader.get_timestamp(x) for x in pcap_frames], dtype=np.float64)
+        macs = [x.payloadHeader["source_mac"] for x in pcap_frames]
+        sequences = np.array([x.payloadHeader["sequence_no"] for x in pcap_frames], dtype=np.int64)
 
-        return [self.read_bfee_batch(seq, bandwidth, tx_num=max_core, rx_num=max_spatial_stream) for seq in sequences]
\ No newline at end of file
+        return timestamps, macs, sequences
@@ -1,7 +1,9 @@
 from typing import Tuple
 
-from CSIKit.csi import CSIData
-from CSIKit.reader import Reader
+from CSIKit.csi import CSIBatch, CSIData, CSIFilter, CSIMetadata
+from CSIKit.csi.csiframe import CSIMemoryBudget
+from CSIKit.reader import Reader, sources
+from CSIKit.reader.parallel import ParallelReader
 
 from CSIKit.reader.readers.pico.AbstractPicoScenesFrameSegment import AbstractPicoScenesFrameSegment
 from CSIKit.reader.readers.pico.CSISegment import CSISegment
@@ -10,14 +12,29 @@ from CSIKit.reader.readers.pico.FrameContainer import FrameContainer
 from CSIKit.reader.readers.pico.ModularPicoScenesFrame import ModularPicoScenesFrame
 from CSIKit.reader.readers.pico.RxSBasicSegment import RxSBasicSegment
 from CSIKit.reader.readers.pico.MVMExtraSegment import MVMExtraSegment
+from CSIKit.reader.readers.pico.utils import get_relevant_version
 
 import os
 import struct
 
+import numpy as np
+
 from CSIKit.util import stringops
 
 
-class PicoScenesBeamformReader(Reader):
+class PicoScenesBeamformReader(Reader, ParallelReader):
+
+    LENGTH_STRUCT = struct.Struct("I")
+
+    INDEX_DTYPE = np.dtype([
+        ("offset", np.int64),
+        ("length", np.uint32),
+        ("device_type", np.uint16),
+        ("timestamp", np.float64),
+        ("source_mac", np.uint8, 6)
+    ])
+
+    INDEX_EXTENSION = ".idx.npz"
 
     SEGMENT_MAPPING = {
         "RxSBasic": RxSBasicSegment,
@@ -34,61 +51,378 @@ class PicoScenesBeamformReader(Reader):
         if os.path.exists(path):
             _, extension = os.path.splitext(path)
             if extension == ".csi":
-                with open(path, "rb") as file:
-                    # Checking bytes 4-8 match magic.
-                    first_bytes = file.read(8)
-                    return first_bytes[4:8] == b'\x15\x03\x15 '
+                return PicoScenesBeamformReader.sniff(path, sources.read_prefix(path, 8), os.path.getsize(path)) > 0
 
         return False
 
+    @staticmethod
+    def sniff(path: str, prefix: bytes, file_size: int) -> float:
+        """
+            Scores how likely a file is to be a PicoScenes capture, using only its first bytes.
+
+            Parameters:
+                path {str} -- Path to the file, used for its extension.
+                prefix {bytes} -- First bytes of the file.
+                file_size {int} -- Size of the whole file.
+
+            Returns:
+                confidence {float} -- Value between 0 (not PicoScenes) and 1.
+        """
+        # Sources without an extension, such as buffers and pipes, are identified from their contents alone.
+        if os.path.splitext(path)[1] not in [".csi", ""]:
+            return 0
+
+        # Checking bytes 4-8 match magic.
+        return 1 if prefix[4:8] == b'\x15\x03\x15 ' else 0
+
     @staticmethod
     def get_block(data: bytes, offset: int) -> Tuple[int, bytes]:
         # When retrieving block bytes, adding the length indicator to total size reduces boilerplate.
         length = struct.unpack("I", data[offset:offset+4])[0] + 4
         return (length, data[offset:offset + length])
 
-    def read_file(self, filename: str, scaled: bool = False, filter_mac: str = None) -> CSIData:
-        file_bytes = open(filename, "rb").read()
-        pos = 0
+    @staticmethod
+    def get_frame_segments(data: bytes, pos: int, frame_length: int) -> Tuple[list, int]:
+        # Finds the (name, version, start, end) of each Rx segment in the frame at pos,
+        # along with the offset of the source MAC address which follows them.
+        frame_end = pos + frame_length
+        frame = ModularPicoScenesFrame(data, pos)
+        frame_pos = pos + ModularPicoScenesFrame.SIZE
 
-        self.filename = filename
+        segments = []
+        for i in range(frame.numRxSegments):
+            seg_length = PicoScenesBeamformReader.LENGTH_STRUCT.unpack_from(data, frame_pos)[0] + 4
+            segment = AbstractPicoScenesFrameSegment(data, frame_pos)
 
-        ret_data = CSIData(self.filename, "PicoScenes", filter_mac=filter_mac)
-        ret_data.bandwidth = 0
+            subseg_start = frame_pos + segment.pos
+            subseg_end = min(subseg_start + seg_length, frame_end)
+            segments.append((segment.subsegmentName, segment.subsegmentVersion, subseg_start, subseg_end))
 
-        self.frames = []
-        initial_timestamp = None
+            frame_pos += seg_length
+
+        return segments, frame_pos + 4
 
-        while pos < len(file_bytes):
-            frame_length, frame_bytes = self.get_block(file_bytes, pos)
-            if len(frame_bytes) != frame_length:
+    @staticmethod
+    def get_frame_layout(data: bytes, pos: int = 0, max_frames: int = None) -> list:
+        """
+            Walks the frame and segment headers of a PicoScenes file, without parsing any segment bodies.
+
+            Parameters:
+                data {bytes} -- Contents of the .csi file.
+                pos {int} -- Offset of the frame to start from.
+                max_frames {int} -- Number of frames after which to stop. Defaults to the end of the file.
+
+            Returns:
+                frames {list} -- (offset, length, segments, mac_offset) for each complete frame,
+                    where segments holds (name, version, start, end) for each Rx segment.
+        """
+        frames = []
+
+        while pos < len(data) and (max_frames is None or len(frames) < max_frames):
+            if pos + PicoScenesBeamformReader.LENGTH_STRUCT.size > len(data):
+                break
+
+            frame_length = PicoScenesBeamformReader.LENGTH_STRUCT.unpack_from(data, pos)[0] + 4
+            if pos + frame_length > len(data):
                 #print("Reached end of file.")
                 break
 
-            frame = ModularPicoScenesFrame(frame_bytes[:ModularPicoScenesFrame.SIZE])
-            frame_pos = ModularPicoScenesFrame.SIZE
+            segments, mac_offset = PicoScenesBeamformReader.get_frame_segments(data, pos, frame_length)
+            frames.append((pos, frame_length, segments, mac_offset))
+
+            pos += frame_length
+
+        return frames
+
+    def read_segment_headers(self, data: bytes, frames: list, names: list = None) -> list:
+        """
+            Decodes segment headers in bulk across frames.
+
+            Where every segment of a given type shares a version, and so a header layout,
+            its headers are decoded in a single pass. Other segments are left to decode their own.
+
+            Parameters:
+                data {bytes} -- Contents of the .csi file.
+                frames {list} -- Frame layout, as returned by get_frame_layout.
+                names {list} -- Segment names to decode. Defaults to all names in SEGMENT_MAPPING.
+
+            Returns:
+                headers {list} -- Header dict (or None) for each segment of each frame.
+        """
+        headers = [[None] * len(segments) for _, _, segments, _ in frames]
+
+        if names is None:
+            names = self.SEGMENT_MAPPING.keys()
+
+        occurrences = {}
+        for frame_index, (_, _, segments, _) in enumerate(frames):
+            for segment_index, (name, version, start, end) in enumerate(segments):
+                if name in names:
+                    occurrences.setdefault(name, []).append((frame_index, segment_index, version, start, end))
+
+        for name, segment_occurrences in occurrences.items():
+            layouts = self.SEGMENT_MAPPING[name].LAYOUTS
+
+            versions = {get_relevant_version(layouts, x[2]) for x in segment_occurrences}
+            if len(versions) != 1:
+                continue
+
+            layout = layouts[versions.pop()]
+            if any(end - start < layout.size for _, _, _, start, end in segment_occurrences):
+                continue
+
+            offsets = np.array([x[3] for x in segment_occurrences], dtype=np.int64)
+            header_dicts = layout.to_dicts(layout.unpack_bulk(data, offsets))
+
+            for (frame_index, segment_index, _, _, _), header in zip(segment_occurrences, header_dicts):
+                headers[frame_index][segment_index] = header
+
+        return headers
 
+    def read_frame_headers(self, data: bytes, frames: list) -> list:
+        """
+            Parses only the RxSBasic and MVMExtra segments of each frame, which hold its device, timestamp and RSSI.
+
+            Parameters:
+                data {bytes} -- Contents of the .csi file.
+                frames {list} -- Frame layout, as returned by get_frame_layout.
+
+            Returns:
+                frame_containers {list} -- FrameContainer for each frame, without its CSI segment.
+        """
+        segment_headers = self.read_segment_headers(data, frames, names=["RxSBasic", "MVMExtra"])
+
+        frame_containers = []
+        for (_, _, segments, _), headers in zip(frames, segment_headers):
             frame_container = FrameContainer()
+            for (name, version, start, end), header in zip(segments, headers):
+                if name in ("RxSBasic", "MVMExtra"):
+                    setattr(frame_container, name, self.SEGMENT_MAPPING[name](data[start:end], version, header))
+
+            frame_containers.append(frame_container)
+
+        return frame_containers
+
+    def build_index(self, path: str) -> np.array:
+        """
+            Indexes every frame in a PicoScenes .csi file, without decoding any CSI.
+
+            Parameters:
+                path {str} -- Path to a PicoScenes .csi file.
+
+            Returns:
+                index {np.array} -- Structured array of INDEX_DTYPE, with one entry per frame.
+                    Timestamps are in seconds, as given by FrameContainer.get_timestamp_seconds.
+        """
+        if not os.path.exists(path):
+            raise Exception("File not found: {}".format(path))
+
+        with open(path, "rb") as file:
+            data = sources.map_file(file)
+
+            frames = self.get_frame_layout(data)
+            frame_containers = self.read_frame_headers(data, frames)
+
+            index = np.zeros(len(frames), dtype=self.INDEX_DTYPE)
+            index["timestamp"] = np.nan
+
+            device_types = index["device_type"]
+            timestamps = index["timestamp"]
+            source_macs = index["source_mac"]
+
+            for i, ((offset, length, _, mac_offset), frame_container) in enumerate(zip(frames, frame_containers)):
+                if mac_offset + 6 <= offset + length:
+                    source_macs[i] = tuple(data[mac_offset:mac_offset + 6])
+
+                if hasattr(frame_container, "RxSBasic"):
+                    device_types[i] = frame_container.RxSBasic.deviceType
+                    try:
+                        timestamps[i] = frame_container.get_timestamp_seconds()
+                    except (AttributeError, KeyError):
+                        # Unknown device types, or AX200 frames missing MVMExtra.
+                        pass
+
+            index["offset"] = [frame[0] for frame in frames]
+            index["length"] = [frame[1] for frame in frames]
+
+        return index
+
+    def get_index(self, path: str, sidecar: bool = False) -> np.array:
+        """
+            Retrieves the frame index for a PicoScenes .csi file.
 
-            for i in range(frame.numRxSegments):
-                seg_length, seg_bytes = self.get_block(frame_bytes, frame_pos)
-                segment = AbstractPicoScenesFrameSegment(seg_bytes)
+            If sidecar is set, the index is loaded from (or saved to) a file alongside the capture.
+            Sidecar indexes are rebuilt whenever the capture's size or modification time has changed.
 
-                subseg_start = frame_pos + segment.pos
-                subseg_bytes = frame_bytes[subseg_start:subseg_start+seg_length]
+            Parameters:
+                path {str} -- Path to a PicoScenes .csi file.
+                sidecar {bool} -- Whether to persist the index alongside the capture.
+
+            Returns:
+                index {np.array} -- Structured array of INDEX_DTYPE, with one entry per frame.
+        """
+        if not sidecar:
+            return self.build_index(path)
+
+        if not os.path.exists(path):
+            raise Exception("File not found: {}".format(path))
+
+        stat = os.stat(path)
+        sidecar_path = path + self.INDEX_EXTENSION
+
+        if os.path.exists(sidecar_path):
+            with np.load(sidecar_path) as sidecar_file:
+                if sidecar_file["file_size"] == stat.st_size and sidecar_file["mtime_ns"] == stat.st_mtime_ns:
+                    return sidecar_file["index"]
+
+        index = self.build_index(path)
+        with open(sidecar_path, "wb") as sidecar_file:
+            np.savez(sidecar_file, index=index, file_size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+        return index
+
+    @staticmethod
+    def get_initial_timestamp(index: np.array) -> float:
+        # Frames without a timestamp are indexed as NaN, so timestamps are relative to the first frame which has one.
+        timestamps = index["timestamp"][np.isfinite(index["timestamp"])]
+        return float(timestamps[0]) if len(timestamps) > 0 else 0.0
+
+    def read_frames(self, path: str, indices=None, filter_mac: str = None, sidecar: bool = False) -> CSIData:
+        """
+            Reads selected frames from a PicoScenes .csi file, using the frame index to seek directly to them.
+
+            Timestamps are relative to the first frame in the file with a timestamp, as in read_file.
+
+            Parameters:
+                path {str} -- Path to a PicoScenes .csi file.
+                indices -- Frame indices to read, as an int, slice, array of ints or boolean mask. Defaults to all frames.
+                filter_mac {str} -- Only keep frames from this source MAC address.
+                sidecar {bool} -- Whether to persist the index alongside the capture.
+
+            Returns:
+                csi_data {CSIData} -- CSIData containing the selected frames, in the order given.
+        """
+        index = self.get_index(path, sidecar)
+        selected = index if indices is None else index[np.arange(len(index))[indices]].reshape(-1)
+
+        self.filename = path
+
+        ret_data = CSIData(self.filename, "PicoScenes", filter_mac=filter_mac)
+        ret_data.bandwidth = 0
 
-                if segment.subsegmentName in self.SEGMENT_MAPPING:
-                    setattr(frame_container, segment.subsegmentName, self.SEGMENT_MAPPING[segment.subsegmentName](subseg_bytes, segment.subsegmentVersion))
+        if len(index) == 0:
+            return ret_data
 
-                frame_pos += seg_length
+        with open(path, "rb") as file:
+            data = sources.map_file(file)
 
-            source_mac = stringops.hexToMACString(frame_bytes[frame_pos+4:frame_pos+10].hex())
+            frames = []
+            for offset, length in zip(selected["offset"].tolist(), selected["length"].tolist()):
+                segments, mac_offset = self.get_frame_segments(data, offset, length)
+                frames.append((offset, length, segments, mac_offset))
+
+            segment_headers = self.read_segment_headers(data, frames)
+            self.read_frame_containers(ret_data, data, frames, segment_headers, self.get_initial_timestamp(index))
+
+        return ret_data
+
+    def read_time_range(self, path: str, t0: float, t1: float, filter_mac: str = None, sidecar: bool = False) -> CSIData:
+        """
+            Reads the frames with timestamps in [t0, t1) from a PicoScenes .csi file.
+
+            Timestamps are in seconds, relative to the first frame in the file with a timestamp, as in read_file.
+            Frames without a timestamp are never selected.
+
+            Parameters:
+                path {str} -- Path to a PicoScenes .csi file.
+                t0 {float} -- Start of the time range.
+                t1 {float} -- End of the time range.
+                filter_mac {str} -- Only keep frames from this source MAC address.
+                sidecar {bool} -- Whether to persist the index alongside the capture.
+
+            Returns:
+                csi_data {CSIData} -- CSIData containing the frames within the time range.
+        """
+        index = self.get_index(path, sidecar)
+
+        indices = np.zeros(0, dtype=np.int64)
+        if len(index) > 0:
+            timestamps = index["timestamp"] - self.get_initial_timestamp(index)
+            indices = np.flatnonzero((timestamps >= t0) & (timestamps < t1))
+
+        return self.read_frames(path, indices, filter_mac, sidecar)
+
+    def read_metadata(self, path: str, filter_mac: str = None) -> CSIMetadata:
+        """
+            Summarises a PicoScenes .csi file from its RxSBasic and MVMExtra segments, parsing only the first frame's CSI.
+
+            Parameters:
+                path {str} -- Path to a PicoScenes .csi file, or its contents as a buffer or binary file object.
+                filter_mac {str} -- Only count frames from this source MAC address.
+
+            Returns:
+                metadata {CSIMetadata} -- Frame count, shape, timing and RSSI for the file.
+        """
+        frame_filter = CSIFilter.from_args(filter_mac, None)
+
+        data = sources.read_source(path, memory_map=True)
+
+        frames = self.get_frame_layout(data)
+        if len(frames) == 0:
+            return super().read_metadata(path, filter_mac)
+
+        frame_containers = self.read_frame_headers(data, frames)
+
+        # Timestamps are relative to the first frame in the file, as in read_file.
+        timestamps = np.array([x.get_timestamp_seconds() for x in frame_containers])
+        timestamps -= timestamps[0]
+
+        selected = np.arange(len(frames))
+        if frame_filter is not None:
+            macs = [stringops.hexToMACString(data[mac_offset:mac_offset+6].hex()) for _, _, _, mac_offset in frames]
+            selected = selected[frame_filter.mask(selected, timestamps, macs)]
+
+        if len(selected) == 0:
+            return super().read_metadata(path, filter_mac)
+
+        # The first frame kept is parsed in full to establish its shape, and which RSSI its frame type reports.
+        first_frame = [frames[selected[0]]]
+        sample = CSIData()
+        self.read_frame_containers(sample, data, first_frame, self.read_segment_headers(data, first_frame))
+        frame = sample.frames[0]
+
+        rx_basic = [frame_containers[i].RxSBasic for i in selected.tolist()]
+        if hasattr(frame, "rssi"):
+            rss_total = [x.rssi for x in rx_basic]
+        else:
+            rss_total = [max(x.rssi_ctl0, x.rssi_ctl1, x.rssi_ctl2) for x in rx_basic]
+
+        # As in read_file, the bandwidth is that of the first frame to report one.
+        bandwidth = next((x.get_bandwidth() for x in frame_containers if x.get_bandwidth() != 0), 0)
+
+        return CSIMetadata.from_headers(frame_containers[0].get_device(), "PicoScenes", bandwidth, frame.csi_matrix.shape, len(selected), timestamps[selected[[0, -1]]].tolist(), rss_total)
+
+    def read_frame_containers(self, ret_data: CSIData, data: bytes, frames: list, segment_headers: list, initial_timestamp: float = None, lazy: bool = False, memory_budget: int = None, frame_filter: CSIFilter = None, push_filtered: bool = False):
+        # Parses each frame's segments and pushes the resulting frames into ret_data.
+        # The CSI segment is parsed last, and only for frames meeting frame_filter. Frames which do not
+        # are dropped, or pushed as None if push_filtered is set, as read_chunk does.
+        budget = CSIMemoryBudget(memory_budget) if memory_budget is not None else None
+
+        for index, ((_, _, segments, mac_offset), headers) in enumerate(zip(frames, segment_headers)):
+            frame_container = FrameContainer()
+
+            csi_segment = None
+            for (name, version, start, end), header in zip(segments, headers):
+                if name == "CSI":
+                    csi_segment = (data[start:end], version, header)
+                elif name in self.SEGMENT_MAPPING:
+                    setattr(frame_container, name, self.SEGMENT_MAPPING[name](data[start:end], version, header))
+
+            source_mac = stringops.hexToMACString(data[mac_offset:mac_offset+6].hex())
             frame_container.set_source_mac(source_mac)
 
             # print(frame_container.RxSBasic.timestamp)
 
-            pos += frame_length
-
             if ret_data.bandwidth == 0:
                 ret_data.bandwidth = frame_container.get_bandwidth()
 
@@ -101,6 +435,14 @@ class PicoScenesBeamformReader(Reader):
             new_timestamp = frame_container.get_timestamp_seconds()
             given_timestamp = new_timestamp - initial_timestamp
 
+            if frame_filter is not None and not frame_filter.matches(index, given_timestamp, source_mac):
+                if push_filtered:
+                    ret_data.push_frame(None, given_timestamp)
+                continue
+
+            if csi_segment is not None:
+                frame_container.CSI = CSISegment(*csi_segment, lazy=lazy)
+
             # if hasattr(frame_container, "RxSBasic"):
             #     if frame_container.RxSBasic.deviceType == 0x2000:
             #         # initial_timestamp = 0
@@ -120,6 +462,116 @@ class PicoScenesBeamformReader(Reader):
             #         else:
             #             continue
 
-            ret_data.push_frame(frame_container.get_frame(), given_timestamp)
+            frame = frame_container.get_frame()
+            if lazy and frame_container.CSI.csi_payload is not None:
+                frame.set_lazy_csi(frame_container.CSI.decode_csi, frame_container.CSI.csi_payload, budget)
+
+            ret_data.push_frame(frame, given_timestamp)
+
+        return initial_timestamp
+
+    def iter_frames(self, path: str, batch_size: int = 1024, scaled: bool = False, poll_interval: float = None):
+        """
+            Reads a PicoScenes .csi file in batches of frames, parsing one batch of frames at a time.
+
+            Parameters:
+                path {str} -- Path to a PicoScenes .csi file.
+                batch_size {int} -- Maximum number of frames in each batch.
+                poll_interval {float} -- If given, seconds to wait for appended frames at the end of the file. See follow.
+
+            Yields:
+                batch {CSIBatch} -- CSI tensor, timestamps and header columns for up to batch_size frames.
+        """
+        with sources.open_source(path) as file:
+            # Streams, such as compressed captures, are parsed one block at a time.
+            data = b"" if sources.is_stream(file) else sources.map_file(file)
+
+            base = 0
+            pos = 0
+            initial_timestamp = None
+
+            while True:
+                frames = self.get_frame_layout(data, pos, batch_size)
+                if len(frames) == 0:
+                    data, consumed = sources.next_block(file, data, pos, poll_interval)
+                    if data is None:
+                        break
+
+                    base += consumed
+                    pos -= consumed
+                    continue
+
+                offset, length, _, _ = frames[-1]
+                pos = offset + length
+
+                ret_data = CSIData(path, "PicoScenes")
+                ret_data.bandwidth = 0
+
+                segment_headers = self.read_segment_headers(data, frames)
+                initial_timestamp = self.read_frame_containers(ret_data, data, frames, segment_headers, initial_timestamp)
+
+                yield CSIBatch.from_frames(ret_data.frames, ret_data.timestamps, base + pos)
+
+    def get_record_boundaries(self, data: bytes) -> np.array:
+        # Only the length preceding each frame is read, without walking its segments.
+        offsets = []
+        pos = 0
+
+        while pos + self.LENGTH_STRUCT.size <= len(data):
+            frame_length = self.LENGTH_STRUCT.unpack_from(data, pos)[0] + 4
+            if pos + frame_length > len(data):
+                break
+
+            offsets.append(pos)
+            pos += frame_length
+
+        return np.array(offsets, dtype=np.int64)
+
+    def read_chunk(self, data: bytes, chunk: tuple, scaled: bool = False, frame_filter: CSIFilter = None) -> CSIData:
+        # Frames never span chunks, so each chunk is read as a file of its own.
+        # Timestamps are left absolute for rebase_timestamps, and frames not meeting frame_filter are pushed as None.
+        start, end = chunk
+        data = data[start:end]
+
+        ret_data = CSIData(backend="PicoScenes")
+        ret_data.bandwidth = 0
+
+        frames = self.get_frame_layout(data)
+        segment_headers = self.read_segment_headers(data, frames)
+        self.read_frame_containers(ret_data, data, frames, segment_headers, initial_timestamp=0, frame_filter=frame_filter, push_filtered=True)
+
+        return ret_data
+
+    def rebase_timestamps(self, chunks: list):
+        # Timestamps are made relative to the first frame in the file, as in read_file.
+        timestamps = [chunk.timestamps for chunk in chunks if len(chunk.timestamps) > 0]
+        if len(timestamps) == 0:
+            return
+
+        initial_timestamp = timestamps[0][0]
+        for chunk in chunks:
+            chunk.timestamps = [x - initial_timestamp for x in chunk.timestamps]
+
+    def read_file(self, filename: str, scaled: bool = False, filter_mac: str = None, lazy: bool = False, memory_budget: int = None, workers: int = None, frame_filter: CSIFilter = None) -> CSIData:
+        # filename may also be a buffer or file object.
+        self.filename = sources.get_source_name(filename)
+
+        # Unless decoding lazily, the file may be decoded in parallel. See ParallelReader.read_parallel.
+        if workers is not None and workers > 1 and not lazy:
+            return self.read_parallel(filename, workers, filter_mac, frame_filter, scaled=scaled)
+
+        file_bytes = sources.read_source(filename)
+
+        ret_data = CSIData(self.filename, "PicoScenes")
+        ret_data.bandwidth = 0
+
+        self.frames = []
+
+        frames = self.get_frame_layout(file_bytes)
+        segment_headers = self.read_segment_headers(file_bytes, frames)
+
+        # Frames are filtered on their headers, before their CSI segment is parsed.
+        frame_filter = CSIFilter.from_args(filter_mac, frame_filter)
+        self.read_frame_containers(ret_data, file_bytes, frames, segment_headers, lazy=lazy, memory_budget=memory_budget, frame_filter=frame_filter)
 
-        return ret_data
\ No newline at end of file
+        return ret_data
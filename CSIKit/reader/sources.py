@@ -0,0 +1,272 @@
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import mmap
+import os
+import stat
+import time
+
+# Upper bound on the number of bytes read from a file when identifying its format.
+SNIFF_PREFIX_SIZE = 65536
+
+
+# Magic numbers of the supported compression formats, with the function used to open each.
+COMPRESSION_FORMATS = [
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open)
+]
+
+
+COMPRESSION_EXTENSIONS = [".gz", ".bz2", ".xz"]
+
+
+# Number of decompressed bytes read at a time when streaming a compressed capture or pipe.
+STREAM_BLOCK_SIZE = 1 << 20
+
+
+def read_prefix(path: str, size: int = SNIFF_PREFIX_SIZE) -> bytes:
+    # Reads at most size bytes from the start of a file, so detection cost does not depend on file size.
+    # Compressed files are decompressed only as far as needed.
+    with open_source(path) as file:
+        return file.read(size)
+
+
+def get_compression(source):
+    """
+        Identifies the compression format of a capture from its magic number.
+
+        Parameters:
+            source {str|bytes|memoryview|file} -- Capture to check.
+
+        Returns:
+            opener {Callable} -- gzip.open, bz2.open or lzma.open, or None if the capture is not compressed.
+    """
+    if is_buffer(source):
+        prefix = bytes(memoryview(source).cast("B")[:8])
+    elif hasattr(source, "read"):
+        prefix = peek_source(source, 8, decompress=False)[0]
+    elif os.path.isfile(source):
+        with open(source, "rb") as file:
+            prefix = file.read(8)
+    else:
+        return None
+
+    for magic, opener in COMPRESSION_FORMATS:
+        if prefix.startswith(magic):
+            return opener
+
+    return None
+
+
+def strip_compression_extension(path: str) -> str:
+    # Formats are identified by the extension preceding that of the compression format, such as .dat in .dat.gz.
+    root, extension = os.path.splitext(path)
+    return root if extension in COMPRESSION_EXTENSIONS else path
+
+
+def is_buffer(source) -> bool:
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def get_source_name(source) -> str:
+    # Paths are returned as given, and file objects by their name where they have one.
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+
+    name = getattr(source, "name", "")
+    return name if isinstance(name, str) else ""
+
+
+def check_source(source):
+    # Buffers and file objects are always accepted, while paths must exist.
+    if not is_buffer(source) and not hasattr(source, "read") and not os.path.exists(source):
+        raise Exception("File not found: {}".format(source))
+
+
+def read_source(source, memory_map: bool = False) -> bytes:
+    """
+        Gets the contents of a capture given as a path, buffer or file object.
+
+        Buffers are used in place, without being copied. Paths and files are read in full,
+        or memory-mapped where memory_map is set and the file supports it.
+        Streams which cannot be mapped, such as pipes, are read from their current position to their end.
+        Compressed captures are decompressed in full.
+
+        Parameters:
+            source {str|bytes|memoryview|file} -- Capture to read.
+            memory_map {bool} -- Whether to memory-map files rather than reading them.
+
+        Returns:
+            data {bytes} -- Object supporting the buffer protocol.
+    """
+    if get_compression(source) is not None:
+        with open_source(source) as file:
+            return file.read()
+
+    if isinstance(source, (bytes, bytearray)):
+        return source
+
+    if isinstance(source, memoryview):
+        return source.cast("B")
+
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer()[source.tell():]
+
+    if hasattr(source, "read"):
+        if not memory_map:
+            return source.read()
+
+        position = source.tell() if source.seekable() else 0
+        data = map_file(source)
+
+        return memoryview(data)[position:] if position > 0 and isinstance(data, mmap.mmap) else data
+
+    check_source(source)
+
+    with open(source, "rb") as file:
+        return map_file(file) if memory_map else file.read()
+
+
+def open_source(source):
+    """
+        Opens a capture given as a path, buffer or file object as a binary file object.
+
+        File objects are returned as they are, and are not closed when leaving the returned context.
+        Compressed captures are opened for streaming decompression.
+
+        Parameters:
+            source {str|bytes|memoryview|file} -- Capture to open.
+
+        Returns:
+            file {file} -- Binary file object, usable as a context manager.
+    """
+    check_source(source)
+    opener = get_compression(source)
+
+    if is_buffer(source):
+        file = io.BytesIO(source)
+        return opener(file) if opener is not None else file
+
+    if hasattr(source, "read"):
+        # Closing a decompressing file object does not close the file object it reads from.
+        return opener(source) if opener is not None else contextlib.nullcontext(source)
+
+    return opener(source) if opener is not None else open(source, "rb")
+
+
+def peek_source(source, size: int = SNIFF_PREFIX_SIZE, decompress: bool = True) -> tuple:
+    """
+        Reads the first bytes of a capture given as a buffer or file object, without consuming them.
+
+        Parameters:
+            source {bytes|memoryview|file} -- Capture to read from.
+            size {int} -- Maximum number of bytes to read.
+            decompress {bool} -- Whether to read compressed buffers and seekable files after decompression.
+
+        Returns:
+            prefix {bytes} -- First bytes available, which may be fewer than size for pipes.
+            file_size {int} -- Size of the whole capture, or None where this is not known.
+    """
+    if decompress:
+        opener = get_compression(source)
+        if opener is not None and is_buffer(source):
+            return opener(io.BytesIO(source)).read(size), None
+
+        if opener is not None and source.seekable():
+            position = source.tell()
+            prefix = opener(source).read(size)
+            source.seek(position)
+
+            return prefix, None
+
+    if is_buffer(source):
+        data = source.cast("B") if isinstance(source, memoryview) else source
+        return bytes(data[:size]), len(data)
+
+    file_size = None
+    try:
+        file_stat = os.fstat(source.fileno())
+        if stat.S_ISREG(file_stat.st_mode):
+            file_size = file_stat.st_size
+    except (AttributeError, OSError, ValueError):
+        pass
+
+    if hasattr(source, "peek"):
+        prefix = source.peek(size)[:size]
+    elif source.seekable():
+        position = source.tell()
+        prefix = source.read(size)
+        if file_size is None:
+            file_size = source.seek(0, io.SEEK_END)
+        source.seek(position)
+    else:
+        prefix = b""
+
+    if isinstance(prefix, str):
+        prefix = prefix.encode()
+
+    return prefix, file_size
+
+
+def is_stream(file) -> bool:
+    # Decompressing file objects and pipes cannot be memory-mapped, so are read in blocks by iter_frames.
+    return not (isinstance(file, (io.BufferedReader, io.FileIO)) and file.seekable())
+
+
+def read_block(file, data: bytes, cursor: int, block_size: int = STREAM_BLOCK_SIZE) -> bytes:
+    # Appends the next block of a stream to the unread part of data, returning None at the end of the stream.
+    block = file.read(block_size)
+    if not block:
+        return None
+
+    return bytes(data[cursor:]) + block
+
+
+def next_block(file, data: bytes, cursor: int, poll_interval: float = None) -> tuple:
+    """
+        Gets more data for iter_frames, once no further complete records can be read from data.
+
+        Streams, such as compressed captures and pipes, are read one block at a time, so only the
+        unread part of data is kept. Followed files are waited on until they grow.
+
+        Parameters:
+            file {file} -- File being read.
+            data {bytes} -- Data currently being parsed.
+            cursor {int} -- Position within data of the first record not yet read.
+            poll_interval {float} -- Seconds to wait between checks for appended data, if following the file.
+
+        Returns:
+            data {bytes} -- New data to parse, or None if there is nothing more to read.
+            consumed {int} -- Number of bytes dropped from the start of data, which positions within it must be reduced by.
+    """
+    if is_stream(file):
+        data = read_block(file, data, cursor)
+        return data, cursor
+
+    if poll_interval is not None:
+        return wait_for_data(file, data, poll_interval), 0
+
+    return None, 0
+
+
+def map_file(file) -> bytes:
+    # Large captures are memory-mapped, so only the frames accessed are read from disk.
+    if is_stream(file):
+        return file.read()
+
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return file.read()
+
+
+def wait_for_data(file, data: bytes, poll_interval: float) -> bytes:
+    # Blocks until the file has grown beyond data, returning its contents mapped again.
+    while os.fstat(file.fileno()).st_size <= len(data):
+        time.sleep(poll_interval)
+
+    file.seek(0)
+    return map_file(file)
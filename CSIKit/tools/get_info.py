@@ -4,8 +4,8 @@ from CSIKit.reader import get_reader
 def display_info(path: str, scaled: bool=False, filter_mac: str=None):
     reader = get_reader(path)
 
-    csi_data = reader.read_file(path, scaled=scaled, filter_mac=filter_mac)
-    metadata = csi_data.get_metadata()
+    # Scaling does not affect the summary, so only headers are read where the format allows.
+    metadata = reader.read_metadata(path, filter_mac=filter_mac)
 
     print("Hardware: {}".format(metadata.chipset))
     print("Backend: {}".format(metadata.backend))
@@ -2,6 +2,8 @@ from typing import Tuple
 
 import numpy as np
 
+BITS_PER_SYMBOL = 10
+
 def signbit_convert(data: int, maxbit: int) -> int:
     if (data & (1 << (maxbit - 1))):
         data -= (1 << maxbit)
@@ -19,12 +21,80 @@ def get_next_bits(buf: bytes, current_data: int, idx: int, bits_left: int) -> Tu
 
     return current_data, idx, bits_left
 
+def get_10bit_csi_length(num_tones: int, nc: int, nr: int) -> int:
+    # The payload is consumed 16 bits at a time, so every word containing a symbol must be present.
+    no_symbols = 2 * num_tones * nc * nr
+    return 2 * max(1, -(-(no_symbols * BITS_PER_SYMBOL) // 16))
+
+def unpack_10bit_csi(payloads: np.array, num_tones: int, nc: int, nr: int) -> np.array:
+    """
+        Decodes 10-bit signed CSI symbols, as produced by the Atheros CSI Tool and QCA9300 PicoScenes frames.
+
+        Symbols are packed little-endian, with the imaginary part of each value preceding the real part.
+        Both parts are offset by 1, matching the Atheros CSI Tool's MATLAB implementation.
+
+        Parameters:
+            payloads {np.array} -- uint8 payload, or a (frames, bytes) batch of equal-shape payloads.
+            num_tones {int} -- Number of subcarriers present.
+            nc {int} -- Number of transmitting antennas present.
+            nr {int} -- Number of receiving antennas present.
+
+        Returns:
+            csi {np.array} -- (num_tones, nc, nr) complex64 matrix, or (frames, num_tones, nc, nr) for a batch.
+    """
+    payloads = np.asarray(payloads, dtype=np.uint8)
+    is_batch = payloads.ndim == 2
+
+    payloads = np.atleast_2d(payloads)
+    no_frames, payload_length = payloads.shape
+
+    no_symbols = 2 * num_tones * nc * nr
+    required_length = get_10bit_csi_length(num_tones, nc, nr)
+    if payload_length < required_length:
+        raise ValueError("Incomplete CSI payload: expected {} bytes for {} tones, {} tx and {} rx antennas but got {} bytes.".format(required_length, num_tones, nc, nr, payload_length))
+
+    bit_index = np.arange(no_symbols) * BITS_PER_SYMBOL
+    ind8 = bit_index >> 3
+    shift = (bit_index & 7).astype(np.uint32)
+
+    # Each symbol spans at most 3 bytes, so 2 bytes of padding keep the gathers in bounds.
+    padded = np.zeros((no_frames, payload_length + 2), dtype=np.uint8)
+    padded[:, :payload_length] = payloads
+
+    words = padded[:, ind8].astype(np.uint32)
+    words |= padded[:, ind8 + 1].astype(np.uint32) << 8
+    words |= padded[:, ind8 + 2].astype(np.uint32) << 16
+
+    symbols = ((words >> shift) & ((1 << BITS_PER_SYMBOL) - 1)).astype(np.int16)
+    symbols -= (symbols & (1 << (BITS_PER_SYMBOL - 1))) << 1
+    symbols += 1
+
+    symbols = symbols.reshape(no_frames, num_tones, nc, nr, 2)
+
+    csi = np.empty((no_frames, num_tones, nc, nr), dtype=np.complex64)
+    csi.real = symbols[..., 1]
+    csi.imag = symbols[..., 0]
+
+    return csi if is_batch else csi[0]
+
 def unpack_float_acphy(nbits: int, autoscale: int, shft: int, fmt: int, nman: int, nexp: int, nfft: int,
                        H: np.array) -> np.array:
-    k_tof_unpack_sgn_mask = (1 << 31)
+    """
+        Unpacks the floating point CSI format used by Broadcom acphy chips (BCM4358, BCM4366c0).
+
+        Each 32-bit word holds a shared exponent, and sign/mantissa pairs for the real and imaginary parts.
+        With autoscale, mantissas are shifted so the largest value in each frame occupies nbits bits.
+
+        Parameters:
+            H {np.array} -- Packed words for a single frame (nfft,), or a batch of frames (frames, nfft).
+
+        Returns:
+            out {np.array} -- int64 mantissas, interleaved real/imag, shaped (nfft*2,) or (frames, nfft*2).
+    """
+    H = np.asarray(H)
+    is_batch = H.ndim == 2
 
-    He = [0] * nfft
-    Hout = [0] * nfft*2
+    H = np.atleast_2d(H).astype(np.int64)
 
     iq_mask = (1 << (nman - 1)) - 1
     e_mask = (1 << nexp) - 1
@@ -33,69 +103,132 @@ def unpack_float_acphy(nbits: int, autoscale: int, shft: int, fmt: int, nman: in
     sgni_mask = (sgnr_mask >> nman)
     e_zero = -nman
 
-    out = np.zeros((nfft * 2), dtype=np.int64)
-    n_out = (nfft << 1)
-    e_shift = 1
-    maxbit = -e_p
+    vi = (H >> (nexp + nman)) & iq_mask
+    vq = (H >> nexp) & iq_mask
 
-    for i in range(len(H)):
-        vi = ((H[i] >> (nexp + nman)) & iq_mask)
-        vq = ((H[i] >> nexp) & iq_mask)
-        e = (H[i] & e_mask)
+    # Exponents are stored as nexp-bit two's complement values.
+    e = H & e_mask
+    e[e >= e_p] -= (e_p << 1)
 
-        if e >= e_p:
-            e -= (e_p << 1)
+    maxbit = np.full(H.shape[0], -e_p, dtype=np.int64)
+    if autoscale:
+        # Position of the highest set bit in either mantissa, added to the exponent.
+        x = vi | vq
+        nonzero = x != 0
+        highest_bit = np.frexp(x.astype(np.float64))[1].astype(np.int64) - 1
+        scaled_e = np.where(nonzero, e + highest_bit, -e_p)
+        maxbit = np.maximum(maxbit, scaled_e.max(axis=1, initial=-e_p))
 
-        He[i] = e
+    shft = nbits - maxbit
 
-        x = vi | vq
+    # Interleaving real/imag values, with a shared exponent per pair.
+    values = np.stack([vi, vq], axis=2).reshape(H.shape[0], -1)
+    signs = np.stack([(H & sgnr_mask) != 0, (H & sgni_mask) != 0], axis=2).reshape(H.shape[0], -1)
+    exponents = np.repeat(e, 2, axis=1) + shft[:, None]
 
-        if autoscale and x:
-            m = 0xffff0000
-            b = 0xffff
-            s = 16
+    out = np.where(exponents < 0, values >> np.clip(-exponents, 0, 63), values << np.clip(exponents, 0, 63))
+    out[exponents < e_zero] = 0
+    out[signs] *= -1
 
-            while s > 0:
-                if x & m:
-                    e += s
-                    x >>= s
+    return out if is_batch else out[0]
 
-                s >>= 1
-                m = (m >> s) & b
-                b >>= s
+IWL5300_SUBCARRIERS = 30
 
-            if e > maxbit:
-                maxbit = e
+def get_iwl5300_permutation(antenna_sel: np.array, n_rx: int) -> np.array:
+    """
+        Derives the Rx antenna permutation for one or more IWL5300 frames from their antenna_sel bytes.
 
-        if H[i] & sgnr_mask:
-            vi |= k_tof_unpack_sgn_mask
+        If less than 3 Rx antennas are present, the default permutation is used.
+        Otherwise invalid indices will likely be raised.
+    """
+    antenna_sel = np.atleast_1d(np.asarray(antenna_sel, dtype=np.int64))
+    if n_rx == 3:
+        return np.stack([antenna_sel & 0x3, (antenna_sel >> 2) & 0x3, (antenna_sel >> 4) & 0x3], axis=1)
 
-        if H[i] & sgni_mask:
-            vq |= k_tof_unpack_sgn_mask
+    return np.tile(np.arange(3), (len(antenna_sel), 1))
 
-        Hout[i << 1] = vi
-        Hout[(i << 1) + 1] = vq
+def unpack_iwl5300(payloads: np.array, n_rx: int, n_tx: int, perm: np.array, lengths: np.array = None) -> np.array:
+    """
+        Decodes a batch of IWL5300 bfee payloads sharing the same antenna configuration.
 
-    shft = nbits - maxbit
-    for i in range(n_out):
-        e = He[(i >> e_shift)] + shft
-        vi = Hout[i]
+        Each CSI value is an 8-bit real/imag pair, packed with a 3-bit gap before every subcarrier.
+        Bit offsets are computed once for the whole batch, so the unpacking is a handful of array operations.
+
+        Parameters:
+            payloads {np.array} -- (frames, bytes) uint8 matrix of CSI payloads. Shorter payloads can be zero padded.
+            n_rx {int} -- Number of receiving antennas.
+            n_tx {int} -- Number of transmitting antennas.
+            perm {np.array} -- (frames, 3) Rx antenna permutation for each frame, or a single (3,) permutation for all.
+            lengths {np.array} -- Actual length of each payload. Values which run past a payload's length are left as zero.
+
+        Returns:
+            csi {np.array} -- (frames, 30, n_rx, n_tx) complex64 matrix.
+    """
+    payloads = np.atleast_2d(payloads)
+    no_frames, payload_length = payloads.shape
+
+    if lengths is None:
+        lengths = np.full(no_frames, payload_length)
+
+    if n_rx * n_tx == 0:
+        return np.zeros((no_frames, IWL5300_SUBCARRIERS, n_rx, n_tx), dtype=np.complex64)
+
+    # Bit offset of every value, ordered by subcarrier, then Rx, then Tx.
+    streams = n_rx * n_tx
+    subcarriers = np.arange(IWL5300_SUBCARRIERS)[:, None]
+    bit_index = 3 * (subcarriers + 1) + 16 * (subcarriers * streams + np.arange(streams)[None, :])
+
+    ind8 = bit_index >> 3
+    remainder = (bit_index & 7).astype(np.uint16)
+
+    # Padding so each gather stays in bounds, even for truncated payloads.
+    padded = np.zeros((no_frames, max(payload_length, int(ind8.max()) + 3)), dtype=np.uint16)
+    padded[:, :payload_length] = payloads
+
+    b0 = padded[:, ind8]
+    b1 = padded[:, ind8 + 1]
+    b2 = padded[:, ind8 + 2]
+
+    real = (((b0 >> remainder) | (b1 << (8 - remainder))) & 0xFF).astype(np.uint8).view(np.int8)
+    imag = (((b1 >> remainder) | (b2 << (8 - remainder))) & 0xFF).astype(np.uint8).view(np.int8)
+
+    values = np.empty(real.shape, dtype=np.complex64)
+    values.real = real
+    values.imag = imag
+
+    values = values.reshape(no_frames, IWL5300_SUBCARRIERS, n_rx, n_tx)
+    valid = ((ind8 + 2)[None, :, :] < np.asarray(lengths)[:, None, None]).reshape(values.shape)
+
+    perm = np.broadcast_to(np.asarray(perm, dtype=np.int64).reshape(-1, 3), (no_frames, 3))
+    frame_indices = np.arange(no_frames)
+
+    # Rx streams are scattered in order, so repeated permutation entries resolve the same way as a sequential loop.
+    csi = np.zeros((no_frames, IWL5300_SUBCARRIERS, n_rx, n_tx), dtype=np.complex64)
+    for j in range(n_rx):
+        rows = perm[:, j]
+        csi[frame_indices, :, rows, :] = np.where(valid[:, :, j, :], values[:, :, j, :], csi[frame_indices, :, rows, :])
+
+    return csi
 
-        sgn = 1
+def unpack_int16_csi(payload: bytes, num_subcarriers: int, num_rx: int, num_tx: int) -> np.array:
+    """
+        Decodes CSI stored as interleaved int16 real/imag pairs, as produced by Intel AX2xx hardware
+        through both FeitCSI and PicoScenes.
 
-        if vi & k_tof_unpack_sgn_mask:
-            sgn = -1
+        Values are ordered by Rx, then Tx, then subcarrier.
 
-            vi &= ~k_tof_unpack_sgn_mask
+        Parameters:
+            payload {bytes} -- Buffer beginning with the CSI values.
+            num_subcarriers {int} -- Number of subcarriers present.
+            num_rx {int} -- Number of receiving antennas present.
+            num_tx {int} -- Number of transmitting antennas present.
 
-        if e < e_zero:
-            vi = 0
-        elif e < 0:
-            e = -e
-            vi = (vi >> e)
-        else:
-            vi = (vi << e)
+        Returns:
+            csi {np.array} -- (num_subcarriers, num_rx, num_tx) complex64 matrix.
+    """
+    count = 2 * num_subcarriers * num_rx * num_tx
+    values = np.frombuffer(payload, dtype=np.int16, count=count).astype(np.float32)
 
-        out[i] = sgn * vi
+    csi = values.view(np.complex64).reshape(num_rx, num_tx, num_subcarriers)
 
-    return out
\ No newline at end of file
+    return np.ascontiguousarray(csi.transpose(2, 0, 1))
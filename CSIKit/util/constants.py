@@ -63,4 +63,19 @@ NON_DATA = {
     40: [],
     80: [],
     160: []
-}
\ No newline at end of file
+}
+# Pilot subcarrier indices for Intel AX2xx CSI, keyed by (rate_format, channel_width).
+# These subcarriers are reported as zeros, so they are interpolated from their neighbours.
+AX2XX_PILOT_INDICES = {
+    ("HT", "20"): [7, 21, 34, 48],
+    ("VHT", "20"): [7, 21, 34, 48],
+    ("HT", "40"): [5, 33, 47, 66, 80, 108],
+    ("VHT", "40"): [5, 33, 47, 66, 80, 108],
+    ("VHT", "80"): [19, 47, 83, 111, 130, 158, 194, 222],
+    ("VHT", "160"): [19, 47, 83, 111, 130, 158, 194, 222, 261, 289, 325, 353, 372, 400, 436, 464],
+    ("HE", "20"): [6, 32, 74, 100, 141, 167, 209, 235],
+    ("HE", "40"): [6, 32, 74, 100, 140, 166, 208, 234, 249, 275, 317, 343, 383, 409, 451, 477],
+    ("HE", "80"): [32, 100, 166, 234, 274, 342, 408, 476, 519, 587, 653, 721, 761, 829, 895, 963],
+    ("HE", "160"): [32, 100, 166, 234, 274, 342, 408, 476, 519, 587, 653, 721, 761, 829, 895, 963, 1028, 1096, 1162,
+                    1230, 1270, 1338, 1404, 1472, 1515, 1583, 1649, 1717, 1757, 1825, 1891, 1959]
+}
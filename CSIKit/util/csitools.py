@@ -1,27 +1,84 @@
+from CSIKit.util import constants
 from CSIKit.util.matlab import db, dbinv
 
 from typing import Tuple
 
 import numpy as np
-import itertools
 
 
+# Key under which get_CSI caches the complex tensor each metric is derived from.
+COMPLEX_CACHE_KEY = ("complex",)
+
 # This function takes CSIData and returns the assembled CSI matrix from all frames,
 # as well as the number of frames and subcarrier contained therein.
+#
+# 1. Return the result of an identical earlier call, if cached and the frames are unchanged.
+# 2. Assemble the complex CSI matrix, or reuse the one cached by an earlier call. See get_complex_CSI.
+# 3. Derive the requested metric.
+# 4. Return complete CSI matrix, number of frames and number of subcarriers.
+#
+# The returned matrix is a copy which may be modified in place. With copy=False, the cached matrix is
+# returned instead, which is shared between calls and so is read-only.
+# Caching can be limited or disabled with CSIData.set_cache_limit.
+
+def get_CSI(csi_data: 'CSIData', metric: str = "amplitude", extract_as_dBm: bool = True,
+            squeeze_output: bool = False, copy: bool = True) -> Tuple[np.array, int, int]:
+    cache = getattr(csi_data, "csi_cache", None)
+    if cache is not None and not cache.is_enabled():
+        cache = None
+
+    key = (metric, extract_as_dBm, squeeze_output)
+    if cache is not None:
+        state = csi_data.get_cache_state()
+        result = cache.get(key, state)
+        if result is not None:
+            return copy_result(result) if copy else result
+
+        complex_result = cache.get(COMPLEX_CACHE_KEY, state)
+        if complex_result is None:
+            complex_result = get_complex_CSI(csi_data)
+            complex_result[0].flags.writeable = False
+            cache.add(COMPLEX_CACHE_KEY, complex_result, state)
+    else:
+        complex_result = get_complex_CSI(csi_data)
+
+    csi, no_frames, no_subcarriers = complex_result
+
+    if metric == "amplitude":
+        csi = abs(csi)
+        if extract_as_dBm:
+            csi = db(csi)
+    elif metric == "phase":
+        csi = np.angle(csi)
+
+    if squeeze_output:
+        csi = np.squeeze(csi)
+
+    result = (csi, no_frames, no_subcarriers)
+    if cache is not None:
+        csi.flags.writeable = False
+        cache.add(key, result, state)
+
+        if copy:
+            return copy_result(result)
+
+    return result
+
+def copy_result(result: tuple) -> Tuple[np.array, int, int]:
+    # Gives a writable copy of a cached result, so callers may modify it without affecting the cache.
+    csi, no_frames, no_subcarriers = result
+    return (csi.copy(), no_frames, no_subcarriers)
+
+# This function assembles the complex CSI matrix for get_CSI.
 # 
 # 1. The first frame's shape is used to establish parameters for the assembled CSI matrix.
-#       ? Some kind of assert test or something to check all frames are uniform would be good!
 #       - First we get the number of subcarriers.
 #       - Then we check the number of dimensions to count the antennas.
-# 2. Assemble the empty matrix to contain our extracted CSI.
-# 3. Iterate through each frame and extract CSI for each subcarrier at each antenna stream.
-# 4. Return complete CSI matrix, number of frames and number of subcarriers.
-
-def get_CSI(csi_data: 'CSIData', metric: str = "amplitude", extract_as_dBm: bool = True,
-            squeeze_output: bool = False) -> Tuple[np.array, int, int]:
-    # TODO: Add proper error handling.
+# 2. Stack the CSI of every frame into a Frames * Subcarriers * Rx * Tx matrix. See stack_csi_matrices.
+#       - Frames which are dropped are left out of the matrix, while csi_data itself is left unchanged.
+# 3. Return complete CSI matrix, number of frames and number of subcarriers.
 
-    # This looks a little ugly.
+def get_complex_CSI(csi_data: 'CSIData') -> Tuple[np.array, int, int]:
     frames = csi_data.frames
     csi_shape = frames[0].csi_matrix.shape
 
@@ -39,48 +96,74 @@ def get_CSI(csi_data: 'CSIData', metric: str = "amplitude", extract_as_dBm: bool
         no_rx_antennas = 1
         no_tx_antennas = 1
     else:
-        # Error. Unknown CSI shape.
-        print("Error: Unknown CSI shape.")
+        raise ValueError("Unknown CSI shape {}: expected Subcarriers, Subcarriers * Antennas or Subcarriers * Rx * Tx.".format(csi_shape))
+
+    csi_matrices = [frame.csi_matrix for frame in frames]
+    csi, _ = stack_csi_matrices(csi_matrices, (no_subcarriers, no_rx_antennas, no_tx_antennas))
+
+    return (csi, no_frames, no_subcarriers)
+
 
-    csi = np.zeros((no_frames, no_subcarriers, no_rx_antennas, no_tx_antennas), dtype=complex)
+def stack_csi_matrices(csi_matrices: list, shape: tuple) -> Tuple[np.array, list]:
+    """
+        Stacks the CSI matrix of each frame into a single Frames * Subcarriers * Rx * Tx matrix.
 
-    ranges = itertools.product(*[range(n) for n in [no_frames, no_subcarriers, no_rx_antennas, no_tx_antennas]])
+        Frames matching the shape of the first are stacked in a single pass. Any others are found
+        with one comparison of shapes, and are handled individually:
+            - Frames with fewer subcarriers are zero padded, and those with more are truncated.
+            - Frames with more Rx/Tx antennas are truncated, while those with fewer are dropped.
+            - Single antenna frames may have any number of trailing unit dimensions.
+        Frames which cannot be reconciled with the given shape raise a ValueError.
+
+        Parameters:
+            csi_matrices {list} -- CSI matrix for each frame.
+            shape {tuple} -- Number of subcarriers, Rx antennas and Tx antennas to stack to.
+
+        Returns:
+            csi {np.array} -- Complex matrix of the frames which were not dropped.
+            drop_indices {list} -- Indices of the frames which were dropped.
+    """
+    no_subcarriers, no_rx_antennas, no_tx_antennas = shape
     is_single_antenna = no_rx_antennas == 1 and no_tx_antennas == 1
 
-    drop_indices = []
+    # Frames are compared against the shape of the first, which single antenna data may give without unit dimensions.
+    reference_shape = csi_matrices[0].shape if csi_matrices else shape
+    shapes = np.array([x.shape == reference_shape for x in csi_matrices], dtype=bool)
+    matching = np.flatnonzero(shapes)
+    mismatched = np.flatnonzero(~shapes)
 
-    for frame, subcarrier, rx_antenna_index, tx_antenna_index in ranges:
-        frame_data = frames[frame].csi_matrix
-        if subcarrier >= frame_data.shape[0]:
-            # Inhomogenous component
-            # Skip frame for now. Need a better method soon.
-            continue
+    if len(mismatched) == 0:
+        # Matrices of matching size are reshaped to include unit antenna dimensions.
+        csi = np.stack(csi_matrices).astype(complex, copy=False) if csi_matrices else np.zeros((0,) + shape, dtype=complex)
+        return csi.reshape((len(csi_matrices),) + shape), []
 
-        subcarrier_data = frame_data[subcarrier]
-        if subcarrier_data.shape != (no_rx_antennas, no_tx_antennas) and not is_single_antenna:
-            if rx_antenna_index >= subcarrier_data.shape[0] or tx_antenna_index >= subcarrier_data.shape[1]:
-                # Inhomogenous component
-                # Skip frame for now. Need a better method soon.
-                drop_indices.append(frame)
-                continue
+    csi = np.zeros((len(csi_matrices),) + shape, dtype=complex)
+    if len(matching) > 0:
+        csi[matching] = np.stack([csi_matrices[i] for i in matching]).reshape((len(matching),) + shape)
 
-        csi[frame][subcarrier][rx_antenna_index][tx_antenna_index] = subcarrier_data if is_single_antenna else \
-            subcarrier_data[rx_antenna_index][tx_antenna_index]
+    drop_indices = []
+    for i in mismatched.tolist():
+        csi_matrix = csi_matrices[i]
+        subcarriers = min(no_subcarriers, csi_matrix.shape[0])
+        if subcarriers == 0:
+            continue
 
-    csi = np.delete(csi, drop_indices, 0)
-    csi_data.timestamps = [x for i, x in enumerate(csi_data.timestamps) if i not in drop_indices]
+        if is_single_antenna:
+            if csi_matrix.size != csi_matrix.shape[0]:
+                raise ValueError("Frame {} has CSI of shape {}, where a single antenna was expected.".format(i, csi_matrix.shape))
 
-    if metric == "amplitude":
-        csi = abs(csi)
-        if extract_as_dBm:
-            csi = db(csi)
-    elif metric == "phase":
-        csi = np.angle(csi)
+            csi[i, :subcarriers, 0, 0] = csi_matrix.reshape(-1)[:subcarriers]
+        else:
+            if csi_matrix.ndim != 3:
+                raise ValueError("Frame {} has CSI of shape {}, where Rx and Tx antennas were expected.".format(i, csi_matrix.shape))
 
-    if squeeze_output:
-        csi = np.squeeze(csi)
+            if csi_matrix.shape[1] < no_rx_antennas or csi_matrix.shape[2] < no_tx_antennas:
+                drop_indices.append(i)
+                continue
 
-    return (csi, no_frames, no_subcarriers)
+            csi[i, :subcarriers] = csi_matrix[:subcarriers, :no_rx_antennas, :no_tx_antennas]
+
+    return np.delete(csi, drop_indices, 0), drop_indices
 
 
 def scale_csi_frame(csi: np.array, rss: int, noise_floor: int=0) -> np.array:
@@ -115,3 +198,43 @@ def scale_csi_frame(csi: np.array, rss: int, noise_floor: int=0) -> np.array:
     scale = rss_pwr / norm_csi_mag
 
     return csi * np.sqrt(scale)
+
+# Each row holds a pilot subcarrier index surrounded by its two neighbours on either side.
+PILOT_INDEX_TABLES = {k: np.array(v)[:, np.newaxis] + np.arange(-2, 3) for k, v in constants.AX2XX_PILOT_INDICES.items()}
+
+def get_pilot_index_table(rate_format: str, channel_width: str) -> np.array:
+    return PILOT_INDEX_TABLES.get((rate_format, channel_width))
+
+def interpolate_pilots(csi: np.array, index_table: np.array) -> np.array:
+    # Pilot subcarriers are reported as zeros by some chips (Intel AX2xx),
+    # so they are replaced in place with values interpolated from their neighbours.
+    # Amplitude uses cubic interpolation, while phase is linear, extrapolating across wraps.
+    # csi may be a single (subcarriers, rx, tx) matrix or a (frames, subcarriers, rx, tx) tensor.
+
+    if index_table is None or len(index_table) == 0:
+        return csi
+
+    neighbours = csi[..., index_table, :, :]
+    amplitude = abs(neighbours)
+    phase = np.angle(neighbours)
+
+    # Neighbours are along axis -3: i-2, i-1, i, i+1, i+2.
+    y0, y1, y2, y3 = (amplitude[..., k, :, :] for k in (0, 1, 3, 4))
+    mu = 0.5
+    mu2 = mu * mu
+    a0 = y3 - y2 - y0 + y1
+    a1 = y0 - y1 - a0
+    a2 = y2 - y0
+    a3 = y1
+    pilot_amplitude = a0 * mu * mu2 + a1 * mu2 + a2 * mu + a3
+
+    previous_phase, next_phase, next_next_phase = (phase[..., k, :, :] for k in (1, 3, 4))
+    pilot_phase = previous_phase * (1 - mu) + next_phase * mu
+
+    wrapped = (previous_phase > 2) & (next_phase < -2)
+    wrap_mu = -1
+    pilot_phase = np.where(wrapped, next_phase * (1 - wrap_mu) + next_next_phase * wrap_mu, pilot_phase)
+
+    csi[..., index_table[:, 2], :, :] = pilot_amplitude * np.exp(1j * pilot_phase)
+
+    return csi
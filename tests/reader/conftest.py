@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+# Example capture for each reader, as the environment variable naming its directory and its filename.
+EXAMPLE_FILES = [
+    ("INTEL_TEST_EXAMPLE_DIR", "log.all_csi.6.7.6.dat"),
+    ("NEX_TEST_EXAMPLE_DIR", "example_43455c0.pcap"),
+    ("NEX_TEST_EXAMPLE_DIR", "example_4366c0.pcap"),
+    ("PICO_TEST_EXAMPLE_DIR", "picoscenes_iwl5300_example.csi"),
+    ("PICO_TEST_EXAMPLE_DIR", "picoscenes_ax200_example.csi"),
+    ("FEITCSI_TEST_EXAMPLE_DIR", "HESU80_5500.csi"),
+    ("ESP32_TEST_EXAMPLE_DIR", "example_data.csv"),
+]
+
+@pytest.fixture(params=EXAMPLE_FILES, ids=[filename for _, filename in EXAMPLE_FILES])
+def example_path(request) -> str:
+    directory, filename = request.param
+    return os.path.join(os.environ[directory], filename)
@@ -0,0 +1,78 @@
+from CSIKit.reader.readers.read_atheros import ATHBeamformReader
+from CSIKit.util import byteops
+
+import numpy as np
+import pytest
+
+BITS_PER_SYMBOL = 10
+
+def read_bfee_loop(csi_buf: bytes, nr: int, nc: int, num_tones: int) -> np.array:
+    # The per-symbol decoder which ATHBeamformReader.read_bfee used before unpack_10bit_csi.
+    csi = np.empty((num_tones, nc, nr), dtype=complex)
+
+    bitmask = (1 << BITS_PER_SYMBOL) - 1
+    idx = 0
+    bits_left = 16
+
+    h_data = csi_buf[idx]
+    idx += 1
+    h_data += (csi_buf[idx] << 8)
+    idx += 1
+    current_data = h_data & ((1 << 16) - 1)
+
+    for k in range(num_tones):
+        for nc_idx in range(nc):
+            for nr_idx in range(nr):
+                if (bits_left - BITS_PER_SYMBOL) < 0:
+                    current_data, idx, bits_left = byteops.get_next_bits(csi_buf, current_data, idx, bits_left)
+
+                imag = current_data & bitmask
+                imag = byteops.signbit_convert(imag, BITS_PER_SYMBOL)
+                imag += 1
+
+                bits_left -= BITS_PER_SYMBOL
+                current_data = current_data >> BITS_PER_SYMBOL
+
+                if (bits_left - BITS_PER_SYMBOL) < 0:
+                    current_data, idx, bits_left = byteops.get_next_bits(csi_buf, current_data, idx, bits_left)
+
+                real = current_data & bitmask
+                real = byteops.signbit_convert(real, BITS_PER_SYMBOL)
+                real += 1
+
+                bits_left -= BITS_PER_SYMBOL
+                current_data = current_data >> BITS_PER_SYMBOL
+
+                csi[k, nc_idx, nr_idx] = complex(real, imag)
+
+    return csi
+
+# (num_tones, nc, nr) for 20MHz and 40MHz frames across the antenna counts the Atheros CSI Tool supports.
+SHAPES = [(56, 1, 1), (56, 2, 3), (56, 3, 3), (114, 1, 2), (114, 3, 3), (1, 1, 1)]
+
+@pytest.mark.parametrize("num_tones, nc, nr", SHAPES)
+def test_read_bfee(num_tones, nc, nr):
+    rng = np.random.default_rng(num_tones * 9 + nc * 3 + nr)
+    length = byteops.get_10bit_csi_length(num_tones, nc, nr)
+
+    payloads = rng.integers(0, 256, (4, length), dtype=np.uint8)
+    expected = [read_bfee_loop(payload.tobytes(), nr, nc, num_tones) for payload in payloads]
+
+    for payload, expected_csi in zip(payloads, expected):
+        assert(np.array_equal(ATHBeamformReader.read_bfee(payload.tobytes(), nr, nc, num_tones), expected_csi))
+
+    # Payloads of the same shape are decoded together, as read_bfee_batch does.
+    assert(np.array_equal(byteops.unpack_10bit_csi(payloads, num_tones, nc, nr), expected))
+
+def test_read_bfee_padded():
+    # Payloads may be longer than their CSI, as csi_length includes any trailing bytes.
+    payload = np.random.default_rng(0).integers(0, 256, byteops.get_10bit_csi_length(56, 2, 2) + 7, dtype=np.uint8).tobytes()
+
+    assert(np.array_equal(ATHBeamformReader.read_bfee(payload, 2, 2, 56), read_bfee_loop(payload, 2, 2, 56)))
+
+def test_read_bfee_incomplete():
+    length = byteops.get_10bit_csi_length(56, 2, 2)
+    payload = bytes(length - 1)
+
+    with pytest.raises(ValueError, match="expected {} bytes .* but got {} bytes".format(length, length - 1)):
+        ATHBeamformReader.read_bfee(payload, 2, 2, 56)
@@ -0,0 +1,173 @@
+from CSIKit.csi.frames import ESP32CSIFrame
+from CSIKit.reader.readers.read_csv import CSVBeamformReader
+
+import os
+
+import numpy as np
+import pytest
+
+def get_example_path() -> str:
+    return os.path.join(os.environ["ESP32_TEST_EXAMPLE_DIR"], "example_data.csv")
+
+def read_lines(path: str) -> list:
+    with open(path, "rb") as file:
+        return file.readlines()
+
+def write_lines(path: str, lines: list):
+    with open(path, "wb") as file:
+        file.writelines(lines)
+
+def get_initial_timestamp(lines: list) -> float:
+    # real_timestamp of the first frame, which read_file gives others relative to.
+    return float(lines[1].split(b",")[23]) / 1000
+
+def assert_batches_match(batches: list, frames: list, timestamps: list):
+    assert(sum(len(batch) for batch in batches) == len(frames))
+
+    stream_timestamps = np.concatenate([batch.timestamps for batch in batches])
+    assert(np.allclose(stream_timestamps, timestamps))
+
+    csi = [csi_matrix for batch in batches for csi_matrix in batch.csi]
+    for csi_matrix, frame in zip(csi, frames):
+        assert(np.array_equal(csi_matrix[:frame.csi_matrix.shape[0]], frame.csi_matrix))
+
+def test_read_stream():
+    path = get_example_path()
+    expected = CSVBeamformReader().read_file(path)
+
+    batches = list(CSVBeamformReader().read_stream(path, chunk_frames=16))
+
+    assert(all(len(batch) == 16 for batch in batches[:-1]))
+    assert(batches[-1].offset == os.path.getsize(path))
+    assert_batches_match(batches, expected.frames, expected.timestamps)
+
+def test_read_stream_offset():
+    path = get_example_path()
+    expected = CSVBeamformReader().read_file(path)
+
+    first_batch = next(CSVBeamformReader().read_stream(path, chunk_frames=10))
+
+    # Reading resumes from the end of the previous batch, with timestamps relative to the same frame.
+    initial_timestamp = get_initial_timestamp(read_lines(path))
+    batches = list(CSVBeamformReader().read_stream(path, chunk_frames=16, offset=first_batch.offset, initial_timestamp=initial_timestamp))
+
+    assert_batches_match(batches, expected.frames[10:], expected.timestamps[10:])
+
+def test_read_stream_malformed_rows(tmp_path):
+    lines = read_lines(get_example_path())
+    expected = CSVBeamformReader().read_file(get_example_path())
+
+    # Rows with the wrong number of columns end read_file, while read_stream skips them.
+    path = str(tmp_path / "truncated_row.csv")
+    write_lines(path, lines[:11] + [b"CSI_DATA,PASSIVE,truncated\n"] + lines[11:])
+
+    assert(len(CSVBeamformReader().read_file(path).frames) == 10)
+    assert_batches_match(list(CSVBeamformReader().read_stream(path, chunk_frames=16)), expected.frames, expected.timestamps)
+
+    # Rows with unparseable CSI, or which cannot be decoded, are skipped without affecting the rest of their block.
+    bad_csi = lines[11].rsplit(b",", 1)[0] + b",[1 2 x 4 ]\n"
+    path = str(tmp_path / "bad_rows.csv")
+    write_lines(path, lines[:11] + [bad_csi, b"\xff\xfe,\n"] + lines[11:])
+
+    assert_batches_match(list(CSVBeamformReader().read_stream(path, chunk_frames=16)), expected.frames, expected.timestamps)
+
+def test_read_stream_incomplete_line(tmp_path):
+    lines = read_lines(get_example_path())
+
+    # A final line still being written is left for the next read.
+    path = str(tmp_path / "partial.csv")
+    write_lines(path, lines[:21] + [lines[21][:40]])
+
+    batches = list(CSVBeamformReader().read_stream(path))
+    assert(sum(len(batch) for batch in batches) == 20)
+    assert(batches[-1].offset == sum(len(line) for line in lines[:21]))
+
+    write_lines(path, lines)
+    expected = CSVBeamformReader().read_file(path)
+
+    batches = list(CSVBeamformReader().read_stream(path, offset=batches[-1].offset, initial_timestamp=get_initial_timestamp(lines)))
+    assert_batches_match(batches, expected.frames[20:], expected.timestamps[20:])
+
+def format_array(values) -> str:
+    # CSI arrays as written by the ESP32 and FitHomes tools.
+    return "[" + "".join("{} ".format(x) for x in values) + "]"
+
+def get_arrays(lengths: list, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [format_array(rng.integers(-128, 128, length)) for length in lengths]
+
+def assert_matrices_match(csi_matrices, expected: list):
+    assert(len(csi_matrices) == len(expected))
+    for csi_matrix, expected_matrix in zip(csi_matrices, expected):
+        assert(csi_matrix.dtype == np.complex64)
+        assert(np.array_equal(csi_matrix, expected_matrix))
+
+@pytest.mark.parametrize("lengths", [[128] * 5, [128, 256, 128, 104]])
+def test_parse_matrices(lengths):
+    string_data = get_arrays(lengths)
+
+    assert_matrices_match(ESP32CSIFrame.parse_matrices(string_data), [ESP32CSIFrame.parse_matrix(x) for x in string_data])
+
+def test_parse_matrices_fallback():
+    # Values NumPy cannot tokenize are left to literal_eval, as before.
+    string_data = get_arrays([128] * 3) + ["[0x10 3 -4 5 ]"]
+    assert(ESP32CSIFrame.parse_arrays(string_data) is None)
+
+    assert_matrices_match(ESP32CSIFrame.parse_matrices(string_data), [ESP32CSIFrame.parse_matrix(x) for x in string_data])
+
+    # Odd numbers of values raise the same error as parse_matrix.
+    string_data = get_arrays([128, 127])
+    with pytest.raises(ValueError):
+        ESP32CSIFrame.parse_matrix(string_data[1])
+    with pytest.raises(ValueError):
+        ESP32CSIFrame.parse_matrices(string_data)
+
+@pytest.mark.parametrize("lengths", [[64] * 5, [64, 128, 64, 52]])
+def test_parse_separate_matrices_bulk(lengths):
+    imag_data = get_arrays(lengths, 0)
+    real_data = get_arrays(lengths, 1)
+
+    expected = [ESP32CSIFrame.parse_separate_matrices(imag, real) for imag, real in zip(imag_data, real_data)]
+    assert_matrices_match(ESP32CSIFrame.parse_separate_matrices_bulk(imag_data, real_data), expected)
+
+def test_parse_separate_matrices_bulk_fallback():
+    imag_data = get_arrays([64] * 3, 0) + ["[0x10 3 ]"]
+    real_data = get_arrays([64] * 3, 1) + ["[\"4 5\" ]"]
+
+    expected = [ESP32CSIFrame.parse_separate_matrices(imag, real) for imag, real in zip(imag_data, real_data)]
+    assert_matrices_match(ESP32CSIFrame.parse_separate_matrices_bulk(imag_data, real_data), expected)
+
+    # Real values beyond the imaginary ones are ignored, while too few raise the same error as before.
+    imag_data = get_arrays([64, 64], 0)
+    real_data = get_arrays([64, 70], 1)
+
+    expected = [ESP32CSIFrame.parse_separate_matrices(imag, real) for imag, real in zip(imag_data, real_data)]
+    assert_matrices_match(ESP32CSIFrame.parse_separate_matrices_bulk(imag_data, real_data), expected)
+
+    real_data = get_arrays([64, 60], 1)
+    with pytest.raises(IndexError):
+        ESP32CSIFrame.parse_separate_matrices(imag_data[1], real_data[1])
+    with pytest.raises(IndexError):
+        ESP32CSIFrame.parse_separate_matrices_bulk(imag_data, real_data)
+
+def test_read_file_antennas(tmp_path):
+    # FitHomes captures hold a row per antenna, of which only antenna 0 is kept.
+    imag_data = get_arrays([64] * 8, 0)
+    real_data = get_arrays([64] * 8, 1)
+
+    lines = ["sensor_id,timestamp,sequence_identifier,antenna,rssi,noise_floor,interval,imag,real\n"]
+    for i, (imag, real) in enumerate(zip(imag_data, real_data)):
+        lines.append("12 34 56,{},{},{},-50,-90,100,{},{}\n".format(1700000000000000 + i * 10000, i // 2, i % 2, imag, real))
+
+    path = str(tmp_path / "fithomes.csv")
+    with open(path, "w") as file:
+        file.writelines(lines)
+
+    expected = [ESP32CSIFrame.parse_separate_matrices(imag, real) for imag, real in zip(imag_data[::2], real_data[::2])]
+
+    csi_data = CSVBeamformReader().read_file(path)
+    assert_matrices_match([frame.csi_matrix for frame in csi_data.frames], expected)
+    assert(np.allclose(csi_data.timestamps, np.arange(4) * 0.02))
+
+    batches = list(CSVBeamformReader().read_stream(path))
+    assert_batches_match(batches, csi_data.frames, csi_data.timestamps)
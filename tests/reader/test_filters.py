@@ -0,0 +1,120 @@
+from CSIKit.csi import CSIFilter
+from CSIKit.reader import get_reader
+
+import inspect
+
+import numpy as np
+import pytest
+
+def get_mac(frame):
+    return getattr(frame, "source_mac", getattr(frame, "mac", None))
+
+def get_filters(csi_data) -> dict:
+    # Filters on each header field, chosen to split the example capture where its headers allow.
+    no_frames = len(csi_data.frames)
+    timestamps = csi_data.timestamps
+    first_frame = csi_data.frames[0]
+
+    filters = {
+        "frame_range": CSIFilter(frame_range=(1, no_frames // 2)),
+        "time_range": CSIFilter(time_range=(timestamps[no_frames // 4], timestamps[3 * no_frames // 4])),
+        "combined": CSIFilter(time_range=(timestamps[1], None), frame_range=(None, 3 * no_frames // 4)),
+    }
+
+    mac = get_mac(first_frame)
+    if mac is not None:
+        # Some formats hold addresses as bytes, which are filtered on as strings.
+        filters["mac"] = CSIFilter(CSIFilter.format_mac(mac))
+
+    sequence = getattr(csi_data.frames[no_frames // 4], "sequence_no", None)
+    if sequence is not None:
+        filters["sequence_range"] = CSIFilter(sequence_range=(sequence, sequence + 50))
+
+    return filters
+
+def get_expected(reader, csi_data, frame_filter: CSIFilter) -> list:
+    # Skipped frames filled in by NEXBeamformReader are only added without a filter.
+    no_frames = len(csi_data.frames)
+    if getattr(reader, "fill_skipped_frames", False):
+        no_frames -= csi_data.skipped_frames
+
+    expected = []
+    for index, (frame, timestamp) in enumerate(zip(csi_data.frames[:no_frames], csi_data.timestamps)):
+        if frame_filter.matches(index, timestamp, get_mac(frame), getattr(frame, "sequence_no", None)):
+            expected.append((frame, timestamp))
+
+    return expected
+
+def assert_filtered_match(filtered, expected: list):
+    assert(len(filtered.frames) == len(expected))
+    assert(np.array_equal(filtered.timestamps, [timestamp for _, timestamp in expected]))
+
+    for frame, (expected_frame, _) in zip(filtered.frames, expected):
+        assert(np.array_equal(frame.csi_matrix, expected_frame.csi_matrix))
+
+def test_read_file_frame_filter(example_path):
+    reader = get_reader(example_path)
+    csi_data = reader.read_file(example_path)
+
+    filters = get_filters(csi_data)
+    assert(0 < len(get_expected(reader, csi_data, filters["frame_range"])) < len(csi_data.frames))
+
+    for frame_filter in filters.values():
+        expected = get_expected(reader, csi_data, frame_filter)
+
+        assert_filtered_match(type(reader)().read_file(example_path, frame_filter=frame_filter), expected)
+
+def test_read_file_frame_filter_workers(example_path):
+    reader = get_reader(example_path)
+    if "workers" not in inspect.signature(reader.read_file).parameters:
+        pytest.skip("{} does not decode in parallel.".format(type(reader).__name__))
+
+    csi_data = reader.read_file(example_path)
+
+    for frame_filter in get_filters(csi_data).values():
+        expected = get_expected(reader, csi_data, frame_filter)
+
+        assert_filtered_match(type(reader)().read_file(example_path, workers=2, frame_filter=frame_filter), expected)
+
+def test_read_file_frame_filter_empty(example_path):
+    reader = get_reader(example_path)
+    no_frames = len(reader.read_file(example_path).frames)
+
+    # Filters which match nothing give an empty CSIData rather than an error.
+    filters = [
+        CSIFilter("00:00:00:00:00:00"),
+        CSIFilter(frame_range=(no_frames, None)),
+        CSIFilter(time_range=(None, -1)),
+    ]
+
+    for frame_filter in filters:
+        csi_data = type(reader)().read_file(example_path, frame_filter=frame_filter)
+
+        assert(len(csi_data.frames) == 0)
+        assert(len(csi_data.timestamps) == 0)
+
+def test_read_file_frame_filter_missing_field(example_path):
+    reader = get_reader(example_path)
+    csi_data = reader.read_file(example_path)
+
+    # Frames are dropped when the field filtered on is absent, as for formats without sequence numbers.
+    frame_filter = CSIFilter(sequence_range=(0, None))
+    expected = get_expected(reader, csi_data, frame_filter)
+    assert(len(expected) in (0, len(get_expected(reader, csi_data, CSIFilter()))))
+
+    assert_filtered_match(type(reader)().read_file(example_path, frame_filter=frame_filter), expected)
+
+def test_read_file_filter_mac(example_path):
+    reader = get_reader(example_path)
+    csi_data = reader.read_file(example_path)
+
+    mac = get_mac(csi_data.frames[0])
+    if CSIFilter.format_mac(mac) is None:
+        pytest.skip("{} frames have no source MAC address.".format(type(reader).__name__))
+
+    # filter_mac is combined with frame_filter, so only frames meeting both are kept.
+    frame_filter = CSIFilter(frame_range=(1, None))
+    expected = get_expected(reader, csi_data, CSIFilter(CSIFilter.format_mac(mac), frame_range=(1, None)))
+
+    filtered = type(reader)().read_file(example_path, filter_mac=CSIFilter.format_mac(mac).upper(), frame_filter=frame_filter)
+    assert_filtered_match(filtered, expected)
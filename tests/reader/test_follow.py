@@ -0,0 +1,86 @@
+from CSIKit.reader import get_reader, NEXBeamformReader
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+POLL_INTERVAL = 0.01
+TIMEOUT = 30
+
+def read_batches(reader, path: str) -> tuple:
+    # Nexmon captures which are still being written do not have their skipped frames filled in,
+    # and the last multi-stream sequence is held back until the next one begins.
+    if isinstance(reader, NEXBeamformReader):
+        reader.fill_skipped_frames = False
+
+    batches = list(reader.iter_frames(path, batch_size=64))
+    timestamps = np.concatenate([batch.timestamps for batch in batches])
+    csi = [csi_matrix for batch in batches for csi_matrix in batch.csi]
+
+    if isinstance(reader, NEXBeamformReader):
+        sequence_no = reader.read_headers(path)["sequence_no"]
+        if sequence_no[0] != sequence_no[-1]:
+            return timestamps[:-1], csi[:-1]
+
+    return timestamps, csi
+
+def start_follow(reader, path: str) -> queue.Queue:
+    # follow never returns, so it is consumed by a daemon thread.
+    batches = queue.Queue()
+
+    def consume():
+        for batch in reader.follow(path, poll_interval=POLL_INTERVAL, batch_size=64):
+            batches.put(batch)
+
+    threading.Thread(target=consume, daemon=True).start()
+    return batches
+
+def collect(batches: queue.Queue, collected: list, no_frames: int):
+    deadline = time.monotonic() + TIMEOUT
+    while sum(len(batch) for batch in collected) < no_frames:
+        collected.append(batches.get(timeout=max(deadline - time.monotonic(), 0)))
+
+def pad(csi_matrix: np.array, shape: tuple) -> np.array:
+    return np.pad(csi_matrix, [(0, size - dim) for size, dim in zip(shape, csi_matrix.shape)])
+
+def assert_csi_match(csi_matrix: np.array, expected: np.array):
+    # Matrices are zero padded to the largest in their batch, which differs between reads.
+    shape = np.maximum(csi_matrix.shape, expected.shape)
+    assert(np.array_equal(pad(csi_matrix, shape), pad(expected, shape)))
+
+def test_follow(example_path, tmp_path):
+    with open(example_path, "rb") as file:
+        data = file.read()
+
+    reader = get_reader(example_path)
+    timestamps, csi = read_batches(reader, example_path)
+
+    # The file is first written up to the middle of a record.
+    path = str(tmp_path / "growing")
+    with open(path, "wb") as file:
+        file.write(data[:len(data) // 2])
+
+    partial_timestamps, _ = read_batches(type(reader)(), path)
+    assert(0 < len(partial_timestamps) < len(timestamps))
+
+    batches = start_follow(type(reader)(), path)
+    collected = []
+    collect(batches, collected, len(partial_timestamps))
+
+    # The incomplete record is held back until the rest of it is written.
+    time.sleep(POLL_INTERVAL * 10)
+    assert(batches.empty())
+
+    with open(path, "ab") as file:
+        file.write(data[len(data) // 2:])
+
+    collect(batches, collected, len(timestamps))
+
+    followed_timestamps = np.concatenate([batch.timestamps for batch in collected])
+    followed_csi = [csi_matrix for batch in collected for csi_matrix in batch.csi]
+
+    assert(np.allclose(followed_timestamps, timestamps))
+    for csi_matrix, expected_csi_matrix in zip(followed_csi, csi):
+        assert_csi_match(csi_matrix, expected_csi_matrix)
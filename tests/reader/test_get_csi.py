@@ -0,0 +1,144 @@
+from CSIKit.csi import CSIData
+from CSIKit.reader import get_reader
+from CSIKit.util import csitools
+import itertools
+import os
+import types
+
+import numpy as np
+import pytest
+
+def test_get_csi_returns_writable_copy():
+    test_dir = os.environ["NEX_READER_TEST_DIR"]
+    path = os.path.join(test_dir, "example.pcap")
+    csi_data = get_reader(path).read_file(path)
+
+    # Results may be modified in place, as in the README's filtering example, without affecting later calls.
+    csi_matrix, _, _ = csitools.get_CSI(csi_data)
+    expected = csi_matrix.copy()
+    csi_matrix[:] = 0
+
+    repeated, _, _ = csitools.get_CSI(csi_data)
+    assert(repeated.flags.writeable)
+    assert(np.array_equal(repeated, expected))
+
+    complex_matrix, _, _ = csitools.get_CSI(csi_data, metric="")
+    complex_matrix[:] = 0
+    assert(np.array_equal(csitools.get_CSI(csi_data)[0], expected))
+
+def test_get_csi_shared():
+    test_dir = os.environ["NEX_READER_TEST_DIR"]
+    path = os.path.join(test_dir, "example.pcap")
+    csi_data = get_reader(path).read_file(path)
+
+    # With copy=False, the cached matrix is shared between calls and cannot be modified.
+    csi_matrix, _, _ = csitools.get_CSI(csi_data, copy=False)
+    assert(not csi_matrix.flags.writeable)
+    assert(csitools.get_CSI(csi_data, copy=False)[0] is csi_matrix)
+    assert(np.array_equal(csitools.get_CSI(csi_data)[0], csi_matrix))
+
+def test_get_csi_frame_changes():
+    test_dir = os.environ["NEX_READER_TEST_DIR"]
+    path = os.path.join(test_dir, "example.pcap")
+    csi_data = get_reader(path).read_file(path, lazy=True)
+    expected, _, _ = csitools.get_CSI(csi_data, metric="")
+
+    # Assigning a frame's CSI discards cached tensors.
+    frame = csi_data.frames[0]
+    frame.csi_matrix = np.zeros_like(frame.csi_matrix)
+    csi_matrix, _, _ = csitools.get_CSI(csi_data, metric="")
+    assert(not csi_matrix[0].any())
+    assert(np.array_equal(csi_matrix[1:], expected[1:]))
+
+    # As does replacing a frame in the list.
+    csi_data.frames[0] = csi_data.frames[1]
+    csi_matrix, _, _ = csitools.get_CSI(csi_data, metric="")
+    assert(np.array_equal(csi_matrix[0], expected[1]))
+
+    # Dropped lazy matrices are decoded again from their payload, losing any in-place changes.
+    frame = csi_data.frames[2]
+    assert(frame.is_decoded())
+    frame.csi_matrix[:] = 0
+    frame.drop_csi()
+    csi_matrix, _, _ = csitools.get_CSI(csi_data, metric="")
+    assert(np.array_equal(csi_matrix[2], expected[2]))
+
+    # Assigned lists are tracked in the same way.
+    csi_data.frames = list(reversed(csi_data.frames))
+    csi_data.frames.pop()
+    csi_matrix, _, _ = csitools.get_CSI(csi_data, metric="")
+    assert(np.array_equal(csi_matrix, expected[:0:-1]))
+
+def stack_csi_matrices_loop(csi_matrices: list, shape: tuple) -> np.array:
+    # The element by element loop get_CSI used before stack_csi_matrices, as a reference.
+    no_subcarriers, no_rx_antennas, no_tx_antennas = shape
+    csi = np.zeros((len(csi_matrices), no_subcarriers, no_rx_antennas, no_tx_antennas), dtype=complex)
+
+    ranges = itertools.product(*[range(n) for n in [len(csi_matrices), no_subcarriers, no_rx_antennas, no_tx_antennas]])
+    is_single_antenna = no_rx_antennas == 1 and no_tx_antennas == 1
+
+    drop_indices = []
+
+    for frame, subcarrier, rx_antenna_index, tx_antenna_index in ranges:
+        frame_data = csi_matrices[frame]
+        if subcarrier >= frame_data.shape[0]:
+            continue
+
+        subcarrier_data = frame_data[subcarrier]
+        if subcarrier_data.shape != (no_rx_antennas, no_tx_antennas) and not is_single_antenna:
+            if rx_antenna_index >= subcarrier_data.shape[0] or tx_antenna_index >= subcarrier_data.shape[1]:
+                drop_indices.append(frame)
+                continue
+
+        # Single antenna subcarriers may have a trailing unit dimension, which numpy 2 no longer converts to a scalar.
+        csi[frame][subcarrier][rx_antenna_index][tx_antenna_index] = np.ravel(subcarrier_data)[0] if is_single_antenna else \
+            subcarrier_data[rx_antenna_index][tx_antenna_index]
+
+    return np.delete(csi, drop_indices, 0)
+
+def random_csi(*shape) -> np.array:
+    rng = np.random.default_rng(sum(shape))
+    return (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)).astype(np.complex64)
+
+MIXED_SHAPES = [
+    # Intel frames with fewer and more subcarriers, and fewer and more antennas.
+    ((30, 3, 2), [(30, 3, 2), (20, 3, 2), (40, 3, 2), (30, 2, 2), (30, 3, 1), (30, 3, 3), (30, 3, 2)], [4, 5]),
+    # Single antenna frames, with and without a trailing unit dimension.
+    ((64,), [(64,), (32,), (128,), (64,)], []),
+    ((256, 1), [(256, 1), (128, 1), (512, 1), (256, 1)], []),
+]
+
+@pytest.mark.parametrize("first_shape, shapes, expected_drop_indices", MIXED_SHAPES)
+def test_stack_csi_matrices_mixed_shapes(first_shape, shapes, expected_drop_indices):
+    csi_matrices = [random_csi(*first_shape)] + [random_csi(*shape) for shape in shapes]
+
+    no_rx_antennas, no_tx_antennas = first_shape[1:] if len(first_shape) == 3 else (1, 1)
+    shape = (first_shape[0], no_rx_antennas, no_tx_antennas)
+
+    csi, drop_indices = csitools.stack_csi_matrices(csi_matrices, shape)
+
+    assert(np.array_equal(csi, stack_csi_matrices_loop(csi_matrices, shape)))
+    assert(drop_indices == expected_drop_indices)
+
+def make_csi_data(csi_matrices: list) -> CSIData:
+    csi_data = CSIData()
+    for i, csi_matrix in enumerate(csi_matrices):
+        csi_data.push_frame(types.SimpleNamespace(csi_matrix=csi_matrix), float(i))
+
+    return csi_data
+
+def test_get_complex_csi_dropped_frames():
+    csi_data = make_csi_data([random_csi(30, 3, 2), random_csi(30, 2, 2), random_csi(30, 3, 2)])
+
+    # Frames with fewer antennas are left out of the matrix, without changing csi_data.
+    csi, no_frames, _ = csitools.get_complex_CSI(csi_data)
+
+    assert(csi.shape == (2, 30, 3, 2))
+    assert(no_frames == 3)
+    assert(csi_data.timestamps == [0.0, 1.0, 2.0])
+
+def test_get_complex_csi_unknown_shape():
+    csi_data = make_csi_data([random_csi(30, 3, 2, 2)])
+
+    with pytest.raises(ValueError, match=r"\(30, 3, 2, 2\)"):
+        csitools.get_complex_CSI(csi_data)
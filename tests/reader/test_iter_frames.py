@@ -0,0 +1,66 @@
+from CSIKit.reader import get_reader, NEXBeamformReader
+
+import io
+import os
+
+import numpy as np
+import pytest
+
+def assert_batches_match(batches: list, csi_data):
+    timestamps = np.concatenate([batch.timestamps for batch in batches])
+
+    assert(len(timestamps) == len(csi_data.frames))
+    assert(np.allclose(timestamps, csi_data.timestamps))
+
+    batch_matrices = [csi for batch in batches for csi in batch.csi]
+    for batch_matrix, frame in zip(batch_matrices, csi_data.frames):
+        # Batches zero pad matrices smaller than the largest in the batch.
+        csi_matrix = frame.csi_matrix
+        region = tuple(slice(0, x) for x in csi_matrix.shape)
+
+        assert(np.array_equal(batch_matrix[region], csi_matrix))
+        assert(np.count_nonzero(batch_matrix) == np.count_nonzero(csi_matrix))
+
+def test_iter_frames_path(example_path):
+    reader = get_reader(example_path)
+    csi_data = reader.read_file(example_path)
+
+    assert_batches_match(list(reader.iter_frames(example_path, batch_size=16)), csi_data)
+
+def test_iter_frames_file_object(example_path):
+    reader = get_reader(example_path)
+    csi_data = reader.read_file(example_path)
+
+    with open(example_path, "rb") as file:
+        batches = list(reader.iter_frames(file, batch_size=16))
+
+    assert_batches_match(batches, csi_data)
+
+def test_iter_frames_bytes(example_path):
+    reader = get_reader(example_path)
+    csi_data = reader.read_file(example_path)
+
+    with open(example_path, "rb") as file:
+        data = file.read()
+
+    assert_batches_match(list(reader.iter_frames(data, batch_size=16)), csi_data)
+
+@pytest.mark.parametrize("filename", ["example_43455c0.pcap", "example_4366c0.pcap", "example_4339.pcap"])
+def test_iter_frames_stream_layout_prefix(filename):
+    path = os.path.join(os.environ["NEX_TEST_EXAMPLE_DIR"], filename)
+    csi_data = NEXBeamformReader().read_file(path)
+
+    with open(path, "rb") as file:
+        data = file.read()
+
+    # Streams which cannot be mapped are read once, with their layout taken from a prefix of frames.
+    reader = NEXBeamformReader()
+    reader.LAYOUT_FRAMES = 16
+
+    stream = io.BytesIO(data)
+    batches = reader.iter_frames(stream, batch_size=16)
+
+    first_batch = next(batches)
+    assert(stream.tell() < len(data) // 2)
+
+    assert_batches_match([first_batch] + list(batches), csi_data)
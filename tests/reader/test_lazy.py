@@ -0,0 +1,73 @@
+from CSIKit.reader import get_reader
+
+import inspect
+
+import numpy as np
+import pytest
+
+def assert_frames_match(csi_data, expected):
+    assert(len(csi_data.frames) == len(expected.frames))
+    assert(np.array_equal(csi_data.timestamps, expected.timestamps))
+
+    for frame, expected_frame in zip(csi_data.frames, expected.frames):
+        assert(np.array_equal(frame.csi_matrix, expected_frame.csi_matrix))
+
+def read_lazy(path: str, **kwargs):
+    reader = get_reader(path)
+    if "lazy" not in inspect.signature(reader.read_file).parameters:
+        pytest.skip("{} does not decode lazily.".format(type(reader).__name__))
+
+    return reader.read_file(path), type(reader)().read_file(path, lazy=True, **kwargs)
+
+def get_lazy_frames(csi_data, required: bool = True) -> list:
+    # Frames assembled from several payloads (e.g. Nexmon multi-core captures) are decoded eagerly.
+    lazy_frames = [frame for frame in csi_data.frames if "_lazy_csi" in frame.__dict__]
+    if required and len(lazy_frames) == 0:
+        pytest.skip("{} frames are decoded eagerly.".format(csi_data.chipset))
+
+    return lazy_frames
+
+def test_read_file_lazy(example_path):
+    expected, csi_data = read_lazy(example_path)
+
+    # Nothing is decoded until csi_matrix is accessed.
+    lazy_frames = get_lazy_frames(csi_data, required=False)
+    assert(not any(frame.is_decoded() for frame in lazy_frames))
+
+    assert_frames_match(csi_data, expected)
+    assert(all(frame.is_decoded() for frame in lazy_frames))
+
+def test_drop_csi(example_path):
+    expected, csi_data = read_lazy(example_path)
+    lazy_frames = get_lazy_frames(csi_data)
+
+    assert_frames_match(csi_data, expected)
+
+    for frame in lazy_frames:
+        frame.drop_csi()
+    assert(not any(frame.is_decoded() for frame in lazy_frames))
+
+    # Dropped matrices are decoded again from their payload.
+    assert_frames_match(csi_data, expected)
+
+def test_assign_csi_matrix(example_path):
+    _, csi_data = read_lazy(example_path)
+    frame = get_lazy_frames(csi_data)[0]
+
+    # Assigned matrices replace the pending decode, and are kept by drop_csi.
+    csi_matrix = np.zeros((1, 1, 1), dtype=complex)
+    frame.csi_matrix = csi_matrix
+    frame.drop_csi()
+
+    assert(frame.csi_matrix is csi_matrix)
+
+def test_read_file_memory_budget(example_path):
+    expected, csi_data = read_lazy(example_path, memory_budget=1)
+    lazy_frames = get_lazy_frames(csi_data)
+
+    # Matrices dropped to stay within the budget are decoded again when next accessed.
+    assert_frames_match(csi_data, expected)
+    assert(sum(frame.is_decoded() for frame in lazy_frames) == 1)
+
+    assert_frames_match(csi_data, expected)
+    assert(sum(frame.is_decoded() for frame in lazy_frames) == 1)
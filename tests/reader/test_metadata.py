@@ -0,0 +1,112 @@
+from CSIKit.csi import CSIData, CSIFilter
+from CSIKit.reader import get_reader
+from CSIKit.reader.readers.read_atheros import ATHBeamformReader
+from CSIKit.reader.readers.read_feitcsi import FeitCSIBeamformReader, HEADER_DTYPE, MAX_TICK
+
+import os
+import struct
+import types
+
+import numpy as np
+import pytest
+
+# Source MAC address which none of the examples contain.
+OTHER_MAC = "12:34:56:78:9a:bc"
+
+def get_fields(metadata) -> dict:
+    return {name: getattr(metadata, name) for name in metadata.__slots__}
+
+def test_read_metadata(example_path):
+    reader = get_reader(example_path)
+    expected = get_fields(reader.read_file(example_path).get_metadata())
+
+    assert(get_fields(type(reader)().read_metadata(example_path)) == expected)
+
+def test_read_metadata_header_only(example_path, monkeypatch):
+    reader = get_reader(example_path)
+    expected = get_fields(reader.read_file(example_path).get_metadata())
+
+    pushed_frames = []
+    push_frame = CSIData.push_frame
+
+    def count_push_frame(self, frame, timestamp):
+        pushed_frames.append(frame)
+        push_frame(self, frame, timestamp)
+
+    # At most the first frame is built, to establish the shape of its CSI.
+    monkeypatch.setattr(CSIData, "push_frame", count_push_frame)
+
+    assert(get_fields(type(reader)().read_metadata(example_path)) == expected)
+    assert(len(pushed_frames) <= 1)
+
+def test_read_metadata_filter_mac(example_path):
+    reader = get_reader(example_path)
+    csi_data = reader.read_file(example_path)
+
+    first_frame = csi_data.frames[0]
+    mac = getattr(first_frame, "source_mac", getattr(first_frame, "mac", None))
+    if mac is None:
+        # Formats without MAC addresses keep no frames when filtered, so have no metadata to compare.
+        return
+
+    # Some formats hold addresses as bytes, which are filtered on as strings.
+    mac = CSIFilter.format_mac(mac)
+    expected = get_fields(type(reader)().read_file(example_path, filter_mac=mac).get_metadata())
+
+    assert(get_fields(type(reader)().read_metadata(example_path, filter_mac=mac)) == expected)
+
+def test_read_metadata_filter_mac_no_frames(example_path):
+    reader = get_reader(example_path)
+
+    # Where no frames are kept, there is nothing to summarise, as with read_file.
+    with pytest.raises(IndexError):
+        reader.read_file(example_path, filter_mac=OTHER_MAC).get_metadata()
+
+    with pytest.raises(IndexError):
+        type(reader)().read_metadata(example_path, filter_mac=OTHER_MAC)
+
+def write_atheros_file(path: str, timestamps: list, rssi: list):
+    # Records of 2x2 CSI for 56 tones, each with its 2 byte length, 25 byte header and random payload.
+    csi_length = ATHBeamformReader.get_required_length(56, 2, 2)
+    rng = np.random.default_rng(0)
+
+    with open(path, "wb") as file:
+        for timestamp, record_rssi in zip(timestamps, rssi):
+            header = struct.pack("<QHHBBBBBBBBBBBH", timestamp, csi_length, 2412, 0, 0, 0, 0, 56, 2, 2, record_rssi, record_rssi, record_rssi, record_rssi, 0)
+            file.write(struct.pack("<H", len(header) + csi_length) + header + rng.integers(0, 256, csi_length, dtype=np.uint8).tobytes())
+
+def test_read_metadata_atheros(tmp_path):
+    path = str(tmp_path / "example.dat")
+    write_atheros_file(path, [1000000, 1500000, 2250000, 4000000], [40, 45, 50, 41])
+
+    expected = get_fields(ATHBeamformReader().read_file(path).get_metadata())
+    assert(expected["frames"] == 4)
+
+    assert(get_fields(ATHBeamformReader().read_metadata(path)) == expected)
+
+    with pytest.raises(IndexError):
+        ATHBeamformReader().read_metadata(path, filter_mac=OTHER_MAC)
+
+def test_feitcsi_get_timestamps():
+    # Clocks which step forward, wrap around, stand still, and jump by more than the ftm_clock can count.
+    headers = np.zeros(6, dtype=HEADER_DTYPE)
+    headers["ftm_clock"] = [100, 50000, MAX_TICK - 10, 20, 20, 3000]
+    headers["mu_clock"] = [0, 1000, 2000, 3000, 4000, 60000000]
+
+    expected = [0]
+    previous_frame = types.SimpleNamespace(mu_clock=0, ftm_clock=100)
+    for header in headers[1:].tolist():
+        header = dict(zip(HEADER_DTYPE.names, header))
+        expected.append(FeitCSIBeamformReader.get_timestamp(header, previous_frame, expected[-1]))
+        previous_frame = types.SimpleNamespace(**header)
+
+    assert(np.array_equal(FeitCSIBeamformReader.get_timestamps(headers), expected))
+
+    directory = os.environ["FEITCSI_TEST_EXAMPLE_DIR"]
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        with open(path, "rb") as file:
+            data = file.read()
+
+        headers = FeitCSIBeamformReader.get_headers(data, FeitCSIBeamformReader.get_frame_offsets(data))
+        assert(np.array_equal(FeitCSIBeamformReader.get_timestamps(headers), FeitCSIBeamformReader().read_file(path).timestamps))
@@ -0,0 +1,108 @@
+from CSIKit.csi import CSIFilter
+from CSIKit.reader import get_reader
+
+import gzip
+import inspect
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+def assert_csi_data_match(csi_data, expected):
+    assert(len(csi_data.frames) == len(expected.frames))
+    assert(np.array_equal(csi_data.timestamps, expected.timestamps))
+    assert(csi_data.bandwidth == expected.bandwidth)
+    assert(csi_data.chipset == expected.chipset)
+    assert(csi_data.expected_frames == expected.expected_frames)
+    assert(csi_data.skipped_frames == expected.skipped_frames)
+
+    for frame, expected_frame in zip(csi_data.frames, expected.frames):
+        assert(np.array_equal(frame.csi_matrix, expected_frame.csi_matrix))
+
+def get_parallel_reader(path):
+    reader = get_reader(path)
+    if "workers" not in inspect.signature(reader.read_file).parameters:
+        pytest.skip("{} does not decode in parallel.".format(type(reader).__name__))
+
+    return reader
+
+def read_example(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+@pytest.mark.parametrize("workers", [1, 2, 3])
+def test_read_file_workers(example_path, workers):
+    reader = get_parallel_reader(example_path)
+    expected = reader.read_file(example_path)
+
+    assert_csi_data_match(type(reader)().read_file(example_path, workers=workers), expected)
+
+def test_read_file_workers_buffer(example_path, tmp_path):
+    reader = get_parallel_reader(example_path)
+    expected = reader.read_file(example_path)
+
+    # Buffers and compressed captures are passed to workers through shared memory.
+    data = read_example(example_path)
+    assert_csi_data_match(type(reader)().read_file(data, workers=2), expected)
+
+    path = str(tmp_path / (os.path.basename(example_path) + ".gz"))
+    with open(path, "wb") as file:
+        file.write(gzip.compress(data))
+
+    assert_csi_data_match(type(reader)().read_file(path, workers=2), expected)
+
+def test_read_file_workers_lazy(example_path):
+    reader = get_parallel_reader(example_path)
+    expected = reader.read_file(example_path)
+
+    # Lazy reads are not split between workers, so nothing is decoded up front.
+    csi_data = type(reader)().read_file(example_path, workers=2, lazy=True)
+    assert(not any(frame.is_decoded() for frame in csi_data.frames if "_lazy_csi" in frame.__dict__))
+
+    assert_csi_data_match(csi_data, expected)
+
+def test_read_file_more_workers_than_records():
+    path = os.path.join(os.environ["NEX_READER_TEST_DIR"], "example.pcap")
+
+    reader = get_reader(path)
+    expected = reader.read_file(path)
+    assert(len(expected.frames) < 8)
+
+    # There are fewer records than chunks to split them between.
+    assert_csi_data_match(type(reader)().read_file(path, workers=8), expected)
+
+def test_read_chunk_header_filter(example_path):
+    reader = get_parallel_reader(example_path)
+    data = read_example(example_path)
+
+    chunk = reader.get_chunks(data, 1)[0]
+    expected = type(reader)().read_chunk(data, chunk)
+
+    # Frames failing the filter keep their place in the chunk, but their CSI is never decoded.
+    chunk_data = type(reader)().read_chunk(data, chunk, frame_filter=CSIFilter("00:00:00:00:00:00"))
+
+    assert(len(chunk_data.frames) == len(expected.frames))
+    assert(all(frame is None or frame.csi_matrix is None for frame in chunk_data.frames))
+
+def test_read_file_workers_temporary_files(example_path, tmp_path, monkeypatch):
+    reader = get_parallel_reader(example_path)
+    expected = reader.read_file(example_path)
+
+    # Workers, and compressed captures, write to temporary files which are removed once mapped.
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    path = str(tmp_path / (os.path.basename(example_path) + ".gz"))
+    with open(path, "wb") as file:
+        file.write(gzip.compress(read_example(example_path)))
+
+    csi_data = type(reader)().read_file(path, workers=2)
+    os.remove(path)
+
+    assert(os.listdir(tmp_path) == [])
+    assert_csi_data_match(csi_data, expected)
+
+    # Matrices are copy-on-write views of the mapped files, so can be modified.
+    for frame in csi_data.frames:
+        frame.csi_matrix[...] = 0
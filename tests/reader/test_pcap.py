@@ -1,9 +1,11 @@
-from CSIKit.reader.readers.read_pcap import Pcap
+from CSIKit.reader.readers.read_pcap import Pcap, PcapFrame
 from CSIKit.reader import get_reader
 from CSIKit.util import csitools
 import json
 import os
 
+import numpy as np
+
 def test_pcap_extraction():
     test_dir = os.environ["NEX_READER_TEST_DIR"]
     path = os.path.join(test_dir, "example.pcap")
@@ -25,6 +27,66 @@ def test_pcap_extraction_read():
     
     assert(no_frames == 4)
 
+def test_pcap_payload_headers():
+    test_dir = os.environ["NEX_READER_TEST_DIR"]
+    path = os.path.join(test_dir, "example.pcap")
+
+    # Stock nexmon and patched payloads, with core/spatial fields in either byte order.
+    with open(path, "rb") as file:
+        data = bytearray(file.read())
+
+    with Pcap(bytes(data)) as pcap:
+        offsets = pcap.get_record_offsets()
+
+    payload_offsets = offsets + PcapFrame.FRAME_HEADER_DTYPE.itemsize
+    header_offsets = payload_offsets + PcapFrame.PAYLOAD_HEADER_OFFSET
+
+    data[header_offsets[0]:header_offsets[0]+4] = b'\x11\x11\x11\x11'
+    data[header_offsets[1]+12:header_offsets[1]+14] = b'\x00\x19'
+    data[header_offsets[2]+12:header_offsets[2]+14] = b'\x19\x00'
+
+    columns = PcapFrame.read_payloadHeaders(bytes(data), payload_offsets)
+
+    for i, offset in enumerate(header_offsets.tolist()):
+        payloadHeader = PcapFrame.read_payloadHeader(bytes(data[offset:offset+22]))
+        for key, value in payloadHeader.items():
+            column_value = columns[key][i]
+            if key == "magic_bytes":
+                column_value = bytes(column_value)
+
+            assert(column_value == value)
+
+    assert(columns["rssi"][0] == -1 and columns["frame_control"][0] == -1)
+    assert(columns["core"][1] == columns["core"][2] == 1)
+    assert(columns["spatial_stream"][1] == columns["spatial_stream"][2] == 3)
+
+def test_pcap_nanosecond_timestamps():
+    test_dir = os.environ["NEX_READER_TEST_DIR"]
+    path = os.path.join(test_dir, "example.pcap")
+
+    with open(path, "rb") as file:
+        data = bytearray(file.read())
+
+    # Rewriting the capture with a nanosecond magic number, and frame timestamps scaled to match.
+    with Pcap(bytes(data)) as pcap:
+        offsets = pcap.get_record_offsets()
+
+    data[:4] = b"\x4d\x3c\xb2\xa1"
+    for offset in offsets.tolist():
+        usecs = int.from_bytes(data[offset+4:offset+8], "little")
+        data[offset+4:offset+8] = (usecs * 1000).to_bytes(4, "little")
+
+    reader = get_reader(path)
+    csi_data = reader.read_file(path)
+    nanosecond_data = reader.read_file(bytes(data))
+
+    assert(np.allclose(nanosecond_data.timestamps, csi_data.timestamps, rtol=0, atol=1e-6))
+
+    columns = reader.read_headers(bytes(data))
+    assert(np.allclose(columns["timestamp"], reader.read_headers(path)["timestamp"], rtol=0, atol=1e-6))
+
 if __name__ == '__main__':
     test_pcap_extraction()
     test_pcap_extraction_read()
+    test_pcap_payload_headers()
+    test_pcap_nanosecond_timestamps()
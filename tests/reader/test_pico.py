@@ -0,0 +1,195 @@
+from CSIKit.reader.readers.pico.MVMExtraSegment import MVMExtraSegment
+from CSIKit.reader.readers.pico.RxSBasicSegment import RxSBasicSegment
+from CSIKit.reader.readers.read_pico import PicoScenesBeamformReader
+
+import os
+import shutil
+import struct
+
+import numpy as np
+import pytest
+
+# Fields read by the original per-field struct.unpack parsers, in order, with None for skipped bytes.
+RXS_BASIC_V1_FIELDS = [
+    ("deviceType", "H"), ("timestamp", "Q"), ("channelFreq", "H"), ("packetFormat", "B"), ("cbw", "H"),
+    ("guardInterval", "H"), ("mcs", "B"), ("numSTS", "B"), ("numESS", "B"), ("numRx", "B"),
+    ("noiseFloor", "b"), ("rssi", "b"), ("rssi_ctl0", "b"), ("rssi_ctl1", "b"), ("rssi_ctl2", "b"),
+]
+
+RXS_BASIC_V2_FIELDS = RXS_BASIC_V1_FIELDS[:10] + [("numUser", "B"), ("userIndex", "B")] + RXS_BASIC_V1_FIELDS[10:]
+
+RXS_BASIC_V3_FIELDS = [
+    ("deviceType", "H"), ("timestamp", "Q"), ("centerFreq", "H"), ("controlFreq", "H"), ("cbw", "H"),
+    ("packetFormat", "B"), ("pkt_cbw", "H"), ("guardInterval", "H"), ("mcs", "B"), ("numSTS", "B"),
+    ("numESS", "B"), ("numRx", "B"), ("numUser", "B"), ("userIndex", "B"), ("noiseFloor", "b"),
+    ("rssi", "b"), ("rssi_ctl0", "b"), ("rssi_ctl1", "b"), ("rssi_ctl2", "b"),
+]
+
+RXS_BASIC_V4_FIELDS = RXS_BASIC_V3_FIELDS[:2] + [("systemtime", "Q")] + RXS_BASIC_V3_FIELDS[2:]
+
+MVM_EXTRA_V1_FIELDS = [
+    (None, "H"), ("iqDataSize", "I"), (None, "4x"), ("ftmClock", "I"), (None, "40x"), ("numTones", "I"),
+    ("reserved56", "I"), ("rssi1", "I"), ("rssi2", "I"), ("sourceAddress", ">BBBBBB"),
+    ("addressPadding", "H"), ("csiSequence", "B"), (None, "11x"), ("muClock", "I"),
+]
+
+EXAMPLE_FILES = ["picoscenes_iwl5300_example.csi", "picoscenes_ax200_example.csi"]
+
+def get_example_path(filename: str) -> str:
+    return os.path.join(os.environ["PICO_TEST_EXAMPLE_DIR"], filename)
+
+def unpack_fields(data: bytes, fields: list) -> dict:
+    # Reads one field at a time, as the parsers did before their layouts were compiled.
+    header = {}
+    pos = 0
+    for name, fmt in fields:
+        size = struct.calcsize(fmt)
+        values = struct.unpack(fmt, data[pos:pos + size])
+        if name is not None:
+            header[name] = values[0] if len(values) == 1 else values
+        pos += size
+
+    return header
+
+def get_random_bytes(size: int, seed: int = 0) -> bytes:
+    return np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+@pytest.mark.parametrize("version, fields", [
+    (1, RXS_BASIC_V1_FIELDS),
+    (2, RXS_BASIC_V2_FIELDS),
+    (3, RXS_BASIC_V3_FIELDS),
+    (4, RXS_BASIC_V4_FIELDS),
+])
+def test_rxs_basic_layouts(version, fields):
+    layout = RxSBasicSegment.LAYOUTS[version]
+    assert(layout.size == sum(struct.calcsize(fmt) for _, fmt in fields))
+
+    for seed in range(8):
+        data = get_random_bytes(layout.size, seed)
+        expected = unpack_fields(data, fields)
+
+        segment = RxSBasicSegment(data, version)
+        for name, value in expected.items():
+            assert(getattr(segment, name) == value)
+
+        if version == 1:
+            # Version 1 segments carry no user fields, which were set to zero.
+            assert(segment.numUser == 0 and segment.userIndex == 0)
+
+def test_mvm_extra_layout():
+    layout = MVMExtraSegment.LAYOUTS[1]
+    assert(layout.size == sum(struct.calcsize(fmt) for _, fmt in MVM_EXTRA_V1_FIELDS))
+
+    for seed in range(8):
+        data = get_random_bytes(layout.size, seed)
+        expected = unpack_fields(data, MVM_EXTRA_V1_FIELDS)
+
+        segment = MVMExtraSegment(data, 1)
+        for name, value in expected.items():
+            assert(getattr(segment, name) == value)
+
+@pytest.mark.parametrize("layout", [*RxSBasicSegment.LAYOUTS.values(), MVMExtraSegment.LAYOUTS[1]])
+def test_unpack_bulk(layout):
+    # Headers at unaligned, unevenly spaced offsets, as found between frames in a capture.
+    offsets = np.array([0, 3, layout.size + 5, 4 * layout.size + 1])
+    data = get_random_bytes(int(offsets[-1]) + layout.size)
+
+    headers = layout.to_dicts(layout.unpack_bulk(data, offsets))
+
+    assert(len(headers) == len(offsets))
+    for header, offset in zip(headers, offsets):
+        assert(header == layout.unpack(data, int(offset)))
+
+def assert_frames_match(csi_data, frames: list, timestamps: list):
+    assert(len(csi_data.frames) == len(frames))
+    assert(np.array_equal(csi_data.timestamps, timestamps))
+
+    for frame, expected_frame in zip(csi_data.frames, frames):
+        assert(np.array_equal(frame.csi_matrix, expected_frame.csi_matrix))
+
+@pytest.mark.parametrize("filename", EXAMPLE_FILES)
+def test_read_frames(filename):
+    path = get_example_path(filename)
+    expected = PicoScenesBeamformReader().read_file(path)
+    no_frames = len(expected.frames)
+
+    # Timestamps remain relative to the first frame in the file, rather than the first frame read.
+    csi_data = PicoScenesBeamformReader().read_frames(path, slice(5, no_frames // 2))
+    assert_frames_match(csi_data, expected.frames[5:no_frames // 2], expected.timestamps[5:no_frames // 2])
+
+    indices = [no_frames - 1, 0, 3]
+    csi_data = PicoScenesBeamformReader().read_frames(path, indices)
+    assert_frames_match(csi_data, [expected.frames[i] for i in indices], [expected.timestamps[i] for i in indices])
+
+    mask = np.arange(no_frames) % 3 == 0
+    csi_data = PicoScenesBeamformReader().read_frames(path, mask)
+    assert_frames_match(csi_data, [frame for frame, keep in zip(expected.frames, mask) if keep], np.array(expected.timestamps)[mask])
+
+    assert_frames_match(PicoScenesBeamformReader().read_frames(path), expected.frames, expected.timestamps)
+
+@pytest.mark.parametrize("filename", EXAMPLE_FILES)
+def test_read_time_range(filename):
+    path = get_example_path(filename)
+    expected = PicoScenesBeamformReader().read_file(path)
+    no_frames = len(expected.frames)
+
+    timestamps = np.array(expected.timestamps)
+    t0, t1 = timestamps[no_frames // 4], timestamps[3 * no_frames // 4]
+    selected = np.flatnonzero((timestamps >= t0) & (timestamps < t1))
+    assert(0 < len(selected) < no_frames)
+
+    csi_data = PicoScenesBeamformReader().read_time_range(path, t0, t1)
+    assert_frames_match(csi_data, [expected.frames[i] for i in selected], timestamps[selected])
+
+    # Ranges outside the capture select nothing.
+    csi_data = PicoScenesBeamformReader().read_time_range(path, timestamps[-1] + 1, timestamps[-1] + 2)
+    assert(len(csi_data.frames) == 0)
+
+def test_index_sidecar(tmp_path):
+    path = str(tmp_path / EXAMPLE_FILES[0])
+    shutil.copyfile(get_example_path(EXAMPLE_FILES[0]), path)
+
+    reader = PicoScenesBeamformReader()
+    index = reader.build_index(path)
+
+    sidecar_path = path + reader.INDEX_EXTENSION
+    assert(np.array_equal(reader.get_index(path, sidecar=True), index))
+    assert(os.path.exists(sidecar_path))
+
+    # A sidecar matching the capture's size and modification time is used as-is.
+    stat = os.stat(path)
+    with open(sidecar_path, "wb") as sidecar_file:
+        np.savez(sidecar_file, index=index[:1], file_size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    assert(len(reader.get_index(path, sidecar=True)) == 1)
+
+    # Once the capture has been modified, the index is rebuilt and saved again.
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+    assert(np.array_equal(reader.get_index(path, sidecar=True), index))
+    with np.load(sidecar_path) as sidecar_file:
+        assert(np.array_equal(sidecar_file["index"], index))
+
+def test_read_frames_missing_timestamp(tmp_path):
+    path = str(tmp_path / EXAMPLE_FILES[0])
+    shutil.copyfile(get_example_path(EXAMPLE_FILES[0]), path)
+
+    reader = PicoScenesBeamformReader()
+    expected = reader.read_file(path)
+
+    # Frames without RxSBasic are indexed with a NaN timestamp, here given to the first frame through its sidecar.
+    index = reader.build_index(path)
+    index["timestamp"][0] = np.nan
+
+    stat = os.stat(path)
+    with open(path + reader.INDEX_EXTENSION, "wb") as sidecar_file:
+        np.savez(sidecar_file, index=index, file_size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    # Timestamps are instead relative to the first frame with one.
+    timestamps = np.array(expected.timestamps[1:]) - expected.timestamps[1]
+
+    csi_data = reader.read_frames(path, slice(1, None), sidecar=True)
+    assert_frames_match(csi_data, expected.frames[1:], timestamps)
+
+    csi_data = reader.read_time_range(path, 0, np.inf, sidecar=True)
+    assert_frames_match(csi_data, expected.frames[1:], timestamps)
@@ -0,0 +1,133 @@
+from CSIKit.reader import get_reader
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import threading
+
+import numpy as np
+import pytest
+
+def assert_csi_data_match(csi_data, expected):
+    assert(len(csi_data.frames) == len(expected.frames))
+    assert(np.array_equal(csi_data.timestamps, expected.timestamps))
+    assert(csi_data.bandwidth == expected.bandwidth)
+    assert(csi_data.chipset == expected.chipset)
+
+    for frame, expected_frame in zip(csi_data.frames, expected.frames):
+        assert(np.array_equal(frame.csi_matrix, expected_frame.csi_matrix))
+
+def read_example(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+def open_pipe(data: bytes):
+    # Writes data into a pipe from another thread, returning the non-seekable read end.
+    read_fd, write_fd = os.pipe()
+
+    def write():
+        with open(write_fd, "wb") as pipe:
+            pipe.write(data)
+
+    threading.Thread(target=write, daemon=True).start()
+    return open(read_fd, "rb")
+
+COMPRESSION_FORMATS = [(".gz", gzip.compress), (".bz2", bz2.compress), (".xz", lzma.compress)]
+
+def write_example(path: str, data: bytes) -> str:
+    with open(path, "wb") as file:
+        file.write(data)
+
+    return path
+
+def test_read_file_bytes(example_path):
+    expected = get_reader(example_path).read_file(example_path)
+    data = read_example(example_path)
+
+    # Buffers are identified from their contents alone.
+    assert_csi_data_match(get_reader(data).read_file(data), expected)
+    assert_csi_data_match(get_reader(example_path).read_file(memoryview(data)), expected)
+    assert_csi_data_match(get_reader(example_path).read_file(io.BytesIO(data)), expected)
+
+def test_read_file_file_object(example_path):
+    expected = get_reader(example_path).read_file(example_path)
+
+    with open(example_path, "rb") as file:
+        reader = get_reader(file)
+        assert(file.tell() == 0)
+
+        assert_csi_data_match(reader.read_file(file), expected)
+
+        # File objects belong to the caller, so are left open.
+        assert(not file.closed)
+
+def test_read_file_path_like(example_path, tmp_path):
+    expected = get_reader(example_path).read_file(example_path)
+
+    path = tmp_path / os.path.basename(example_path)
+    path.write_bytes(read_example(example_path))
+
+    assert_csi_data_match(get_reader(path).read_file(path), expected)
+
+def test_read_file_pipe(example_path):
+    expected = get_reader(example_path).read_file(example_path)
+    data = read_example(example_path)
+
+    with open_pipe(data) as pipe:
+        assert(not pipe.seekable())
+        assert_csi_data_match(get_reader(pipe).read_file(pipe), expected)
+
+def test_read_file_missing(example_path, tmp_path):
+    path = str(tmp_path / os.path.basename(example_path))
+
+    with pytest.raises(Exception, match="File not found"):
+        get_reader(example_path).read_file(path)
+
+@pytest.mark.parametrize("extension, compress", COMPRESSION_FORMATS)
+def test_read_file_compressed(example_path, tmp_path, extension, compress):
+    expected = get_reader(example_path).read_file(example_path)
+    data = compress(read_example(example_path))
+
+    # Compressed captures are identified from their decompressed contents.
+    path = write_example(str(tmp_path / (os.path.basename(example_path) + extension)), data)
+
+    assert_csi_data_match(get_reader(path).read_file(path), expected)
+    assert_csi_data_match(get_reader(data).read_file(data), expected)
+
+    with open(path, "rb") as file:
+        assert_csi_data_match(get_reader(file).read_file(file), expected)
+
+def test_read_file_compressed_without_extension(example_path, tmp_path):
+    expected = get_reader(example_path).read_file(example_path)
+
+    # Compression is detected from magic bytes, so the original name can be kept.
+    path = write_example(str(tmp_path / os.path.basename(example_path)), gzip.compress(read_example(example_path)))
+
+    assert_csi_data_match(get_reader(path).read_file(path), expected)
+
+@pytest.mark.parametrize("extension, compress", COMPRESSION_FORMATS)
+def test_iter_frames_compressed(example_path, tmp_path, extension, compress):
+    reader = get_reader(example_path)
+    expected = np.concatenate([batch.timestamps for batch in reader.iter_frames(example_path, batch_size=16)])
+
+    path = write_example(str(tmp_path / (os.path.basename(example_path) + extension)), compress(read_example(example_path)))
+
+    # Compressed captures are parsed one decompressed block at a time.
+    timestamps = np.concatenate([batch.timestamps for batch in type(reader)().iter_frames(path, batch_size=16)])
+    assert(np.array_equal(timestamps, expected))
+
+@pytest.mark.parametrize("extension, compress", COMPRESSION_FORMATS)
+def test_read_compressed_truncated(example_path, tmp_path, extension, compress):
+    reader = get_reader(example_path)
+    data = compress(read_example(example_path))
+
+    # A compressed stream cut short is an error, rather than a capture ending early.
+    path = write_example(str(tmp_path / (os.path.basename(example_path) + extension)), data[:len(data) * 3 // 4])
+
+    with pytest.raises(EOFError):
+        type(reader)().read_file(path)
+
+    with pytest.raises(EOFError):
+        list(type(reader)().iter_frames(path, batch_size=16))